@@ -1,16 +1,32 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse
 import asyncio
+import json
 from datetime import datetime
 
-from .services.grading_engine import GradingEngine
-from .services.kafka_consumer import KafkaConsumerService
-from .services.multiple_solutions import MultipleSolutionEngine
+from .services.batch_consumer import BatchedKafkaConsumer
+from .services.results_producer import results_producer
+from .services.batch_jobs import BatchJobManager
+from .services.micro_batcher import MicroBatcher
+from .services.inference_executor import InferenceExecutor, ExecutorSaturated
+from .services.grading_pipeline import GradingPipeline, direct_result
+from .services.prescreen import PreScreen
+from .services.grading_cascade import GradingCascade, ReferenceSimilarityGrader
+from .services.code_executor import LANGUAGES, CodeExecutionEngine, UnsupportedLanguage
+from .services.mcq_grader import AnswerKeyCache, choice_question
+from .services.reference_index import ReferenceIndex, reference_fingerprint
 from .models.grading_models import (
-    SubmissionData, GradingResult, CodeSubmission,
+    GradingResult, CodeSubmission,
     TextSubmission, MultipleChoiceSubmission
 )
+from .models.batch_models import BatchGradingRequest, BatchJobStatus
+from .models.execution_models import CodeExecutionRequest, ExecutionResult
+from .models.mcq_models import AnswerSheetRequest, AnswerSheetResult, SheetScore
+from .models.tenant_models import TenantGradingSettings
+from .models.reference_models import (
+    ReferenceSet, ReferenceIndexStatus, SimilarityRequest, SimilarityResult
+)
 
 app = FastAPI(
     title="Skiller AI Grading Service",
@@ -28,34 +44,129 @@ app.add_middleware(
 )
 
 # Initialize services
-grading_engine = GradingEngine()
-multiple_solution_engine = MultipleSolutionEngine()
 kafka_consumer = None
 
+# Model calls run in worker processes (or in-process with INFERENCE_PROCESS_WORKERS=0);
+# engines on the MODEL_WARMUP list load at start, the rest on first use. Named by
+# import path so torch, transformers and friends are only imported where models run.
+inference_executor = InferenceExecutor({
+    "grading": ".grading_engine:GradingEngine",
+    "solutions": ".multiple_solutions:MultipleSolutionEngine",
+    "embeddings": ".embeddings:EmbeddingEngine",
+})
+
+# Reference answers and rubric items are embedded once, when their question is saved
+reference_index = ReferenceIndex()
+
+# Test cases run in sandboxed child processes of a pre-started worker pool
+code_executor = CodeExecutionEngine()
+
+# Concurrent model-backed requests are coalesced into batched forward passes,
+# with one batch in flight per inference worker process
+text_batcher = MicroBatcher(
+    "grade_text",
+    lambda items: inference_executor.run_batch("grading", "grade_text_batch", "grade_text", items),
+    max_in_flight=inference_executor.process_workers,
+)
+solutions_batcher = MicroBatcher(
+    "analyze_solutions",
+    lambda items: inference_executor.run_batch(
+        "solutions", "analyze_solutions_batch", "analyze_solutions", items
+    ),
+    max_in_flight=inference_executor.process_workers,
+)
+
+# Text answers are scored against their indexed references first; the tenant's
+# configured model only sees the ones whose confidence is near the review threshold
+grading_cascade = GradingCascade(
+    fast_graders={"text": ReferenceSimilarityGrader(inference_executor, reference_index)},
+    full_graders={"text": text_batcher.submit},
+)
+
+# Multiple-choice answer keys compiled to bitmasks; sheets are graded without the models
+answer_keys = AnswerKeyCache()
+
+
+async def grade_multiple_choice_answer(submission):
+    """Score a submission that carries its options from the answer key; the models only see the rest"""
+    found = choice_question(submission.model_dump(mode="json"))
+    if found is None:
+        return await inference_executor.run("grading", "grade_multiple_choice", submission)
+    question, selection = found
+    key = answer_keys.get([question])
+    _, totals, max_score = key.grade([{question["question_id"]: selection}])
+    return direct_result(submission, float(totals[0]) / max_score, "Scored against the answer key", "answer_key")
+
+
+GRADERS = {
+    "code": lambda submission: inference_executor.run("grading", "grade_code", submission),
+    "text": grading_cascade.grader("text"),
+    "multiple_choice": grade_multiple_choice_answer,
+}
+
+# Code with syntax errors or broken keyword rules is answered before reaching the models
+code_prescreen = PreScreen()
+
+# Identical submissions are served from the result cache instead of re-graded
+grading_pipeline = GradingPipeline(GRADERS, screens={"code": code_prescreen})
+batch_jobs = BatchJobManager(grading_pipeline.grade, answer_keys=answer_keys)
+
+
+# Workers and sandboxes start in the background so /health and the MCQ and cached paths
+# answer at once; requests needing them before then wait (models) or get 503 (sandbox)
+startup_tasks = []
+
+
+def is_ready():
+    return inference_executor.is_ready() and code_executor.is_ready()
+
+
+async def execution_ready():
+    """Turn code execution requests away with 503 until the sandbox pools are up"""
+    if not code_executor.is_ready():
+        raise HTTPException(status_code=503, detail="Code execution is starting", headers={"Retry-After": "1"})
+
+
+async def inference_capacity():
+    """Turn requests away with 429 while the inference queue is full"""
+    try:
+        inference_executor.admit()
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
     global kafka_consumer
     
-    # Initialize Kafka consumer
-    kafka_consumer = KafkaConsumerService(
-        topic="interview-submissions",
-        group_id="ai-grading-service"
-    )
+    # Start inference workers (loading the warm-up models in each) and sandbox pools in the background
+    startup_tasks.append(asyncio.create_task(inference_executor.start()))
+    startup_tasks.append(asyncio.create_task(code_executor.start()))
     
-    # Start background Kafka consumer
+    # Grade queued submissions in batches and publish results to grading-results
+    kafka_consumer = BatchedKafkaConsumer(grading_pipeline.grade, results_producer)
     asyncio.create_task(kafka_consumer.start_consuming())
     
-    # Initialize AI models
-    await grading_engine.initialize()
-    await multiple_solution_engine.initialize()
+    # Pick up batch jobs interrupted by a restart
+    await batch_jobs.resume()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    for task in startup_tasks:
+        task.cancel()
     if kafka_consumer:
         await kafka_consumer.stop()
+    await results_producer.stop()
+    await batch_jobs.stop()
+    await text_batcher.stop()
+    await solutions_batcher.stop()
+    await inference_executor.stop()
+    await code_executor.stop()
+    await grading_pipeline.stop()
+    await grading_cascade.stop()
 
 
 @app.get("/")
@@ -72,30 +183,53 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
+        "live": True,
+        "ready": is_ready(),
         "timestamp": datetime.utcnow().isoformat(),
         "services": {
-            "grading_engine": grading_engine.is_ready(),
-            "multiple_solution_engine": multiple_solution_engine.is_ready(),
+            "grading_engine": inference_executor.is_ready("grading"),
+            "multiple_solution_engine": inference_executor.is_ready("solutions"),
+            "code_executor": code_executor.is_ready(),
             "kafka_consumer": kafka_consumer.is_running() if kafka_consumer else False
-        }
+        },
+        "kafka": kafka_consumer.stats() if kafka_consumer else None
+    }
+
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"live": True}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Inference workers and sandbox pools are up; 503 while they are still starting"""
+    status = {
+        "ready": is_ready(),
+        "inference": inference_executor.is_ready(),
+        "code_execution": code_executor.is_ready(),
     }
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
 
-@app.post("/grade/code", response_model=GradingResult)
+@app.post("/grade/code", response_model=GradingResult, dependencies=[Depends(inference_capacity)])
 async def grade_code_submission(submission: CodeSubmission):
     """Grade a code submission"""
     try:
-        result = await grading_engine.grade_code(submission)
+        result = await grading_pipeline.grade("code", submission)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/grade/text", response_model=GradingResult)
+@app.post("/grade/text", response_model=GradingResult, dependencies=[Depends(inference_capacity)])
 async def grade_text_submission(submission: TextSubmission):
     """Grade a text-based submission"""
     try:
-        result = await grading_engine.grade_text(submission)
+        result = await grading_pipeline.grade("text", submission)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -103,15 +237,156 @@ async def grade_text_submission(submission: TextSubmission):
 
 @app.post("/grade/multiple-choice", response_model=GradingResult)
 async def grade_multiple_choice(submission: MultipleChoiceSubmission):
-    """Grade a multiple choice submission"""
+    """Grade a multiple choice submission, from its answer key when it carries its options"""
+    if choice_question(submission.model_dump(mode="json")) is None:
+        # Only submissions without their options go to the models
+        await inference_capacity()
     try:
-        result = await grading_engine.grade_multiple_choice(submission)
+        result = await grading_pipeline.grade("multiple_choice", submission)
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/analyze/solutions")
+@app.post("/grade/multiple-choice/sheet", response_model=AnswerSheetResult)
+async def grade_answer_sheets(request: AnswerSheetRequest):
+    """Grade whole multiple-choice answer sheets against their answer key in one pass"""
+    questions = [question.model_dump() for question in request.questions]
+    try:
+        key = answer_keys.get(questions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        scores, totals, max_score = await asyncio.to_thread(
+            key.grade, [sheet.answers for sheet in request.sheets], request.scheme
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return AnswerSheetResult(
+        scheme=request.scheme,
+        max_score=max_score,
+        results=[
+            SheetScore(
+                sheet_id=sheet.sheet_id,
+                score=round(float(totals[row]), 4),
+                max_score=max_score,
+                percentage=round(float(totals[row]) / max_score * 100, 2) if max_score else 0.0,
+                question_scores={
+                    question_id: round(float(score), 4)
+                    for question_id, score in zip(key.question_ids, scores[row])
+                },
+            )
+            for row, sheet in enumerate(request.sheets)
+        ],
+    )
+
+
+@app.put("/tenants/{tenant}/grading-settings", response_model=TenantGradingSettings)
+async def update_tenant_grading_settings(tenant: str, settings: TenantGradingSettings):
+    """Store a tenant's grading cascade settings (sent by the backend when TenantSettings change)"""
+    await grading_cascade.settings.set(tenant, settings.model_dump())
+    return settings
+
+
+@app.get("/tenants/{tenant}/grading-settings", response_model=TenantGradingSettings)
+async def get_tenant_grading_settings(tenant: str):
+    """Grading cascade settings in effect for a tenant"""
+    return TenantGradingSettings(**await grading_cascade.settings.get(tenant))
+
+
+@app.put("/references/{tenant}/{question_id}", response_model=ReferenceIndexStatus)
+async def index_references(tenant: str, question_id: str, reference_set: ReferenceSet):
+    """Embed a question's reference answers and rubric items, unless they are unchanged"""
+    references = [item.model_dump() for item in reference_set.references]
+    fingerprint = reference_fingerprint(references)
+    try:
+        if await asyncio.to_thread(reference_index.is_current, tenant, question_id, fingerprint):
+            return ReferenceIndexStatus(question_id=question_id, rows=len(references), reindexed=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if references:
+            vectors = await inference_executor.run("embeddings", "encode", [item["text"] for item in references])
+            await asyncio.to_thread(
+                reference_index.upsert, tenant, question_id, fingerprint,
+                [item["label"] for item in references], vectors
+            )
+        else:
+            await asyncio.to_thread(reference_index.delete, tenant, question_id)
+        return ReferenceIndexStatus(question_id=question_id, rows=len(references), reindexed=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/references/{tenant}/{question_id}")
+async def delete_references(tenant: str, question_id: str):
+    """Drop a question's rows from the reference index"""
+    try:
+        deleted = await asyncio.to_thread(reference_index.delete, tenant, question_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"question_id": question_id, "deleted": deleted}
+
+
+@app.post(
+    "/references/{tenant}/{question_id}/similarity",
+    response_model=SimilarityResult,
+    dependencies=[Depends(inference_capacity)]
+)
+async def reference_similarity(tenant: str, question_id: str, request: SimilarityRequest):
+    """Similarity of an answer to each of the question's indexed references"""
+    try:
+        vector = (await inference_executor.run("embeddings", "encode", [request.answer]))[0]
+        scores = await asyncio.to_thread(reference_index.similarity, tenant, question_id, vector)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if scores is None:
+        raise HTTPException(status_code=404, detail="Question has no indexed references")
+
+    return SimilarityResult(
+        question_id=question_id,
+        scores=scores,
+        best=max(scores, key=lambda score: score["similarity"]) if scores else None,
+        mean=round(sum(score["similarity"] for score in scores) / len(scores), 4) if scores else 0.0,
+    )
+
+
+@app.post("/execute/tests", response_model=ExecutionResult, dependencies=[Depends(execution_ready)])
+async def execute_test_cases(request: CodeExecutionRequest):
+    """Run code against a coding question's test cases in the sandbox"""
+    try:
+        return await code_executor.execute(request)
+    except UnsupportedLanguage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/execute/tests/stream", dependencies=[Depends(execution_ready)])
+async def stream_test_cases(request: CodeExecutionRequest):
+    """
+    Run code against test cases, streaming NDJSON: one {"type": "test"} line
+    per test case as it completes, then a {"type": "summary"} line
+    """
+    if request.language not in LANGUAGES:
+        raise HTTPException(status_code=400, detail=f"Unsupported language: {request.language}")
+
+    async def events():
+        async for event in code_executor.execute_stream(request):
+            kind = "summary" if isinstance(event, ExecutionResult) else "test"
+            yield json.dumps({"type": kind, "data": event.model_dump(mode="json")}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/analyze/solutions", dependencies=[Depends(inference_capacity)])
 async def analyze_multiple_solutions(
     code: str,
     problem_description: str,
@@ -119,15 +394,13 @@ async def analyze_multiple_solutions(
 ):
     """Analyze multiple solution strategies for a coding problem"""
     try:
-        analysis = await multiple_solution_engine.analyze_solutions(
-            code, problem_description, language
-        )
+        analysis = await solutions_batcher.submit((code, problem_description, language))
         return analysis
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/compare/solutions")
+@app.post("/compare/solutions", dependencies=[Depends(inference_capacity)])
 async def compare_solutions(
     solution1: str,
     solution2: str,
@@ -136,41 +409,66 @@ async def compare_solutions(
 ):
     """Compare two different solutions to the same problem"""
     try:
-        comparison = await multiple_solution_engine.compare_solutions(
-            solution1, solution2, problem_description, language
+        comparison = await inference_executor.run(
+            "solutions", "compare_solutions", solution1, solution2, problem_description, language
         )
         return comparison
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/grade/batch")
-async def grade_batch_submissions(
-    submissions: List[SubmissionData],
-    background_tasks: BackgroundTasks
-):
-    """Grade multiple submissions in batch"""
+@app.post("/grade/batch", status_code=202)
+async def grade_batch_submissions(request: BatchGradingRequest):
+    """Start a batch grading job; poll GET /grade/batch/{batch_id} for progress"""
     try:
-        # Add batch grading task to background
-        background_tasks.add_task(
-            grading_engine.grade_batch,
-            submissions
-        )
-        
+        batch_id, total = await batch_jobs.submit(request)
         return {
-            "message": f"Batch grading started for {len(submissions)} submissions",
-            "batch_id": f"batch_{datetime.utcnow().timestamp()}"
+            "message": f"Batch grading started for {total} submissions",
+            "batch_id": batch_id
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/grade/batch/{batch_id}", response_model=BatchJobStatus)
+async def get_batch_status(batch_id: str, include_results: bool = True):
+    """Get progress and results graded so far for a batch job"""
+    job = await batch_jobs.get(batch_id, include_results)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return job
+
+
+@app.delete("/grade/batch/{batch_id}", response_model=BatchJobStatus)
+async def cancel_batch(batch_id: str):
+    """Cancel a batch job; results already graded are kept"""
+    job = await batch_jobs.cancel(batch_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return job
+
+
 @app.get("/models/status")
 async def get_model_status():
     """Get status of all AI models"""
     return {
-        "grading_models": await grading_engine.get_model_status(),
-        "solution_models": await multiple_solution_engine.get_model_status()
+        # Engine details only for loaded engines; asking must not load one
+        "grading_models": await inference_executor.engine_status("grading"),
+        "solution_models": await inference_executor.engine_status("solutions"),
+        "embedding_model": await inference_executor.engine_status("embeddings"),
+        "registry": inference_executor.model_status(),
+        "batching": {
+            batcher.name: batcher.stats()
+            for batcher in (text_batcher, solutions_batcher)
+        },
+        "inference": inference_executor.stats(),
+        "result_cache": grading_pipeline.stats(),
+        "prescreen": code_prescreen.stats(),
+        "cascade": grading_cascade.stats(),
+        "results_producer": results_producer.stats(),
+        "code_execution": code_executor.stats(),
+        "answer_keys": answer_keys.stats(),
+        "reference_index": reference_index.stats()
     }
 
 
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .grading_models import CodeSubmission, TextSubmission, MultipleChoiceSubmission
+
+
+class BatchGradingRequest(BaseModel):
+    """Submissions to grade in one batch job, grouped by type"""
+    code: List[CodeSubmission] = []
+    text: List[TextSubmission] = []
+    multiple_choice: List[MultipleChoiceSubmission] = []
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    submission_type: str
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class BatchJobStatus(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    updated_at: datetime
+    results: List[BatchItemResult] = []
@@ -0,0 +1,59 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+MAX_MEMORY_LIMIT_MB = 2048
+MAX_EXECUTION_TIME_LIMIT = 60  # seconds
+MAX_TEST_CASES = 200
+
+
+class TestCase(BaseModel):
+    """One CodingQuestion test case: stdin for the program and the stdout expected back"""
+    input: str = ""
+    expected_output: str = ""
+
+
+class CodeExecutionRequest(BaseModel):
+    """A submission run against a CodingQuestion's test cases under its limits"""
+    code: str
+    language: str = "python"
+    test_cases: List[TestCase] = []
+    hidden_test_cases: List[TestCase] = []
+    memory_limit: int = Field(256, ge=16, le=MAX_MEMORY_LIMIT_MB)  # MB
+    execution_time_limit: int = Field(10, ge=1, le=MAX_EXECUTION_TIME_LIMIT)  # seconds, per test case
+    stop_on_first_failure: bool = False
+    # Identify resubmissions, so tests this candidate failed last time run first
+    schema_name: Optional[str] = None
+    candidate_id: Optional[str] = None
+    question_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_test_case_count(self):
+        if len(self.test_cases) + len(self.hidden_test_cases) > MAX_TEST_CASES:
+            raise ValueError(f"at most {MAX_TEST_CASES} test cases are allowed per request")
+        return self
+
+
+class TestCaseResult(BaseModel):
+    index: int
+    hidden: bool = False
+    status: str
+    passed: bool
+    time_ms: float = 0.0
+    cpu_ms: float = 0.0
+    cached: bool = False
+    # Left empty for hidden test cases
+    output: Optional[str] = None
+    expected_output: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ExecutionResult(BaseModel):
+    language: str
+    status: str
+    passed: int
+    total: int
+    cached: int = 0
+    time_ms: float
+    compile_error: Optional[str] = None
+    results: List[TestCaseResult] = []
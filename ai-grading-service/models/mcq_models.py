@@ -0,0 +1,44 @@
+from typing import Dict, List, Literal, Union
+
+from pydantic import BaseModel
+
+
+class ChoiceOption(BaseModel):
+    """One option of a MultipleChoiceQuestion, as stored in its options field"""
+    id: str
+    text: str = ""
+    is_correct: bool = False
+
+
+class ChoiceQuestion(BaseModel):
+    question_id: str
+    options: List[ChoiceOption]
+    allow_multiple: bool = False
+    points: float = 1.0
+
+
+class AnswerSheet(BaseModel):
+    """One candidate's answers: question id to the selected option id(s)"""
+    sheet_id: str
+    answers: Dict[str, Union[str, List[str]]] = {}
+
+
+class AnswerSheetRequest(BaseModel):
+    """Answer sheets graded together against one question set"""
+    questions: List[ChoiceQuestion]
+    sheets: List[AnswerSheet]
+    scheme: Literal["all_or_nothing", "partial", "per_option"] = "all_or_nothing"
+
+
+class SheetScore(BaseModel):
+    sheet_id: str
+    score: float
+    max_score: float
+    percentage: float
+    question_scores: Dict[str, float]
+
+
+class AnswerSheetResult(BaseModel):
+    scheme: str
+    max_score: float
+    results: List[SheetScore]
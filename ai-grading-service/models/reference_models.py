@@ -0,0 +1,35 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ReferenceItem(BaseModel):
+    """A reference answer or rubric item to compare candidate answers against"""
+    label: str
+    text: str
+
+
+class ReferenceSet(BaseModel):
+    references: List[ReferenceItem]
+
+
+class ReferenceIndexStatus(BaseModel):
+    question_id: str
+    rows: int
+    reindexed: bool
+
+
+class SimilarityRequest(BaseModel):
+    answer: str
+
+
+class ReferenceScore(BaseModel):
+    label: str
+    similarity: float
+
+
+class SimilarityResult(BaseModel):
+    question_id: str
+    scores: List[ReferenceScore]
+    best: Optional[ReferenceScore] = None
+    mean: float = 0.0
@@ -0,0 +1,11 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class TenantGradingSettings(BaseModel):
+    """Grading fields of a tenant's TenantSettings, as pushed by the backend"""
+    ai_grading_model: Optional[str] = None
+    manual_review_threshold: float = Field(0.7, ge=0.0, le=1.0)
+    # Cheap-tier confidence below threshold + band goes to ai_grading_model
+    confidence_band: float = Field(0.15, ge=0.0, le=1.0)
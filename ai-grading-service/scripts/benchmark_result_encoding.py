@@ -0,0 +1,115 @@
+"""
+Compare the encoded size and in-memory encoding speed of grading-result
+batches before and after producer batching/compression.
+
+This measures record batch encoding only, with kafka-python's own batch
+builder; no broker is involved, so network time, acks and broker-side
+throughput are not included. "Before" is the old setup (linger_ms=0, no
+compression), where each result under light load is its own batch;
+"after" fills batches up to KAFKA_PRODUCER_BATCH_SIZE and compresses them
+with KAFKA_PRODUCER_COMPRESSION.
+
+    python scripts/benchmark_result_encoding.py --messages 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+from kafka.record.default_records import DefaultRecordBatchBuilder
+from kafka.record.memory_records import MemoryRecordsBuilder
+
+CODECS = {
+    None: DefaultRecordBatchBuilder.CODEC_NONE,
+    "gzip": DefaultRecordBatchBuilder.CODEC_GZIP,
+    "snappy": DefaultRecordBatchBuilder.CODEC_SNAPPY,
+    "lz4": DefaultRecordBatchBuilder.CODEC_LZ4,
+    "zstd": DefaultRecordBatchBuilder.CODEC_ZSTD,
+}
+
+
+def sample_result(rng):
+    """A grading-results message shaped like the ones the consumer publishes"""
+    tenant = f"tenant_{rng.randint(1, 20)}"
+    candidate_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    score = rng.randint(0, 100)
+    return (
+        f"{tenant}:{candidate_id}".encode(),
+        json.dumps({
+            "submission_type": rng.choice(["code", "text", "multiple_choice"]),
+            "submission_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "tenant": tenant,
+            "candidate_id": candidate_id,
+            "status": "done",
+            "result": {
+                "score": score,
+                "max_score": 100,
+                "confidence": round(rng.random(), 3),
+                "feedback": "The solution handles the main cases correctly. " * rng.randint(1, 4),
+                "details": {"tests_passed": rng.randint(0, 10), "tests_total": 10},
+            },
+        }).encode(),
+    )
+
+
+def encode(messages, compression, batch_size, records_per_batch=None):
+    """Encode messages into record batches; returns (bytes, batches, seconds)"""
+    total_bytes = 0
+    batches = 0
+    started = time.perf_counter()
+    builder = None
+    in_batch = 0
+    for timestamp, (key, value) in enumerate(messages):
+        if builder is None:
+            builder = MemoryRecordsBuilder(2, CODECS[compression], batch_size)
+            in_batch = 0
+        if builder.append(timestamp, key, value) is None:
+            builder.close()
+            total_bytes += builder.size_in_bytes()
+            batches += 1
+            builder = MemoryRecordsBuilder(2, CODECS[compression], batch_size)
+            builder.append(timestamp, key, value)
+            in_batch = 0
+        in_batch += 1
+        if records_per_batch and in_batch >= records_per_batch:
+            builder.close()
+            total_bytes += builder.size_in_bytes()
+            batches += 1
+            builder = None
+    if builder is not None:
+        builder.close()
+        total_bytes += builder.size_in_bytes()
+        batches += 1
+    return total_bytes, batches, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("KAFKA_PRODUCER_BATCH_SIZE", "65536")))
+    parser.add_argument("--compression", default=os.getenv("KAFKA_PRODUCER_COMPRESSION", "lz4") or None)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    messages = [sample_result(rng) for _ in range(args.messages)]
+    payload = sum(len(key) + len(value) for key, value in messages)
+
+    runs = [
+        ("before (linger 0, uncompressed)", encode(messages, None, 16384, records_per_batch=1)),
+        (f"after ({args.compression}, batch {args.batch_size})",
+         encode(messages, args.compression, args.batch_size)),
+    ]
+
+    print(f"{args.messages} messages, {payload} payload bytes")
+    for label, (total_bytes, batches, seconds) in runs:
+        print(
+            f"{label:40} {total_bytes:>12} bytes encoded  {batches:>6} batches  "
+            f"{total_bytes / args.messages:8.1f} B/msg  {args.messages / seconds:10.0f} msg/s encoded in memory"
+        )
+
+
+if __name__ == "__main__":
+    main()
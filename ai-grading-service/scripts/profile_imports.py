@@ -0,0 +1,101 @@
+"""
+Report what importing the grading service costs, and fail if it pulls in
+the heavy ML libraries that should only load in the inference workers.
+
+The service module is imported in a fresh interpreter under
+``python -X importtime``; the report lists the slowest top-level imports by
+cumulative time, and the exit status is non-zero when a heavy library is
+imported or the import takes longer than --max-seconds. Run it in CI next
+to the service's other checks:
+
+    python scripts/profile_imports.py --max-seconds 1.5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the inference workers need these
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "sklearn", "nltk", "pandas")
+
+# The service uses package-relative imports, so load its directory as a package
+BOOTSTRAP = """
+import importlib, importlib.util, sys
+spec = importlib.util.spec_from_file_location(
+    "grading_service", {init!r}, submodule_search_locations=[{path!r}]
+)
+package = importlib.util.module_from_spec(spec)
+sys.modules["grading_service"] = package
+importlib.import_module("grading_service.{module}")
+"""
+
+
+def profile(module):
+    """(wall seconds, {imported module: (self us, cumulative us)}, stderr) for importing the service"""
+    code = BOOTSTRAP.format(
+        init=os.path.join(SERVICE_DIR, "__init__.py"), path=SERVICE_DIR, module=module
+    )
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=SERVICE_DIR
+    )
+    elapsed = time.perf_counter() - started
+
+    imports = {}
+    errors = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        imports[name.strip()] = (int(fields[0]), int(fields[1]), len(name) - len(name.lstrip()))
+    if process.returncode != 0:
+        raise RuntimeError("\n".join(errors) or f"import exited with {process.returncode}")
+    return elapsed, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="service module to import (default: main)")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if the import takes longer")
+    args = parser.parse_args()
+
+    try:
+        elapsed, imports = profile(args.module)
+    except RuntimeError as e:
+        print(f"Importing {args.module} failed:\n{e}")
+        return 2
+
+    # Indentation of the name is import depth; one space is a top-level import
+    top_level = sorted(
+        ((name, cumulative) for name, (_, cumulative, depth) in imports.items() if depth <= 1),
+        key=lambda entry: entry[1], reverse=True,
+    )
+    print(f"import {args.module}: {elapsed:.3f} s wall, {len(imports)} modules")
+    print(f"{'cumulative ms':>14}  module")
+    for name, cumulative in top_level[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+    heavy = sorted({name.split(".")[0] for name in imports} & set(HEAVY_MODULES))
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy libraries imported at service import time: {', '.join(heavy)}")
+        failed = True
+    if args.max_seconds is not None and elapsed > args.max_seconds:
+        print(f"FAIL: import took {elapsed:.3f} s, over the {args.max_seconds} s limit")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Batched, pipelined consumer of interview submissions
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from kafka import KafkaConsumer, OffsetAndMetadata
+from kafka.consumer.subscription_state import ConsumerRebalanceListener
+
+from .batch_jobs import SUBMISSION_MODELS
+from .results_producer import KAFKA_BOOTSTRAP_SERVERS, record_key
+
+logger = logging.getLogger(__name__)
+
+KAFKA_TOPIC_SUBMISSIONS = os.getenv("KAFKA_TOPIC_SUBMISSIONS", "interview-submissions")
+KAFKA_CONSUMER_GROUP = os.getenv("KAFKA_CONSUMER_GROUP", "ai-grading-service")
+KAFKA_MAX_POLL_RECORDS = int(os.getenv("KAFKA_MAX_POLL_RECORDS", "100"))
+# Submissions being graded at once by this consumer, across all its partitions
+KAFKA_MAX_IN_FLIGHT = int(os.getenv("KAFKA_MAX_IN_FLIGHT", "32"))
+KAFKA_COMMIT_INTERVAL_MS = int(os.getenv("KAFKA_COMMIT_INTERVAL_MS", "1000"))
+# Results that could not be published go here, so their offsets can still be committed;
+# the file is the last resort when the dead-letter topic cannot be reached either
+KAFKA_TOPIC_DEAD_LETTER = os.getenv("KAFKA_TOPIC_DEAD_LETTER", "grading-results-dead-letter")
+DEAD_LETTER_FILE = os.getenv("DEAD_LETTER_FILE", "/data/grading/dead-letter.jsonl")
+
+POLL_TIMEOUT_MS = 500
+PUBLISH_RETRY_DELAYS = (0.5, 1, 2, 5, 10)
+
+# Completions kept for the throughput figure
+THROUGHPUT_WINDOW_SECONDS = 60
+
+
+def append_dead_letter(path, record):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+class _RevokeListener(ConsumerRebalanceListener):
+    """Commits finished work for partitions about to move to another group member"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def on_partitions_revoked(self, revoked):
+        # Runs inside poll() on the consumer thread
+        ready = dict(self.service.ready)
+        self.service._commit_now({tp: offset for tp, offset in ready.items() if tp in revoked})
+        self.service.loop.call_soon_threadsafe(self.service._forget, set(revoked))
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"Assigned partitions: {sorted(tp.partition for tp in assigned)}")
+
+
+class BatchedKafkaConsumer:
+    """
+    Polls submissions in batches and grades up to max_in_flight of them
+    concurrently. A partition's offset is committed only up to the last
+    contiguous message whose result has been published, so a crash never
+    skips an ungraded submission (results may be published twice instead).
+    A result that still cannot be published after every retry is parked on
+    the dead-letter topic (or file) with its message, and its offset counts
+    as finished, so one bad publish does not hold back the partition.
+
+    kafka-python consumers are not thread-safe, so every consumer call runs
+    on one dedicated thread. Instances of the service join the same group and
+    split the topic's partitions between them.
+    """
+
+    def __init__(self, grade, producer, topic=KAFKA_TOPIC_SUBMISSIONS, group_id=KAFKA_CONSUMER_GROUP,
+                 max_poll_records=KAFKA_MAX_POLL_RECORDS, max_in_flight=KAFKA_MAX_IN_FLIGHT,
+                 dead_letter_topic=KAFKA_TOPIC_DEAD_LETTER, dead_letter_file=DEAD_LETTER_FILE):
+        self.grade = grade
+        self.producer = producer
+        self.topic = topic
+        self.dead_letter_topic = dead_letter_topic
+        self.dead_letter_file = dead_letter_file
+        self.group_id = group_id
+        self.max_poll_records = max_poll_records
+        self.max_in_flight = max_in_flight
+
+        self.consumer = None
+        self.thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-consumer")
+        self.loop = None
+        self.running = False
+        self.tasks = set()
+
+        # Per partition: offset -> finished, in the order polled
+        self.offsets = {}
+        # Per partition: next offset to commit, and the last one committed
+        self.ready = {}
+        self.committed = {}
+        self.lag = {}
+        self.completed_at = deque()
+        self.processed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    async def start_consuming(self):
+        self.loop = asyncio.get_running_loop()
+        self.running = True
+        self.consumer = await self._call(self._create_consumer)
+        logger.info(f"Consuming {self.topic} as {self.group_id}")
+
+        last_commit = time.monotonic()
+        try:
+            while self.running:
+                records = await self._call(self._poll)
+                for tp, messages in records.items():
+                    for message in messages:
+                        self._dispatch(tp, message)
+
+                if time.monotonic() - last_commit >= KAFKA_COMMIT_INTERVAL_MS / 1000:
+                    await self._commit_ready()
+                    last_commit = time.monotonic()
+        except Exception as e:
+            logger.error(f"Kafka consumer stopped: {e}")
+        finally:
+            self.running = False
+
+    async def stop(self):
+        self.running = False
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=10)
+        if self.consumer is not None:
+            await self._commit_ready()
+            await self._call(self.consumer.close, autocommit=False)
+            self.consumer = None
+        self.thread.shutdown(wait=False)
+
+    def is_running(self):
+        return self.running
+
+    def stats(self):
+        now = time.monotonic()
+        while self.completed_at and now - self.completed_at[0] > THROUGHPUT_WINDOW_SECONDS:
+            self.completed_at.popleft()
+        return {
+            "topic": self.topic,
+            "group_id": self.group_id,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "throughput_per_sec": round(len(self.completed_at) / THROUGHPUT_WINDOW_SECONDS, 2),
+            "in_flight": len(self.tasks),
+            "partitions": {
+                tp.partition: {
+                    "in_flight": sum(1 for done in offsets.values() if not done),
+                    "lag": self.lag.get(tp),
+                }
+                for tp, offsets in self.offsets.items()
+            },
+        }
+
+    # Consumer thread
+
+    def _create_consumer(self):
+        consumer = KafkaConsumer(
+            bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+            group_id=self.group_id,
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+            max_poll_records=self.max_poll_records,
+        )
+        consumer.subscribe([self.topic], listener=_RevokeListener(self))
+        return consumer
+
+    def _poll(self):
+        """Fetch as many records as there are free in-flight slots"""
+        free = self.max_in_flight - len(self.tasks)
+        assignment = self.consumer.assignment()
+
+        # Keep polling while saturated so the group does not consider us dead
+        if free <= 0:
+            self.consumer.pause(*assignment)
+        elif self.consumer.paused():
+            self.consumer.resume(*self.consumer.paused())
+
+        records = self.consumer.poll(
+            timeout_ms=POLL_TIMEOUT_MS,
+            max_records=max(1, min(free, self.max_poll_records)),
+        )
+
+        for tp in self.consumer.assignment():
+            highwater = self.consumer.highwater(tp)
+            if highwater is not None:
+                self.lag[tp] = max(0, highwater - self.consumer.position(tp))
+        return records
+
+    def _commit_now(self, offsets):
+        if not offsets or self.consumer is None:
+            return False
+        try:
+            self.consumer.commit({tp: OffsetAndMetadata(offset, None) for tp, offset in offsets.items()})
+            return True
+        except Exception as e:
+            logger.error(f"Offset commit failed: {e}")
+            return False
+
+    # Event loop
+
+    async def _call(self, fn, *args, **kwargs):
+        return await self.loop.run_in_executor(self.thread, lambda: fn(*args, **kwargs))
+
+    async def _commit_ready(self):
+        offsets = {tp: offset for tp, offset in self.ready.items() if self.committed.get(tp) != offset}
+        if await self._call(self._commit_now, offsets):
+            self.committed.update(offsets)
+
+    def _dispatch(self, tp, message):
+        self.offsets.setdefault(tp, OrderedDict())[message.offset] = False
+        task = asyncio.create_task(self._handle(tp, message))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _handle(self, tp, message):
+        result = await self._grade(message)
+        key = record_key(result.get("tenant"), result.get("candidate_id"), result.get("submission_id"))
+        for delay in (*PUBLISH_RETRY_DELAYS, None):
+            try:
+                await self.producer.publish(key, result)
+                break
+            except Exception as e:
+                if not self.running:
+                    # Left uncommitted; redelivered after the restart
+                    logger.error(f"Could not publish result for {tp} offset {message.offset}: {e}")
+                    return
+                if delay is None:
+                    logger.error(f"Could not publish result for {tp} offset {message.offset}, dead-lettering: {e}")
+                    if not await self._dead_letter(tp, message, key, result, e):
+                        return
+                    break
+                await asyncio.sleep(delay)
+        self._finish(tp, message.offset)
+
+    async def _dead_letter(self, tp, message, key, result, error):
+        """Park an unpublishable result with its message; False if it could not be kept anywhere"""
+        record = {
+            **result,
+            "source": {"topic": tp.topic, "partition": tp.partition, "offset": message.offset},
+            "message": message.value.decode(errors="replace") if isinstance(message.value, bytes) else message.value,
+            "publish_error": str(error),
+        }
+        try:
+            await self.producer.publish(key, record, topic=self.dead_letter_topic)
+        except Exception as e:
+            logger.error(f"Dead-letter topic unavailable, writing {tp} offset {message.offset} to file: {e}")
+            try:
+                await asyncio.to_thread(append_dead_letter, self.dead_letter_file, record)
+            except OSError as e:
+                # Left uncommitted rather than lost
+                logger.error(f"Could not dead-letter {tp} offset {message.offset}: {e}")
+                return False
+        self.dead_lettered += 1
+        return True
+
+    async def _grade(self, message):
+        """Grade one message; failures become a failed result rather than a stuck offset"""
+        envelope = {"submission_id": None, "offset": message.offset}
+        try:
+            payload = json.loads(message.value)
+            kind = payload.pop("submission_type")
+            envelope.update(
+                submission_type=kind,
+                submission_id=payload.get("submission_id"),
+                tenant=payload.get("tenant"),
+                candidate_id=payload.get("candidate_id"),
+            )
+            submission = SUBMISSION_MODELS[kind].model_validate(payload)
+            result = await self.grade(kind, submission)
+            self.processed += 1
+            return {**envelope, "status": "done", "result": result.model_dump(mode="json")}
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Failed to grade message at offset {message.offset}: {e}")
+            return {**envelope, "status": "failed", "error": str(e)}
+
+    def _finish(self, tp, offset):
+        offsets = self.offsets.get(tp)
+        if offsets is None or offset not in offsets:
+            # Partition was revoked while this message was in flight
+            return
+        offsets[offset] = True
+        while offsets and next(iter(offsets.values())):
+            committed, _ = offsets.popitem(last=False)
+            self.ready[tp] = committed + 1
+        self.completed_at.append(time.monotonic())
+
+    def _forget(self, partitions):
+        for tp in partitions:
+            self.offsets.pop(tp, None)
+            self.ready.pop(tp, None)
+            self.committed.pop(tp, None)
+            self.lag.pop(tp, None)
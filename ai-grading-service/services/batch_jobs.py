@@ -0,0 +1,419 @@
+"""
+Persistent batch grading jobs with bounded concurrency
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, Text,
+    create_engine, inspect, insert, or_, select, text, update
+)
+from sqlalchemy.engine import make_url
+
+from .grading_pipeline import direct_result
+from .mcq_grader import choice_question
+from ..models.grading_models import CodeSubmission, TextSubmission, MultipleChoiceSubmission
+
+logger = logging.getLogger(__name__)
+
+# On the grading_data volume, so jobs survive container restarts
+GRADING_JOBS_DB_URL = os.getenv("GRADING_JOBS_DB_URL", "sqlite:////data/grading/grading_jobs.db")
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# A worker owns a job while it keeps renewing this lease; once it lapses
+# (the worker died) another worker takes the job over
+BATCH_JOB_LEASE_SECONDS = int(os.getenv("BATCH_JOB_LEASE_SECONDS", "60"))
+
+SUBMISSION_MODELS = {
+    "multiple_choice": MultipleChoiceSubmission,
+    "code": CodeSubmission,
+    "text": TextSubmission,
+}
+
+# Cheapest types first so their results are available while model-backed groups run
+SUBMISSION_TYPES = ["multiple_choice", "code", "text"]
+
+ACTIVE_STATUSES = ("pending", "running")
+
+metadata = MetaData()
+
+batch_jobs = Table(
+    "batch_jobs", metadata,
+    Column("id", String(32), primary_key=True),
+    Column("status", String(32), nullable=False),
+    Column("total", Integer, nullable=False),
+    Column("completed", Integer, nullable=False, default=0),
+    Column("failed", Integer, nullable=False, default=0),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Column("owner", String(128)),
+    Column("lease_expires", DateTime),
+)
+
+# Added after the first release; created on databases that predate them
+LEASE_COLUMNS = {"owner": "VARCHAR(128)", "lease_expires": "TIMESTAMP"}
+
+batch_job_items = Table(
+    "batch_job_items", metadata,
+    Column("job_id", String(32), primary_key=True),
+    Column("idx", Integer, primary_key=True),
+    Column("submission_type", String(32), nullable=False),
+    Column("payload", Text, nullable=False),
+    Column("status", String(32), nullable=False),
+    Column("result", Text),
+    Column("error", Text),
+)
+
+
+class BatchJobStore:
+    """Job and item rows in a SQL database (blocking; call through asyncio.to_thread)"""
+
+    def __init__(self, url=GRADING_JOBS_DB_URL):
+        connect_args = {}
+        if url.startswith("sqlite"):
+            connect_args = {"check_same_thread": False}
+            database = make_url(url).database
+            if database and database != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        self.engine = create_engine(url, connect_args=connect_args)
+        metadata.create_all(self.engine)
+        self._add_lease_columns()
+
+    def _add_lease_columns(self):
+        existing = {column["name"] for column in inspect(self.engine).get_columns("batch_jobs")}
+        with self.engine.begin() as conn:
+            for name, sql_type in LEASE_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE batch_jobs ADD COLUMN {name} {sql_type}"))
+
+    def create_job(self, batch_id, items):
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            conn.execute(insert(batch_jobs).values(
+                id=batch_id, status="pending", total=len(items),
+                completed=0, failed=0, created_at=now, updated_at=now
+            ))
+            if items:
+                conn.execute(insert(batch_job_items), [
+                    {
+                        "job_id": batch_id, "idx": index, "submission_type": kind,
+                        "payload": json.dumps(payload), "status": "pending"
+                    }
+                    for index, (kind, payload) in enumerate(items)
+                ])
+
+    def get_job(self, batch_id, include_results=True):
+        with self.engine.connect() as conn:
+            job = conn.execute(select(batch_jobs).where(batch_jobs.c.id == batch_id)).mappings().first()
+            if job is None:
+                return None
+            job = dict(job)
+            job["batch_id"] = job.pop("id")
+            job.pop("owner", None)
+            job.pop("lease_expires", None)
+            job["results"] = []
+            if include_results:
+                rows = conn.execute(
+                    select(
+                        batch_job_items.c.idx, batch_job_items.c.submission_type,
+                        batch_job_items.c.status, batch_job_items.c.result, batch_job_items.c.error
+                    )
+                    .where(batch_job_items.c.job_id == batch_id)
+                    .where(batch_job_items.c.status != "pending")
+                    .order_by(batch_job_items.c.idx)
+                ).all()
+                job["results"] = [
+                    {
+                        "index": row.idx,
+                        "submission_type": row.submission_type,
+                        "status": row.status,
+                        "result": json.loads(row.result) if row.result else None,
+                        "error": row.error,
+                    }
+                    for row in rows
+                ]
+        return job
+
+    def claimable_job_ids(self):
+        """Active jobs no live worker owns"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(batch_jobs.c.id)
+                .where(batch_jobs.c.status.in_(ACTIVE_STATUSES))
+                .where(or_(batch_jobs.c.owner.is_(None), batch_jobs.c.lease_expires < datetime.utcnow()))
+            )
+            return [row.id for row in rows]
+
+    def claim_job(self, batch_id, owner, lease_seconds=BATCH_JOB_LEASE_SECONDS):
+        """Take an unowned or abandoned job in one conditional UPDATE; True if this owner got it"""
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            claimed = conn.execute(
+                update(batch_jobs)
+                .where(batch_jobs.c.id == batch_id)
+                .where(batch_jobs.c.status.in_(ACTIVE_STATUSES))
+                .where(or_(
+                    batch_jobs.c.owner.is_(None),
+                    batch_jobs.c.owner == owner,
+                    batch_jobs.c.lease_expires < now,
+                ))
+                .values(
+                    owner=owner, lease_expires=now + timedelta(seconds=lease_seconds),
+                    status="running", updated_at=now,
+                )
+            )
+            return claimed.rowcount == 1
+
+    def renew_leases(self, owner, lease_seconds=BATCH_JOB_LEASE_SECONDS):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(batch_jobs)
+                .where(batch_jobs.c.owner == owner)
+                .where(batch_jobs.c.status.in_(ACTIVE_STATUSES))
+                .values(lease_expires=datetime.utcnow() + timedelta(seconds=lease_seconds))
+            )
+
+    def release_jobs(self, owner):
+        """Hand an owner's unfinished jobs back, for another worker to resume at once"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(batch_jobs)
+                .where(batch_jobs.c.owner == owner)
+                .where(batch_jobs.c.status.in_(ACTIVE_STATUSES))
+                .values(owner=None, lease_expires=None, status="pending")
+            )
+
+    def pending_items(self, batch_id):
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(batch_job_items.c.idx, batch_job_items.c.submission_type, batch_job_items.c.payload)
+                .where(batch_job_items.c.job_id == batch_id)
+                .where(batch_job_items.c.status == "pending")
+                .order_by(batch_job_items.c.idx)
+            ).all()
+        return [(row.idx, row.submission_type, json.loads(row.payload)) for row in rows]
+
+    def record_result(self, batch_id, index, result=None, error=None):
+        """Store one item's outcome and bump the job's progress counters"""
+        self.record_results(batch_id, [(index, result, error)])
+
+    def record_results(self, batch_id, outcomes):
+        """Store (index, result, error) outcomes of several items in one transaction"""
+        failed = sum(1 for _, _, error in outcomes if error is not None)
+        with self.engine.begin() as conn:
+            for index, result, error in outcomes:
+                conn.execute(
+                    update(batch_job_items)
+                    .where(batch_job_items.c.job_id == batch_id)
+                    .where(batch_job_items.c.idx == index)
+                    .values(
+                        status="failed" if error is not None else "done",
+                        result=json.dumps(result) if result is not None else None,
+                        error=error,
+                    )
+                )
+            conn.execute(
+                update(batch_jobs).where(batch_jobs.c.id == batch_id)
+                .values({
+                    batch_jobs.c.completed: batch_jobs.c.completed + (len(outcomes) - failed),
+                    batch_jobs.c.failed: batch_jobs.c.failed + failed,
+                    batch_jobs.c.updated_at: datetime.utcnow(),
+                })
+            )
+
+    def finish_job(self, batch_id):
+        with self.engine.begin() as conn:
+            job = conn.execute(select(batch_jobs.c.failed).where(batch_jobs.c.id == batch_id)).first()
+            conn.execute(
+                update(batch_jobs)
+                .where(batch_jobs.c.id == batch_id)
+                .where(batch_jobs.c.status.in_(ACTIVE_STATUSES))
+                .values(
+                    status="completed_with_errors" if job and job.failed else "completed",
+                    owner=None, lease_expires=None, updated_at=datetime.utcnow()
+                )
+            )
+
+    def cancel_job(self, batch_id):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(batch_job_items)
+                .where(batch_job_items.c.job_id == batch_id)
+                .where(batch_job_items.c.status == "pending")
+                .values(status="cancelled")
+            )
+            conn.execute(
+                update(batch_jobs)
+                .where(batch_jobs.c.id == batch_id)
+                .where(batch_jobs.c.status.in_(ACTIVE_STATUSES))
+                .values(status="cancelled", owner=None, lease_expires=None, updated_at=datetime.utcnow())
+            )
+
+
+class BatchJobManager:
+    """
+    Runs batch jobs in the background and tracks them in BatchJobStore.
+
+    Submissions are grouped by type and every group is graded concurrently,
+    with a semaphore shared by all jobs bounding how many submissions are in
+    flight. Multiple-choice submissions that carry their options are scored
+    per answer key in one vectorized pass instead. Progress is persisted per
+    item, so jobs interrupted by a restart resume from their remaining items.
+
+    Each uvicorn worker has its own manager; a job runs on the one that
+    claimed it, which keeps renewing its lease. Jobs whose lease lapsed are
+    picked up by whichever worker claims them first.
+    """
+
+    def __init__(self, grade, store=None, max_concurrency=BATCH_MAX_CONCURRENCY, answer_keys=None,
+                 lease_seconds=BATCH_JOB_LEASE_SECONDS):
+        self.grade = grade
+        self.store = store or BatchJobStore()
+        self.max_concurrency = max_concurrency
+        self.answer_keys = answer_keys
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.semaphore = None
+        self.tasks = {}
+        self.maintainer = None
+
+    async def submit(self, request):
+        """Persist a new job and start grading it; returns the batch id"""
+        items = [
+            (kind, submission.model_dump(mode="json"))
+            for kind in SUBMISSION_TYPES
+            for submission in getattr(request, kind)
+        ]
+        batch_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.store.create_job, batch_id, items)
+        self._start(batch_id)
+        return batch_id, len(items)
+
+    async def get(self, batch_id, include_results=True):
+        return await asyncio.to_thread(self.store.get_job, batch_id, include_results)
+
+    async def cancel(self, batch_id):
+        """Stop a running job; already graded items keep their results"""
+        task = self.tasks.get(batch_id)
+        if task:
+            task.cancel()
+        await asyncio.to_thread(self.store.cancel_job, batch_id)
+        return await self.get(batch_id, include_results=False)
+
+    async def resume(self):
+        """Take over jobs no live worker owns, then keep leases fresh and watch for abandoned jobs"""
+        await self._claim_orphans()
+        if self.maintainer is None:
+            self.maintainer = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        if self.maintainer:
+            self.maintainer.cancel()
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(self.store.release_jobs, self.owner)
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.store.renew_leases, self.owner, self.lease_seconds)
+                await self._claim_orphans()
+            except Exception as e:
+                logger.error(f"Batch job lease maintenance failed: {e}")
+
+    async def _claim_orphans(self):
+        for batch_id in await asyncio.to_thread(self.store.claimable_job_ids):
+            if batch_id not in self.tasks:
+                logger.info(f"Resuming batch job {batch_id}")
+                self._start(batch_id)
+
+    def _start(self, batch_id):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        task = asyncio.create_task(self._run(batch_id))
+        self.tasks[batch_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(batch_id, None))
+
+    async def _run(self, batch_id):
+        if not await asyncio.to_thread(self.store.claim_job, batch_id, self.owner, self.lease_seconds):
+            # Another worker got there first
+            return
+        items = await asyncio.to_thread(self.store.pending_items, batch_id)
+
+        groups = defaultdict(list)
+        for index, kind, payload in items:
+            groups[kind].append((index, payload))
+        if self.answer_keys is not None and groups["multiple_choice"]:
+            groups["multiple_choice"] = await self._grade_choices(batch_id, groups["multiple_choice"])
+
+        await asyncio.gather(*(
+            self._grade_group(batch_id, kind, groups[kind])
+            for kind in SUBMISSION_TYPES if groups[kind]
+        ))
+        await asyncio.to_thread(self.store.finish_job, batch_id)
+
+    async def _grade_group(self, batch_id, kind, items):
+        model = SUBMISSION_MODELS[kind]
+
+        async def grade_one(index, payload):
+            async with self.semaphore:
+                try:
+                    result = await self.grade(kind, model.model_validate(payload))
+                    await asyncio.to_thread(
+                        self.store.record_result, batch_id, index, result.model_dump(mode="json")
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Batch {batch_id} item {index} failed: {e}")
+                    await asyncio.to_thread(self.store.record_result, batch_id, index, error=str(e))
+
+        await asyncio.gather(*(grade_one(index, payload) for index, payload in items))
+
+    async def _grade_choices(self, batch_id, items):
+        """
+        Score multiple-choice items that carry their options, all items of one
+        answer key as sheets of a single pass; returns the items left for the
+        regular graders
+        """
+        by_key = defaultdict(list)
+        outcomes = []
+        rest = []
+        for index, payload in items:
+            found = choice_question(payload)
+            if found is None:
+                rest.append((index, payload))
+                continue
+            question, selection = found
+            try:
+                key = self.answer_keys.get([question])
+            except ValueError as e:
+                outcomes.append((index, None, str(e)))
+                continue
+            by_key[key].append((index, payload, {question["question_id"]: selection}))
+
+        for key, entries in by_key.items():
+            _, totals, max_score = await asyncio.to_thread(key.grade, [sheet for _, _, sheet in entries])
+            for (index, payload, _), total in zip(entries, totals):
+                try:
+                    submission = SUBMISSION_MODELS["multiple_choice"].model_validate(payload)
+                    result = direct_result(
+                        submission, float(total) / max_score, "Scored against the answer key", "answer_key"
+                    )
+                    outcomes.append((index, result.model_dump(mode="json"), None))
+                except Exception as e:
+                    logger.error(f"Batch {batch_id} item {index} failed: {e}")
+                    outcomes.append((index, None, str(e)))
+
+        if outcomes:
+            await asyncio.to_thread(self.store.record_results, batch_id, outcomes)
+        return rest
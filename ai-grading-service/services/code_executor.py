@@ -0,0 +1,329 @@
+"""
+Sandboxed execution of CodingQuestion test cases
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .result_cache import ResultCache, normalize_code
+from .runtime_pools import ColdPool, WarmPythonPool, pool_sizes
+from .sandbox import EXECUTION_WORK_DIR, SandboxUsers, give_to, limit_status, ping, reap, run_sandboxed
+from ..models.execution_models import ExecutionResult, TestCaseResult
+
+logger = logging.getLogger(__name__)
+
+# Sandbox supervisor processes for compiling and for cold-started runtimes
+EXECUTION_WORKERS = int(os.getenv("EXECUTION_WORKERS", str(os.cpu_count() or 1)))
+EXECUTION_COMPILE_TIMEOUT = int(os.getenv("EXECUTION_COMPILE_TIMEOUT", "30"))
+TEST_RESULT_CACHE_TTL = int(os.getenv("TEST_RESULT_CACHE_TTL", "86400"))
+
+# Outcomes that depend only on the code and the test; timeouts and sandbox errors can be load-dependent
+CACHEABLE_STATUSES = ("passed", "wrong_answer", "runtime_error", "memory_limit", "output_limit")
+
+# source: file the code is written to; compile/run: commands (memory_mb is filled in);
+# limit_address_space: false for runtimes that reserve far more virtual memory than they use;
+# warm: served by pre-started fork servers instead of a new process per test
+LANGUAGES = {
+    "python": {
+        "source": "main.py",
+        "run": ["python3", "-I", "-S", "main.py"],
+        "limit_address_space": True,
+        "memory_markers": ("MemoryError",),
+        "warm": True,
+    },
+    "javascript": {
+        "source": "main.js",
+        "run": ["node", "--max-old-space-size={memory_mb}", "main.js"],
+        "limit_address_space": False,
+        "memory_markers": ("heap out of memory",),
+        "warm": False,
+    },
+    "java": {
+        "source": "Main.java",
+        "compile": ["javac", "-J-Xmx256m", "-J-XX:TieredStopAtLevel=1", "Main.java"],
+        # C1-only JIT and class data sharing cut JVM start-up for short test runs
+        "run": [
+            "java", "-Xmx{memory_mb}m", "-Xss64m", "-XX:+UseSerialGC",
+            "-XX:TieredStopAtLevel=1", "-Xshare:auto", "Main"
+        ],
+        "limit_address_space": False,
+        "memory_markers": ("OutOfMemoryError",),
+        "warm": False,
+    },
+}
+
+
+def test_hash(case, hidden):
+    return hashlib.sha256(
+        json.dumps([case.input, case.expected_output, hidden], separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+def test_result_key(code_hash, case_hash, language, time_limit, memory_limit):
+    """Cache key for one test's outcome: normalized code, test case, language and limits"""
+    return hashlib.sha256(f"{code_hash}:{case_hash}:{language}:{time_limit}:{memory_limit}".encode()).hexdigest()
+
+
+class UnsupportedLanguage(Exception):
+    """Raised for a language the execution engine cannot run"""
+
+
+def outputs_match(actual, expected):
+    """Compare program output ignoring trailing whitespace and line-ending differences"""
+    def normalize(text):
+        return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").split("\n")).rstrip()
+    return normalize(actual) == normalize(expected)
+
+
+class CodeExecutionEngine:
+    """
+    Runs a submission against its test cases on per-language pools of
+    sandboxed runtimes. Every test case runs in its own child process with
+    CPU, memory, output, file and process limits, no network and an
+    unprivileged uid no other live sandbox shares, in a private copy of the
+    submission's workspace; test cases of one submission run in parallel
+    across the language's pool.
+    """
+
+    def __init__(self, workers=EXECUTION_WORKERS, test_cache=None):
+        self.workers = workers
+        self.pool = None
+        self.runtimes = {}
+        self.users = None
+        self.ready = False
+        self.test_cache = test_cache or ResultCache(ttl=TEST_RESULT_CACHE_TTL, key_prefix="grading:test:")
+        self.executions = 0
+        self.tests_run = 0
+
+    async def start(self):
+        # Small spawned workers fork far faster than the model-laden service process
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, ping) for _ in range(self.workers)))
+
+        self.users = SandboxUsers()
+        if not self.users.enabled:
+            logger.warning("Not running as root: sandboxes share the service's uid")
+        size_for = pool_sizes(self.workers)
+        for language, spec in LANGUAGES.items():
+            if spec["warm"]:
+                runtime = WarmPythonPool(language, size_for(language), self.users)
+            else:
+                runtime = ColdPool(language, size_for(language), self.pool, self.users)
+            try:
+                await runtime.start()
+            except Exception as e:
+                logger.error(f"Could not start {language} runtimes, using cold starts: {e}")
+                await runtime.stop()
+                runtime = ColdPool(language, size_for(language), self.pool, self.users)
+            self.runtimes[language] = runtime
+        self.ready = True
+
+    async def stop(self):
+        for runtime in self.runtimes.values():
+            await runtime.stop()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        await self.test_cache.close()
+
+    def is_ready(self):
+        return self.ready
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "executions": self.executions,
+            "tests_run": self.tests_run,
+            "pools": {language: runtime.stats() for language, runtime in self.runtimes.items()},
+            "sandbox_users": self.users.stats() if self.users else None,
+            "test_cache": self.test_cache.stats(),
+        }
+
+    async def execute(self, request):
+        """Run every test case of the request and return an ExecutionResult"""
+        async for event in self.execute_stream(request):
+            if isinstance(event, ExecutionResult):
+                return event
+
+    async def execute_stream(self, request):
+        """
+        Yield a TestCaseResult per test case as soon as it is known, then the
+        ExecutionResult. Outcomes cached for the same code, test and limits
+        come first; the rest run with tests this candidate previously failed
+        first, then tests they have not run yet, then ones they passed.
+        """
+        spec = LANGUAGES.get(request.language)
+        if spec is None:
+            raise UnsupportedLanguage(f"Unsupported language: {request.language}")
+
+        started = time.perf_counter()
+        cases = [(case, False) for case in request.test_cases] + [(case, True) for case in request.hidden_test_cases]
+        code_hash = hashlib.sha256(normalize_code(request.code).encode()).hexdigest()
+        test_hashes = [test_hash(case, hidden) for case, hidden in cases]
+        cache_keys = [
+            test_result_key(code_hash, digest, request.language, request.execution_time_limit, request.memory_limit)
+            for digest in test_hashes
+        ]
+        history_key = self._history_key(request)
+        history = (await self.test_cache.get(history_key) or {}) if history_key else {}
+
+        results = {}
+        for index, cached in enumerate(await asyncio.gather(*(self.test_cache.get(key) for key in cache_keys))):
+            if cached is not None:
+                results[index] = TestCaseResult.model_validate(
+                    {**cached, "index": index, "hidden": cases[index][1], "cached": True}
+                )
+                yield results[index]
+
+        pending = [index for index in range(len(cases)) if index not in results]
+        # Unseen tests have no entry in history: failed (False) < unseen < passed (True)
+        pending.sort(key=lambda index: {False: 0, None: 1, True: 2}[history.get(test_hashes[index])])
+
+        compile_error = None
+        stop_early = request.stop_on_first_failure and any(not result.passed for result in results.values())
+        if pending and not stop_early:
+            workspace = await asyncio.to_thread(self._prepare_workspace, spec, request.code)
+            try:
+                compile_error = await self._compile(spec, workspace)
+                if compile_error is not None:
+                    for index in pending:
+                        results[index] = TestCaseResult(
+                            index=index, hidden=cases[index][1], status="compile_error", passed=False
+                        )
+                        yield results[index]
+                else:
+                    runs = self._run_cases(spec, workspace, cases, pending, request)
+                    try:
+                        async for result in runs:
+                            results[result.index] = result
+                            if result.status in CACHEABLE_STATUSES:
+                                await self.test_cache.set(
+                                    cache_keys[result.index], result.model_dump(exclude={"index", "hidden", "cached"})
+                                )
+                            yield result
+                    finally:
+                        # Also when the client went away mid-stream: runs still using
+                        # the workspace are stopped before it is removed
+                        await runs.aclose()
+            finally:
+                await asyncio.to_thread(shutil.rmtree, workspace, True)
+
+        for index, (_, hidden) in enumerate(cases):
+            if index not in results:
+                results[index] = TestCaseResult(index=index, hidden=hidden, status="skipped", passed=False)
+                yield results[index]
+
+        if history_key:
+            for index, result in results.items():
+                if result.status != "skipped":
+                    history[test_hashes[index]] = result.passed
+            await self.test_cache.set(history_key, history)
+
+        self.executions += 1
+        ordered = [results[index] for index in range(len(cases))]
+        passed = sum(1 for result in ordered if result.passed)
+        yield ExecutionResult(
+            language=request.language,
+            status="compile_error" if compile_error is not None else ("passed" if passed == len(ordered) else "failed"),
+            passed=passed,
+            total=len(ordered),
+            cached=sum(1 for result in ordered if result.cached),
+            time_ms=round((time.perf_counter() - started) * 1000, 2),
+            compile_error=compile_error,
+            results=ordered,
+        )
+
+    def _history_key(self, request):
+        # Candidate and question ids are only unique within their tenant's schema
+        if not (request.schema_name and request.candidate_id and request.question_id):
+            return None
+        return f"history:{request.schema_name}:{request.candidate_id}:{request.question_id}:{request.language}"
+
+    def _prepare_workspace(self, spec, code):
+        # 0o700 and owned by the service: sandboxes only ever see private copies
+        workspace = tempfile.mkdtemp(dir=EXECUTION_WORK_DIR, prefix="submission-")
+        path = os.path.join(workspace, spec["source"])
+        with open(path, "w") as f:
+            f.write(code)
+        os.chmod(path, 0o600)
+        return workspace
+
+    async def _compile(self, spec, workspace):
+        if "compile" not in spec:
+            return None
+        loop = asyncio.get_running_loop()
+        async with self.users.lease() as uid:
+            # The compiler writes class files next to the source, so it gets the workspace itself
+            await asyncio.to_thread(give_to, workspace, uid)
+            try:
+                outcome = await loop.run_in_executor(
+                    self.pool, run_sandboxed, spec["compile"], workspace, "",
+                    EXECUTION_COMPILE_TIMEOUT, 0, False, uid, False
+                )
+            finally:
+                if uid is not None:
+                    # Nothing of the compile may hold on to the workspace once it is taken back
+                    await asyncio.to_thread(reap, uid)
+                    await asyncio.to_thread(give_to, workspace, os.geteuid())
+        if outcome["status"] != "ok":
+            return outcome["stderr"] or outcome["status"]
+        return None
+
+    async def _run_cases(self, spec, workspace, cases, indexes, request):
+        """Run the given test cases, started in the order given, yielding results as they finish"""
+        runtime = self.runtimes[request.language]
+        command = [part.format(memory_mb=request.memory_limit) for part in spec["run"]]
+        # Pools hand out runtimes first come first served, so creation order is run order
+        futures = {
+            asyncio.create_task(runtime.run(
+                spec, command, workspace, cases[index][0].input, request.execution_time_limit, request.memory_limit
+            )): index
+            for index in indexes
+        }
+
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                failed = False
+                for future in done:
+                    index = futures[future]
+                    case, hidden = cases[index]
+                    result = self._case_result(index, case, hidden, future.result(), spec)
+                    self.tests_run += 1
+                    failed = failed or not result.passed
+                    yield result
+
+                if request.stop_on_first_failure and failed:
+                    break
+        finally:
+            # Queued tests never start; running ones are killed. Either way they are
+            # finished before this returns and the caller removes the workspace.
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _case_result(self, index, case, hidden, outcome, spec):
+        status = limit_status(outcome, spec["memory_markers"])
+        if status == "ok":
+            status = "passed" if outputs_match(outcome["stdout"], case.expected_output) else "wrong_answer"
+
+        return TestCaseResult(
+            index=index,
+            hidden=hidden,
+            status=status,
+            passed=status == "passed",
+            time_ms=outcome["time_ms"],
+            cpu_ms=outcome["cpu_ms"],
+            output=None if hidden else outcome["stdout"],
+            expected_output=None if hidden else case.expected_output,
+            error=None if hidden or status == "passed" else outcome["stderr"] or None,
+        )
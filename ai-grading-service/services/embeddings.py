@@ -0,0 +1,45 @@
+"""
+Sentence embeddings for reference answers and rubric items
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+
+class EmbeddingEngine:
+    """Encodes texts as unit-length vectors, so a dot product is the cosine similarity"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.model = None
+
+    async def initialize(self):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(self.model_name)
+        logger.info(f"Loaded embedding model {self.model_name}")
+
+    def is_ready(self):
+        return self.model is not None
+
+    async def encode(self, texts):
+        """float32 matrix with one normalized row per text"""
+        return self.model.encode(
+            list(texts),
+            batch_size=EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+    async def get_model_status(self):
+        return {
+            "model": self.model_name,
+            "loaded": self.is_ready(),
+            "dimension": self.model.get_sentence_embedding_dimension() if self.model else None,
+        }
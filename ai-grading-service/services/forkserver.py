@@ -0,0 +1,138 @@
+"""
+Warm Python runtime for the code execution sandbox.
+
+Started (already sandboxed) by WarmPythonPool with a unix socket on fd 3.
+Each job arrives as one JSON line with the stdin/stdout/stderr file
+descriptors attached; the server forks a fresh child per job, so nothing
+one submission does can leak into the next, and replies with the child's
+exit status and resource usage. Started with "reap" when it has a uid of
+its own, it then kills anything the job left running before replying, so
+nothing outlives its job. Standard library modules candidates
+commonly use are imported up front so children start with them loaded.
+"""
+
+import array
+import ctypes
+import json
+import os
+import resource
+import runpy
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# Preloaded for the forked children
+import bisect  # noqa: F401
+import collections  # noqa: F401
+import functools  # noqa: F401
+import heapq  # noqa: F401
+import itertools  # noqa: F401
+import math  # noqa: F401
+import re  # noqa: F401
+import string  # noqa: F401
+
+POLL_INTERVAL = 0.001
+PR_SET_DUMPABLE = 4
+
+
+def receive(channel):
+    """Next job and its three file descriptors, or (None, []) when the pool closed the socket"""
+    fds = array.array("i")
+    data, ancillary, _, _ = channel.recvmsg(65536, socket.CMSG_SPACE(3 * fds.itemsize))
+    if not data:
+        return None, []
+    for level, kind, payload in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[:len(payload) - len(payload) % fds.itemsize])
+    return json.loads(data), list(fds)
+
+
+def run_child(job, fds):
+    """In the forked child: apply the job's limits and run the submission as __main__"""
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+    resource.setrlimit(resource.RLIMIT_CPU, (job["cpu_seconds"], job["cpu_seconds"] + 1))
+    if job["memory_bytes"]:
+        resource.setrlimit(resource.RLIMIT_AS, (job["memory_bytes"], job["memory_bytes"]))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (job["output_bytes"], job["output_bytes"]))
+    os.chdir(job["workspace"])
+
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", closefd=False)
+    sys.argv = [job["source"]]
+    code = 0
+    try:
+        runpy.run_path(job["source"], run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except BaseException:
+            pass
+    os._exit(code)
+
+
+def supervise(pid, wall_seconds):
+    """Wait for the child, killing it at the wall-clock deadline"""
+    started = time.perf_counter()
+    deadline = started + wall_seconds
+    timed_out = False
+    while True:
+        waited, status, usage = os.wait4(pid, os.WNOHANG)
+        if waited:
+            break
+        if time.perf_counter() >= deadline:
+            os.kill(pid, signal.SIGKILL)
+            waited, status, usage = os.wait4(pid, 0)
+            timed_out = True
+            break
+        time.sleep(POLL_INTERVAL)
+
+    return {
+        "returncode": -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status),
+        "timed_out": timed_out,
+        "time_ms": round((time.perf_counter() - started) * 1000, 2),
+        "cpu_ms": round((usage.ru_utime + usage.ru_stime) * 1000, 2),
+        "max_rss_kb": usage.ru_maxrss,
+    }
+
+
+def reap():
+    """Kill every other process of this uid: stragglers the last job forked"""
+    try:
+        os.kill(-1, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def main():
+    channel = socket.socket(fileno=int(sys.argv[1]))
+    reaps = sys.argv[2:] == ["reap"]
+    # Jobs run as this server's uid; without this they could ptrace it and tamper with later jobs
+    ctypes.CDLL(None).prctl(PR_SET_DUMPABLE, 0, 0, 0, 0)
+    while True:
+        job, fds = receive(channel)
+        if job is None:
+            return
+        pid = os.fork()
+        if pid == 0:
+            channel.close()
+            run_child(job, fds)
+        for fd in fds:
+            os.close(fd)
+        result = supervise(pid, job["wall_seconds"])
+        if reaps:
+            reap()
+        channel.sendall(json.dumps(result).encode() + b"\n")
+
+
+if __name__ == "__main__":
+    main()
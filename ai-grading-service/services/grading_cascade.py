@@ -0,0 +1,211 @@
+"""
+Confidence-gated cascade from a cheap local grader to the configured model
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, deque
+
+from pydantic import ValidationError
+
+from .grading_pipeline import direct_result
+from .micro_batcher import METRICS_WINDOW, percentile
+from .result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+GRADING_CASCADE_ENABLED = os.getenv("GRADING_CASCADE_ENABLED", "true").lower() == "true"
+# Used for tenants that have not sent their settings
+DEFAULT_REVIEW_THRESHOLD = float(os.getenv("DEFAULT_REVIEW_THRESHOLD", "0.7"))
+DEFAULT_CONFIDENCE_BAND = float(os.getenv("DEFAULT_CONFIDENCE_BAND", "0.15"))
+TENANT_SETTINGS_TTL = int(os.getenv("TENANT_SETTINGS_TTL", str(30 * 86400)))
+TENANT_SETTINGS_LOCAL_TTL = int(os.getenv("TENANT_SETTINGS_LOCAL_TTL", "60"))
+
+# Similarity to the closest reference that counts as no credit / full credit
+SIMILARITY_FLOOR = float(os.getenv("CASCADE_SIMILARITY_FLOOR", "0.2"))
+SIMILARITY_CEILING = float(os.getenv("CASCADE_SIMILARITY_CEILING", "0.85"))
+
+DEFAULT_SETTINGS = {
+    "ai_grading_model": None,
+    "manual_review_threshold": DEFAULT_REVIEW_THRESHOLD,
+    "confidence_band": DEFAULT_CONFIDENCE_BAND,
+}
+
+# Submission fields carrying the tenant's schema name, which the backend keys settings
+# and references by, and the answer text
+TENANT_FIELDS = ("schema_name",)
+ANSWER_FIELDS = ("answer", "text", "response", "content")
+
+
+def _first_field(submission, fields):
+    for field in fields:
+        value = getattr(submission, field, None)
+        if value:
+            return str(value)
+    return None
+
+
+def escalates(confidence, threshold, band):
+    """Whether the configured model should decide: confidence not clearly above the review threshold"""
+    return confidence < threshold + band
+
+
+def with_model(submission, model):
+    """The submission with the tenant's configured model, if its schema has a field for one"""
+    if model and "model" in type(submission).model_fields:
+        return submission.model_copy(update={"model": model})
+    return submission
+
+
+class TenantGradingSettings:
+    """
+    Per-tenant cascade settings, pushed by the backend whenever TenantSettings
+    is saved; kept in Redis so every service instance sees them.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or ResultCache(
+            ttl=TENANT_SETTINGS_TTL, local_ttl=TENANT_SETTINGS_LOCAL_TTL, key_prefix="grading:tenant-settings:"
+        )
+
+    async def get(self, tenant):
+        stored = await self.cache.get(tenant) if tenant else None
+        return {**DEFAULT_SETTINGS, **(stored or {})}
+
+    async def set(self, tenant, settings):
+        await self.cache.set(tenant, settings)
+
+    async def close(self):
+        await self.cache.close()
+
+
+class ReferenceSimilarityGrader:
+    """
+    Cheap tier for text answers: one embedding of the answer against the
+    question's indexed references. Its confidence is how far the score sits
+    from the undecided middle. Abstains (None) when there is nothing indexed.
+    """
+
+    def __init__(self, executor, index):
+        self.executor = executor
+        self.index = index
+
+    async def __call__(self, submission):
+        tenant = _first_field(submission, TENANT_FIELDS)
+        question_id = _first_field(submission, ("question_id",))
+        answer = _first_field(submission, ANSWER_FIELDS)
+        if not (tenant and question_id and answer):
+            return None
+        # The index reads its manifest and memmap from disk
+        entry = await asyncio.to_thread(lambda: self.index.tenant(tenant).entry(question_id))
+        if entry is None:
+            return None
+
+        vector = (await self.executor.run("embeddings", "encode", [answer]))[0]
+        scores = await asyncio.to_thread(self.index.similarity, tenant, question_id, vector)
+        if not scores:
+            return None
+        best = max(scores, key=lambda score: score["similarity"])
+        fraction = (best["similarity"] - SIMILARITY_FLOOR) / (SIMILARITY_CEILING - SIMILARITY_FLOOR)
+        fraction = min(1.0, max(0.0, fraction))
+        return fraction, abs(2 * fraction - 1), {"closest_reference": best["label"], "similarities": scores}
+
+
+class _TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.answered = 0
+        self.latencies_ms = deque(maxlen=METRICS_WINDOW)
+
+    def stats(self):
+        latencies = list(self.latencies_ms)
+        return {
+            "calls": self.calls,
+            "answered": self.answered,
+            "hit_rate": round(self.answered / self.calls, 4) if self.calls else 0.0,
+            "avg_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+        }
+
+
+class GradingCascade:
+    """
+    Grades with a cheap local tier first and calls the full grader (the
+    tenant's ai_grading_model) only when the cheap tier abstains or its
+    confidence is below manual_review_threshold + confidence_band. Only
+    local verdicts confidently above the review threshold are returned as
+    they are; anything the cheap tier is less sure of is graded in full.
+    """
+
+    def __init__(self, fast_graders, full_graders, settings=None, enabled=GRADING_CASCADE_ENABLED):
+        self.fast_graders = fast_graders
+        self.full_graders = full_graders
+        self.settings = settings or TenantGradingSettings()
+        self.enabled = enabled
+        self.tiers = {"local": _TierStats(), "full": _TierStats()}
+        self.outcomes = Counter()
+
+    def grader(self, kind):
+        """Grader for GradingPipeline: kind's submissions through the cascade"""
+        return lambda submission: self.grade(kind, submission)
+
+    async def grade(self, kind, submission):
+        config = await self.settings.get(_first_field(submission, TENANT_FIELDS))
+        fast = self.fast_graders.get(kind) if self.enabled else None
+
+        if fast is not None:
+            tier = self.tiers["local"]
+            tier.calls += 1
+            started = time.perf_counter()
+            try:
+                verdict = await fast(submission)
+            except Exception as e:
+                logger.warning(f"Local {kind} grader failed, escalating: {e}")
+                verdict = None
+            tier.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+            if verdict is None:
+                self.outcomes["abstained"] += 1
+            else:
+                fraction, confidence, details = verdict
+                if escalates(confidence, config["manual_review_threshold"], config["confidence_band"]):
+                    self.outcomes["escalated"] += 1
+                else:
+                    try:
+                        result = direct_result(
+                            submission, fraction, "Scored against the question's reference answers",
+                            "local", confidence, {"cascade": details}
+                        )
+                    except ValidationError as e:
+                        logger.warning(f"Local verdict does not fit GradingResult, escalating: {e}")
+                        self.outcomes["unbuildable"] += 1
+                    else:
+                        tier.answered += 1
+                        self.outcomes["local"] += 1
+                        return result
+
+        tier = self.tiers["full"]
+        tier.calls += 1
+        started = time.perf_counter()
+        try:
+            result = await self.full_graders[kind](with_model(submission, config["ai_grading_model"]))
+            tier.answered += 1
+            self.outcomes["full"] += 1
+            return result
+        finally:
+            tier.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+    async def stop(self):
+        await self.settings.close()
+
+    def stats(self):
+        graded = self.outcomes["local"] + self.outcomes["full"]
+        return {
+            "enabled": self.enabled,
+            "tiers": {name: tier.stats() for name, tier in self.tiers.items()},
+            "outcomes": dict(self.outcomes),
+            "local_share": round(self.outcomes["local"] / graded, 4) if graded else 0.0,
+        }
@@ -0,0 +1,219 @@
+"""
+Runs model inference off the asyncio event loop
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+# 0 keeps inference in the event loop process (useful for development)
+INFERENCE_PROCESS_WORKERS = int(os.getenv("INFERENCE_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_THREAD_WORKERS = int(os.getenv("INFERENCE_THREAD_WORKERS", "8"))
+# Calls allowed to wait for or occupy a worker before new requests get 429
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+# spawn avoids forking a parent that may already hold torch/OpenMP threads
+INFERENCE_START_METHOD = os.getenv("INFERENCE_START_METHOD", "spawn")
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference queue is full and the request should be retried later"""
+
+
+# Per worker process: the registry of lazily loaded engines, and a loop to drive their coroutines
+_worker_registry = None
+_worker_loop = None
+
+
+def _init_worker(engine_factories):
+    """Set up the worker's model registry and load the warm-up list"""
+    global _worker_loop, _worker_registry
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_registry = ModelRegistry(engine_factories)
+    _worker_loop.run_until_complete(_worker_registry.warm_up())
+
+
+def _worker_status():
+    return _worker_registry.status()
+
+
+def _engine_status(engine_name):
+    return _worker_loop.run_until_complete(_worker_registry.engine_status(engine_name))
+
+
+def _run_engine_method(engine_name, method, args):
+    result = _worker_loop.run_until_complete(_worker_registry.run(engine_name, method, *args))
+    # Registry state rides back with each result, so the parent can report it without asking
+    return result, _worker_registry.status()
+
+
+def _run_engine_batch(engine_name, batch_method, item_method, items):
+    results = _worker_loop.run_until_complete(
+        _worker_registry.run_batch(engine_name, batch_method, item_method, items)
+    )
+    return results, _worker_registry.status()
+
+
+class InferenceExecutor:
+    """
+    Process pool for model inference, with each worker loading engines into
+    its own ModelRegistry (warm-up list at start, the rest on first use), and
+    a bounded thread pool installed as the event loop's default executor for
+    blocking I/O (asyncio.to_thread, run_in_executor).
+
+    At most max_queue calls wait for or occupy a worker. Interactive requests
+    go through admit() first and are turned away with ExecutorSaturated when
+    the queue is full; internal callers (batch jobs, micro-batches already
+    admitted) simply wait for a slot. start() may run in the background:
+    calls made before it finishes hold their slot until the workers are up.
+    """
+
+    def __init__(self, engine_factories, process_workers=INFERENCE_PROCESS_WORKERS,
+                 thread_workers=INFERENCE_THREAD_WORKERS, max_queue=INFERENCE_MAX_QUEUE):
+        self.engine_factories = engine_factories
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.max_queue = max_queue
+        self.process_pool = None
+        self.thread_pool = None
+        # In-process registry when process_workers is 0
+        self.registry = None
+        # Latest registry status reported by each worker, by pid
+        self.worker_models = {}
+        self.slots = asyncio.Semaphore(max_queue)
+        self.started = asyncio.Event()
+        self.start_error = None
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def start(self):
+        try:
+            await self._start()
+        except Exception as e:
+            self.start_error = e
+            logger.error(f"Inference workers failed to start: {e}")
+            raise
+        finally:
+            self.started.set()
+
+    async def _start(self):
+        loop = asyncio.get_running_loop()
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="grading-io")
+        loop.set_default_executor(self.thread_pool)
+
+        if self.process_workers > 0:
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context(INFERENCE_START_METHOD),
+                initializer=_init_worker,
+                initargs=(self.engine_factories,),
+            )
+            # Start every worker now so warm-up loading does not land on the first requests
+            statuses = await asyncio.gather(*(
+                loop.run_in_executor(self.process_pool, _worker_status) for _ in range(self.process_workers)
+            ))
+            for status in statuses:
+                self.worker_models[status["pid"]] = status
+            logger.info(f"Inference workers ready: {sorted(self.worker_models)}")
+        else:
+            self.registry = ModelRegistry(self.engine_factories)
+            await self.registry.warm_up()
+
+    async def stop(self):
+        if self.process_pool:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+        if self.thread_pool:
+            self.thread_pool.shutdown(wait=False, cancel_futures=True)
+
+    def is_ready(self, engine_name=None):
+        """Whether workers are up to take calls (for the engine, which loads on first use if needed)"""
+        if not self.started.is_set() or self.start_error is not None:
+            return False
+        return engine_name is None or engine_name in self.engine_factories
+
+    def is_loaded(self, engine_name):
+        """Whether the engine is loaded in this process or in any worker that has reported"""
+        if self.registry is not None:
+            return self.registry.is_loaded(engine_name)
+        return any(
+            status["models"][engine_name]["state"] == "loaded" for status in self.worker_models.values()
+        )
+
+    def admit(self):
+        """Reject a new request up front when every queue slot is taken"""
+        if self.slots.locked():
+            self.rejected += 1
+            raise ExecutorSaturated("Inference queue is full, retry later")
+
+    async def run(self, engine_name, method, *args):
+        """Run an engine coroutine method in a model worker and await its result"""
+        async with _Slot(self):
+            if self.process_pool is None:
+                return await self.registry.run(engine_name, method, *args)
+            loop = asyncio.get_running_loop()
+            result, status = await loop.run_in_executor(
+                self.process_pool, _run_engine_method, engine_name, method, args
+            )
+            self.worker_models[status["pid"]] = status
+            return result
+
+    async def run_batch(self, engine_name, batch_method, item_method, items):
+        """Run a list of items through an engine's batched method in a model worker"""
+        async with _Slot(self):
+            if self.process_pool is None:
+                return await self.registry.run_batch(engine_name, batch_method, item_method, items)
+            loop = asyncio.get_running_loop()
+            results, status = await loop.run_in_executor(
+                self.process_pool, _run_engine_batch, engine_name, batch_method, item_method, items
+            )
+            self.worker_models[status["pid"]] = status
+            return results
+
+    async def engine_status(self, engine_name):
+        """An engine's get_model_status() from a worker that has it loaded, without loading it"""
+        if self.registry is not None:
+            return await self.registry.engine_status(engine_name)
+        if not self.is_loaded(engine_name):
+            return {"loaded": False}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool, _engine_status, engine_name)
+
+    def model_status(self):
+        """Load state, footprint and last use of each engine, per process holding models"""
+        if self.registry is not None:
+            return {"in_process": self.registry.status()}
+        return {f"worker-{pid}": status for pid, status in sorted(self.worker_models.items())}
+
+    def stats(self):
+        return {
+            "process_workers": self.process_workers,
+            "thread_workers": self.thread_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+class _Slot:
+    """Holds one queue slot for the duration of a call"""
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    async def __aenter__(self):
+        await self.executor.slots.acquire()
+        self.executor.in_flight += 1
+        await self.executor.started.wait()
+        if self.executor.start_error is not None:
+            await self.__aexit__(None, None, None)
+            raise RuntimeError(f"Inference workers failed to start: {self.executor.start_error}")
+
+    async def __aexit__(self, *exc_info):
+        self.executor.in_flight -= 1
+        self.executor.slots.release()
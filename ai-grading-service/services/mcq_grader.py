@@ -0,0 +1,165 @@
+"""
+Vectorized multiple-choice grading from precompiled answer keys
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_OPTIONS = 64
+
+# all_or_nothing: full points only for exactly the correct selection
+# partial: (correct picks - wrong picks) / correct options, floored at zero
+# per_option: share of options marked correctly (selected if correct, left alone if not)
+SCHEMES = ("all_or_nothing", "partial", "per_option")
+
+# Where a single submission may carry its question's options and its selection;
+# nested under mcq_data (the backend's MultipleChoiceQuestion) or the question
+QUESTION_FIELDS = ("mcq_data", "question_data", "question")
+SELECTION_FIELDS = ("selected_options", "selected_option", "selected", "answer", "answers")
+
+# Set bits per byte, for popcounts over uint64 viewed as bytes
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def popcount(masks):
+    """Set bits in each element of a uint64 array"""
+    masks = np.ascontiguousarray(masks, dtype=np.uint64)
+    return _POPCOUNT[masks.view(np.uint8)].reshape(masks.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+class AnswerKey:
+    """
+    A question set's answer key as bitmasks: one uint64 per question, where
+    bit i is set if the question's i-th option is correct. Option ids are
+    mapped to bit positions once, so grading is pure array arithmetic.
+    """
+
+    def __init__(self, questions):
+        if not questions:
+            raise ValueError("An answer key needs at least one question")
+        self.question_ids = [str(question["question_id"]) for question in questions]
+        self.positions = {question_id: index for index, question_id in enumerate(self.question_ids)}
+        self.option_bits = []
+        correct = []
+        valid = []
+        for question in questions:
+            options = question["options"]
+            if len(options) > MAX_OPTIONS:
+                raise ValueError(f"Question {question['question_id']} has more than {MAX_OPTIONS} options")
+            bits = {str(option["id"]): 1 << index for index, option in enumerate(options)}
+            self.option_bits.append(bits)
+            correct.append(sum(bits[str(option["id"])] for option in options if option.get("is_correct")))
+            if not correct[-1]:
+                # Nothing could ever score, and per_option would reward leaving it alone
+                raise ValueError(f"Question {question['question_id']} has no correct option")
+            valid.append(sum(bits.values()))
+
+        self.correct = np.array(correct, dtype=np.uint64)
+        self.valid = np.array(valid, dtype=np.uint64)
+        self.correct_counts = np.maximum(popcount(self.correct), 1)
+        self.option_counts = np.maximum(popcount(self.valid), 1)
+        self.allow_multiple = np.array([bool(question.get("allow_multiple")) for question in questions])
+        self.points = np.array([float(question.get("points", 1)) for question in questions])
+
+    def encode(self, sheets):
+        """
+        Turn answer sheets ({question_id: [option ids]}) into a uint64 matrix
+        of selections, one row per sheet. Unknown questions and options are
+        ignored; a single-answer question with several picks counts as wrong.
+        """
+        selections = np.zeros((len(sheets), len(self.question_ids)), dtype=np.uint64)
+        for row, answers in enumerate(sheets):
+            for question_id, chosen in answers.items():
+                column = self.positions.get(str(question_id))
+                if column is None:
+                    continue
+                if isinstance(chosen, (str, int)):
+                    chosen = [chosen]
+                bits = self.option_bits[column]
+                selections[row, column] = sum(bits.get(str(option_id), 0) for option_id in set(map(str, chosen)))
+        return selections
+
+    def grade(self, sheets, scheme="all_or_nothing"):
+        """Score answer sheets; returns (per-question scores matrix, totals, max total)"""
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown scoring scheme: {scheme}")
+
+        selections = self.encode(sheets)
+        hits = popcount(selections & self.correct)
+        wrong = popcount(selections & ~self.correct & self.valid)
+
+        if scheme == "all_or_nothing":
+            fraction = (selections == self.correct).astype(float)
+        elif scheme == "partial":
+            fraction = np.clip((hits - wrong) / self.correct_counts, 0.0, 1.0)
+        else:
+            misses = self.correct_counts - hits
+            fraction = 1.0 - (wrong + misses) / self.option_counts
+            # Leaving every option alone is not an answer
+            fraction[selections == 0] = 0.0
+
+        # Single-answer questions: exactly one pick, and it must be the right one
+        single = ~self.allow_multiple
+        fraction[:, single] = (selections[:, single] == self.correct[single]) & (popcount(selections[:, single]) == 1)
+
+        scores = fraction * self.points
+        return scores, scores.sum(axis=1), float(self.points.sum())
+
+
+def choice_question(payload):
+    """
+    (question, selection) of a single multiple-choice submission's payload,
+    with question in the AnswerKey format, or None if the submission does
+    not carry its question's options.
+    """
+    question = None
+    for field in ("",) + QUESTION_FIELDS:
+        candidate = payload if not field else payload.get(field)
+        options = candidate.get("options") if isinstance(candidate, dict) else None
+        # Options as shown to the candidate, without is_correct, are no answer key
+        if isinstance(options, list) and any(isinstance(option, dict) and "is_correct" in option for option in options):
+            question = candidate
+            break
+    if question is None:
+        return None
+
+    selection = next((payload[field] for field in SELECTION_FIELDS if payload.get(field) is not None), [])
+    question_id = str(payload.get("question_id") or question.get("question_id") or question.get("id") or "question")
+    return {
+        "question_id": question_id,
+        "options": question["options"],
+        "allow_multiple": bool(question.get("allow_multiple")),
+    }, selection
+
+
+class AnswerKeyCache:
+    """Compiled answer keys by a fingerprint of their questions (LRU)"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.keys = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, questions):
+        fingerprint = hashlib.sha256(
+            json.dumps(questions, sort_keys=True, separators=(",", ":"), default=str).encode()
+        ).hexdigest()
+        key = self.keys.get(fingerprint)
+        if key is not None:
+            self.keys.move_to_end(fingerprint)
+            self.hits += 1
+            return key
+
+        self.misses += 1
+        key = AnswerKey(questions)
+        self.keys[fingerprint] = key
+        while len(self.keys) > self.max_entries:
+            self.keys.popitem(last=False)
+        return key
+
+    def stats(self):
+        return {"compiled_keys": len(self.keys), "hits": self.hits, "misses": self.misses}
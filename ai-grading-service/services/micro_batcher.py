@@ -0,0 +1,162 @@
+"""
+Dynamic micro-batching of concurrent model calls
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "16"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+# Batches of one batcher running at once; callers size it to the workers that run them
+MICRO_BATCH_MAX_IN_FLIGHT = int(os.getenv("MICRO_BATCH_MAX_IN_FLIGHT", "1"))
+
+# Number of recent requests/batches kept for latency percentiles
+METRICS_WINDOW = 2048
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sequence (0.0 if empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def call_engine_batch(engine, batch_method, item_method, items):
+    """
+    Run items through the engine's batched method (one padded forward pass
+    over all items) when it provides one, and otherwise fall back to calling
+    the per-item method concurrently. Tuple items are unpacked as positional
+    arguments.
+    """
+    batched = getattr(engine, batch_method, None)
+    if batched is not None:
+        return await batched(items)
+
+    single = getattr(engine, item_method)
+    return await asyncio.gather(*(
+        single(*item) if isinstance(item, tuple) else single(item)
+        for item in items
+    ))
+
+
+class MicroBatcher:
+    """
+    Queues concurrent requests for up to max_wait_ms (or until max_batch_size
+    requests are waiting), runs them through batch_fn as one batch and resolves
+    each caller's future with its own result. Up to max_in_flight batches run
+    at once, so every worker of a pool can be busy; while all are, requests
+    keep queueing and the next batch forms from them.
+
+    batch_fn must be a coroutine function taking a list of items and returning
+    a list of results in the same order.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=MICRO_BATCH_MAX_SIZE, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+                 max_in_flight=MICRO_BATCH_MAX_IN_FLIGHT):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue = None
+        self.worker = None
+        self.in_flight = None
+        self.batches = set()
+
+        self.total_requests = 0
+        self.total_batches = 0
+        self.latencies_ms = deque(maxlen=METRICS_WINDOW)
+        self.batch_sizes = deque(maxlen=METRICS_WINDOW)
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.in_flight = asyncio.Semaphore(self.max_in_flight)
+            self.worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def stop(self):
+        if self.worker:
+            self.worker.cancel()
+        for task in self.batches:
+            task.cancel()
+
+    def stats(self):
+        latencies = list(self.latencies_ms)
+        sizes = list(self.batch_sizes)
+        return {
+            "requests": self.total_requests,
+            "batches": self.total_batches,
+            "avg_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": len(self.batches),
+            "queued": self.queue.qsize() if self.queue else 0,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first, so requests arriving meanwhile join the next batch
+            await self.in_flight.acquire()
+            try:
+                batch = [await self.queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                self.in_flight.release()
+                raise
+            task = asyncio.create_task(self._execute(batch))
+            self.batches.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task):
+        self.batches.discard(task)
+        self.in_flight.release()
+
+    async def _execute(self, batch):
+        # Callers that gave up (client disconnect, timeout) are dropped from the batch
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        try:
+            results = await self.batch_fn([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        for (_, future, enqueued_at), result in zip(batch, results):
+            self.latencies_ms.append((now - enqueued_at) * 1000)
+            if not future.done():
+                future.set_result(result)
+
+        self.total_requests += len(batch)
+        self.total_batches += 1
+        self.batch_sizes.append(len(batch))
@@ -0,0 +1,217 @@
+"""
+Lazily loaded grading engines under a memory budget
+"""
+
+import asyncio
+import gc
+import importlib
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+from .micro_batcher import call_engine_batch
+
+logger = logging.getLogger(__name__)
+
+# Per process that loads models; 0 means no limit
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# Engines loaded when a process starts instead of on first use, e.g. "grading,embeddings"
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "grading")
+
+UNLOADED, LOADING, LOADED, FAILED = "unloaded", "loading", "loaded", "failed"
+
+
+def resident_memory_mb():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def resolve_factory(factory):
+    """A factory given as "module:attribute" (relative to this package) is imported only when needed"""
+    if not isinstance(factory, str):
+        return factory
+    module, _, attribute = factory.partition(":")
+    return getattr(importlib.import_module(module, __package__), attribute)
+
+
+def warmup_names(spec=MODEL_WARMUP):
+    return [name.strip() for name in spec.split(",") if name.strip()]
+
+
+class _Model:
+    def __init__(self, name):
+        self.name = name
+        self.engine = None
+        self.state = UNLOADED
+        self.lock = asyncio.Lock()
+        self.in_use = 0
+        self.memory_mb = None
+        self.load_ms = None
+        self.loaded_at = None
+        self.last_used = None
+        self.loads = 0
+        self.evictions = 0
+        self.error = None
+
+    def status(self):
+        return {
+            "state": self.state,
+            "memory_mb": round(self.memory_mb, 1) if self.memory_mb is not None else None,
+            "load_ms": self.load_ms,
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+            "in_use": self.in_use,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """
+    Engines by name, each created from its factory (a callable, or a
+    "module:Class" string so the engine's libraries are not imported before
+    it loads) and initialized on first use. When the resident footprint of loaded engines exceeds the budget,
+    the least recently used idle ones are unloaded; an engine evicted before
+    has its measured size freed up front before it loads again.
+    """
+
+    def __init__(self, factories, memory_budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.factories = factories
+        self.memory_budget_mb = memory_budget_mb
+        self.models = {name: _Model(name) for name in factories}
+
+    async def warm_up(self, names=None):
+        for name in warmup_names() if names is None else names:
+            if name not in self.models:
+                logger.warning(f"Unknown model in warm-up list: {name}")
+                continue
+            try:
+                await self.get(name)
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed: {e}")
+
+    async def get(self, name):
+        """The engine, loaded if it is not already"""
+        model = self.models[name]
+        if model.state != LOADED:
+            async with model.lock:
+                if model.state != LOADED:
+                    await self._load(model)
+        model.last_used = datetime.utcnow().isoformat()
+        return model.engine
+
+    async def run(self, name, method, *args):
+        """Call an engine coroutine method; the engine is not evicted while the call runs"""
+        model = self.models[name]
+        engine = await self.get(name)
+        model.in_use += 1
+        try:
+            return await getattr(engine, method)(*args)
+        finally:
+            model.in_use -= 1
+
+    async def run_batch(self, name, batch_method, item_method, items):
+        model = self.models[name]
+        engine = await self.get(name)
+        model.in_use += 1
+        try:
+            return await call_engine_batch(engine, batch_method, item_method, items)
+        finally:
+            model.in_use -= 1
+
+    async def engine_status(self, name):
+        """The engine's own get_model_status() if it is loaded; never loads it"""
+        model = self.models[name]
+        if model.state != LOADED:
+            return {"loaded": False}
+        return await model.engine.get_model_status()
+
+    def is_loaded(self, name):
+        return self.models[name].state == LOADED
+
+    async def evict(self, name):
+        model = self.models[name]
+        if model.state != LOADED or model.in_use:
+            return False
+        engine, model.engine = model.engine, None
+        model.state = UNLOADED
+        model.evictions += 1
+        close = getattr(engine, "close", None)
+        if close is not None:
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Error closing {name}: {e}")
+        del engine, close
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info(f"Evicted model {name}")
+        return True
+
+    def loaded_mb(self):
+        return sum(model.memory_mb or 0 for model in self.models.values() if model.state == LOADED)
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "memory_budget_mb": self.memory_budget_mb or None,
+            "loaded_mb": round(self.loaded_mb(), 1),
+            "resident_mb": round(resident_memory_mb(), 1),
+            "models": {name: model.status() for name, model in self.models.items()},
+        }
+
+    async def _load(self, model):
+        if model.memory_mb:
+            await self._make_room(model.memory_mb, keep=model.name)
+
+        model.state = LOADING
+        before = resident_memory_mb()
+        started = time.perf_counter()
+        try:
+            engine = resolve_factory(self.factories[model.name])()
+            await engine.initialize()
+        except Exception as e:
+            model.state = FAILED
+            model.error = str(e)
+            raise
+
+        model.engine = engine
+        model.state = LOADED
+        model.error = None
+        model.loads += 1
+        model.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        model.loaded_at = datetime.utcnow().isoformat()
+        model.memory_mb = max(resident_memory_mb() - before, 0.0)
+        logger.info(f"Loaded model {model.name} in {model.load_ms} ms ({model.memory_mb:.0f} MB)")
+        await self._make_room(0, keep=model.name)
+
+    async def _make_room(self, needed_mb, keep):
+        """Evict least recently used idle engines until needed_mb more fits in the budget"""
+        if not self.memory_budget_mb:
+            return
+        candidates = sorted(
+            (model for model in self.models.values() if model.state == LOADED and model.name != keep),
+            key=lambda model: model.last_used or "",
+        )
+        for model in candidates:
+            if self.loaded_mb() + needed_mb <= self.memory_budget_mb:
+                return
+            await self.evict(model.name)
+        if self.loaded_mb() + needed_mb > self.memory_budget_mb:
+            logger.warning(
+                f"Model memory {self.loaded_mb() + needed_mb:.0f} MB exceeds the "
+                f"{self.memory_budget_mb} MB budget; remaining models are in use"
+            )
@@ -0,0 +1,303 @@
+"""
+Cheap lexical and AST checks run before AI code grading
+"""
+
+import ast
+import io
+import logging
+import os
+import re
+import time
+import tokenize
+from collections import Counter
+
+from pydantic import ValidationError
+
+from .grading_pipeline import direct_result
+from .result_cache import normalize_code
+
+logger = logging.getLogger(__name__)
+
+# Larger submissions skip the pre-screen and go straight to full grading
+PRESCREEN_MAX_CODE_BYTES = int(os.getenv("PRESCREEN_MAX_CODE_BYTES", "200000"))
+PRESCREEN_ENABLED = os.getenv("PRESCREEN_ENABLED", "true").lower() == "true"
+
+LOOP_KEYWORDS = {"for", "while", "do"}
+
+# Languages whose comments and strings the C-like tokenizer understands
+C_LIKE_LANGUAGES = {"java", "c", "cpp", "c++", "csharp", "c#", "go", "javascript", "typescript"}
+# Where an unbalanced bracket is certainly a syntax error; JavaScript regex
+# literals such as /\)/ would look like one
+SYNTAX_CHECKED_LANGUAGES = {"python", "java", "c", "cpp", "c++", "csharp", "c#", "go"}
+BRACKETS = {")": "(", "]": "[", "}": "{"}
+
+# Strings, comments, then words and single punctuation characters, for C-like languages
+_TOKEN = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`'
+    r"|//[^\n]*|/\*.*?\*/"
+    r"|(?P<word>[A-Za-z_$][A-Za-z0-9_$]*)|(?P<symbol>[^\sA-Za-z0-9_$])",
+    re.S,
+)
+
+# Loop nesting depth implied by an expected complexity such as "O(n^2)" or "O(n log n)"
+_COMPLEXITY_DEPTH = [
+    (re.compile(r"n\s*(\^|\*\*)\s*3|n³"), 3),
+    (re.compile(r"n\s*(\^|\*\*)\s*2|n²|n\s*\*\s*m|n\s*\*\s*n"), 2),
+    (re.compile(r"n\s*\*?\s*log"), 1),
+    (re.compile(r"log|\b1\b"), 0),
+    (re.compile(r"\bn\b|\bm\b"), 1),
+]
+
+
+def expected_loop_depth(complexity):
+    """Deepest loop nesting an expected complexity allows, or None if it cannot be read"""
+    if not complexity:
+        return None
+    text = complexity.lower()
+    for pattern, depth in _COMPLEXITY_DEPTH:
+        if pattern.search(text):
+            return depth
+    return None
+
+
+class _PythonLoops(ast.NodeVisitor):
+    """Deepest nesting of loops and comprehensions, and functions that call themselves"""
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+        self.functions = []
+        self.recursive = set()
+
+    def _loop(self, node, levels=1):
+        self.depth += levels
+        self.max_depth = max(self.max_depth, self.depth)
+        self.generic_visit(node)
+        self.depth -= levels
+
+    def visit_For(self, node):
+        self._loop(node)
+
+    visit_AsyncFor = visit_While = visit_For
+
+    def visit_ListComp(self, node):
+        self._loop(node, len(node.generators))
+
+    visit_SetComp = visit_DictComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_FunctionDef(self, node):
+        # A nested function's loops run when it is called, not where it is defined
+        depth, self.depth = self.depth, 0
+        self.functions.append(node.name)
+        self.generic_visit(node)
+        self.functions.pop()
+        self.depth = depth
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node):
+        if self.functions and isinstance(node.func, ast.Name) and node.func.id == self.functions[-1]:
+            self.recursive.add(node.func.id)
+        self.generic_visit(node)
+
+
+def analyze_python(code):
+    """Parse once: syntax error, identifiers and keywords used, loop depth, recursion"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return {"syntax_error": f"{e.msg} (line {e.lineno})"}
+
+    names = set()
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+        if token.type == tokenize.NAME:
+            names.add(token.string)
+    loops = _PythonLoops()
+    loops.visit(tree)
+    return {
+        "syntax_error": None,
+        "names": names,
+        "loop_depth": loops.max_depth,
+        "recursive": sorted(loops.recursive),
+        "statements": len(tree.body),
+    }
+
+
+def analyze_c_like(code):
+    """Tokenize once: bracket balance, identifiers used, loop depth (JavaScript, Java and the like)"""
+    names = set()
+    stack = []
+    # Whether each open brace belongs to a loop body
+    braces = []
+    loop_pending = False
+    max_depth = 0
+    statements = 0
+    for match in _TOKEN.finditer(code):
+        word, symbol = match.group("word"), match.group("symbol")
+        if word:
+            names.add(word)
+            if word in LOOP_KEYWORDS:
+                loop_pending = True
+            continue
+        if symbol is None:
+            continue
+        if symbol in "([{":
+            stack.append(symbol)
+            if symbol == "{":
+                braces.append(loop_pending)
+                loop_pending = False
+                max_depth = max(max_depth, sum(braces))
+        elif symbol in BRACKETS:
+            if not stack or stack.pop() != BRACKETS[symbol]:
+                return {"syntax_error": f"Unbalanced '{symbol}'"}
+            if symbol == "}":
+                braces.pop()
+        elif symbol == ";":
+            statements += 1
+            if loop_pending and not stack:
+                loop_pending = False
+
+    if stack:
+        return {"syntax_error": f"Unclosed '{stack[-1]}'"}
+    return {
+        "syntax_error": None,
+        "names": names,
+        "loop_depth": max_depth,
+        "recursive": [],
+        "statements": statements,
+    }
+
+
+def _rule_matches(rule, names, code):
+    """A keyword rule is an identifier, matched against tokens, or a phrase, matched in the code"""
+    rule = rule.strip()
+    if rule.isidentifier():
+        return rule in names
+    return rule in code
+
+
+def _question_fields(payload):
+    """Coding question settings, whether sent at the top level or nested under the question"""
+    fields = dict(payload)
+    for nested in ("coding_data", "question_data", "question"):
+        if isinstance(payload.get(nested), dict):
+            fields = {**payload[nested], **fields}
+    return fields
+
+
+def screen(payload):
+    """
+    Verdict for a code submission: ("reject", reason, details) for an obvious
+    failure, ("accept", reason, details) when it is the reference solution,
+    or ("grade", None, details) when it needs full grading
+    """
+    fields = _question_fields(payload)
+    code = payload.get("code") or ""
+    language = (payload.get("language") or fields.get("default_language") or "python").lower()
+    normalized = normalize_code(code)
+
+    if not normalized.strip():
+        return "reject", "No code was submitted", {}
+    starter = fields.get("starter_code")
+    if isinstance(starter, dict):
+        starter = starter.get(language)
+    if isinstance(starter, str) and normalized == normalize_code(starter):
+        return "reject", "The starter code was submitted unchanged", {}
+
+    solution = fields.get("solution_code")
+    if isinstance(solution, dict):
+        solution = solution.get(language)
+    is_solution = isinstance(solution, str) and solution.strip() and normalized == normalize_code(solution)
+
+    if language == "python":
+        analysis = analyze_python(code)
+    elif language in C_LIKE_LANGUAGES:
+        analysis = analyze_c_like(code)
+    else:
+        analysis = None
+    if analysis is None or analysis["syntax_error"] and language not in SYNTAX_CHECKED_LANGUAGES:
+        # Code the tokenizer cannot read reliably is never rejected here
+        if is_solution:
+            return "accept", "Matches the reference solution", {}
+        return "grade", None, {}
+    if analysis["syntax_error"]:
+        return "reject", f"Syntax error: {analysis['syntax_error']}", {"syntax_error": analysis["syntax_error"]}
+
+    names = analysis.pop("names")
+    details = {**analysis}
+    forbidden = [rule for rule in fields.get("keywords_forbidden") or [] if _rule_matches(rule, names, code)]
+    missing = [rule for rule in fields.get("keywords_required") or [] if not _rule_matches(rule, names, code)]
+    allowed_depth = expected_loop_depth(fields.get("expected_complexity"))
+    details.update(forbidden_keywords=forbidden, missing_keywords=missing, allowed_loop_depth=allowed_depth)
+
+    if forbidden:
+        return "reject", f"Uses forbidden keywords: {', '.join(forbidden)}", details
+    if missing:
+        return "reject", f"Missing required keywords: {', '.join(missing)}", details
+
+    if is_solution:
+        return "accept", "Matches the reference solution", details
+
+    # Deeper nesting than expected is left for full grading to judge: the estimate ignores bounds
+    return "grade", None, details
+
+
+class PreScreen:
+    """
+    Runs screen() on code submissions before the grader. Rejections and exact
+    reference solutions are answered directly; everything else is graded as
+    before. Counts how much traffic it absorbs.
+    """
+
+    def __init__(self, enabled=PRESCREEN_ENABLED, max_code_bytes=PRESCREEN_MAX_CODE_BYTES):
+        self.enabled = enabled
+        self.max_code_bytes = max_code_bytes
+        self.outcomes = Counter()
+        self.reasons = Counter()
+        self.screen_ms = 0.0
+
+    def check(self, submission):
+        """A GradingResult when the submission can be decided here, else None"""
+        payload = submission.model_dump(mode="json")
+        if not self.enabled or len(payload.get("code") or "") > self.max_code_bytes:
+            self.outcomes["skipped"] += 1
+            return None
+
+        started = time.perf_counter()
+        try:
+            outcome, reason, details = screen(payload)
+        except Exception as e:
+            logger.warning(f"Pre-screen failed, grading normally: {e}")
+            outcome, reason, details = "grade", None, {}
+        finally:
+            self.screen_ms += (time.perf_counter() - started) * 1000
+
+        self.outcomes[outcome] += 1
+        if outcome == "grade":
+            return None
+        self.reasons[reason.split(":")[0]] += 1
+
+        try:
+            return direct_result(
+                submission, 1.0 if outcome == "accept" else 0.0, reason, "prescreen", details={"prescreen": details}
+            )
+        except ValidationError as e:
+            logger.warning(f"Pre-screen verdict does not fit GradingResult, grading normally: {e}")
+            self.outcomes[outcome] -= 1
+            self.outcomes["unbuildable"] += 1
+            return None
+
+    def stats(self):
+        screened = sum(count for outcome, count in self.outcomes.items() if outcome != "skipped")
+        absorbed = self.outcomes["reject"] + self.outcomes["accept"]
+        return {
+            "enabled": self.enabled,
+            "screened": screened,
+            "rejected": self.outcomes["reject"],
+            "accepted": self.outcomes["accept"],
+            "passed_through": self.outcomes["grade"] + self.outcomes["unbuildable"],
+            "skipped": self.outcomes["skipped"],
+            "absorbed_rate": round(absorbed / screened, 4) if screened else 0.0,
+            "avg_screen_ms": round(self.screen_ms / screened, 3) if screened else 0.0,
+            "reasons": dict(self.reasons),
+        }
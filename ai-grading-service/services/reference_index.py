@@ -0,0 +1,274 @@
+"""
+Per-tenant index of reference answer and rubric embeddings
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from .embeddings import EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_INDEX_DIR = os.getenv("REFERENCE_INDEX_DIR", "/tmp/skiller-reference-index")
+# Rows the vector file starts with; it doubles whenever it fills up
+REFERENCE_INDEX_INITIAL_ROWS = int(os.getenv("REFERENCE_INDEX_INITIAL_ROWS", "1024"))
+
+# Tenants are schema names; anything else could escape the index directory
+TENANT_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def reference_fingerprint(references, model_name=EMBEDDING_MODEL):
+    """Digest of a question's reference texts and the model that embeds them"""
+    content = json.dumps([model_name, references], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _empty_manifest():
+    return {"dimension": None, "count": 0, "dead": 0, "questions": {}}
+
+
+class _TenantIndex:
+    """
+    One tenant's index: a float16 .npy matrix opened as a memory map, plus a
+    JSON manifest of which rows belong to which question. Rows of a question
+    are contiguous; a re-indexed question gets new rows appended and its old
+    ones become dead space, reclaimed once it outgrows the live rows.
+
+    Every worker and replica sharing the directory keeps its own copy of the
+    manifest and reloads it whenever the file on disk changes. Writers hold
+    an exclusive flock from that reload until their manifest is saved, so no
+    write is lost; reloads take a shared one, so manifest and vectors match.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.npy")
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.lock_path = os.path.join(path, ".lock")
+        self.lock = threading.Lock()
+        self.vectors = None
+        self.manifest = _empty_manifest()
+        # (inode, mtime) of the manifest file the in-memory copy was read from
+        self.version = None
+        with self.lock:
+            self._refresh()
+
+    def entry(self, question_id):
+        with self.lock:
+            self._refresh()
+            return self.manifest["questions"].get(question_id)
+
+    def upsert(self, question_id, fingerprint, labels, vectors):
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh(locked=True)
+            vectors = np.asarray(vectors, dtype=np.float16)
+            if self.vectors is None or self.manifest["dimension"] != vectors.shape[1]:
+                # First write, or the embedding model changed: start over
+                self.manifest = {"dimension": vectors.shape[1], "count": 0, "dead": 0, "questions": {}}
+                self._allocate(max(REFERENCE_INDEX_INITIAL_ROWS, len(vectors)))
+
+            old = self.manifest["questions"].pop(question_id, None)
+            if old:
+                self.manifest["dead"] += old["rows"]
+
+            start = self.manifest["count"]
+            if start + len(vectors) > len(self.vectors):
+                self._grow(start + len(vectors))
+            self.vectors[start:start + len(vectors)] = vectors
+            self.manifest["count"] = start + len(vectors)
+            self.manifest["questions"][question_id] = {
+                "fingerprint": fingerprint,
+                "start": start,
+                "rows": len(vectors),
+                "labels": labels,
+            }
+            if self.manifest["dead"] > self.manifest["count"] - self.manifest["dead"]:
+                self._compact()
+            self._save()
+
+    def delete(self, question_id):
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh(locked=True)
+            old = self.manifest["questions"].pop(question_id, None)
+            if old is None:
+                return False
+            self.manifest["dead"] += old["rows"]
+            self._save()
+            return True
+
+    def rows(self, question_id):
+        """(labels, float16 row view) for a question, or None when it is not indexed"""
+        with self.lock:
+            self._refresh()
+            entry = self.manifest["questions"].get(question_id)
+            if entry is None:
+                return None
+            return entry["labels"], self.vectors[entry["start"]:entry["start"] + entry["rows"]]
+
+    @contextlib.contextmanager
+    def _file_lock(self, mode):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _manifest_version(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _refresh(self, locked=False):
+        """Reload the manifest and vectors if another process saved since they were read"""
+        if self._manifest_version() == self.version:
+            return
+        if locked:
+            self._load()
+        else:
+            with self._file_lock(fcntl.LOCK_SH):
+                self._load()
+
+    def _load(self):
+        self.version = self._manifest_version()
+        self.manifest = _empty_manifest()
+        self.vectors = None
+        if self.version is None:
+            return
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        try:
+            self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+        except FileNotFoundError:
+            # Nothing the manifest points at survives; questions are re-indexed as they are pushed
+            logger.warning(f"{self.vectors_path} is missing, treating the index as empty")
+            return
+        self.manifest = manifest
+
+    def _allocate(self, capacity):
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors = np.lib.format.open_memmap(
+            self.vectors_path + ".tmp", mode="w+", dtype=np.float16,
+            shape=(capacity, self.manifest["dimension"]),
+        )
+        self._swap_in()
+
+    def _grow(self, needed):
+        capacity = len(self.vectors)
+        while capacity < needed:
+            capacity *= 2
+        current = self.vectors
+        grown = np.lib.format.open_memmap(
+            self.vectors_path + ".tmp", mode="w+", dtype=np.float16, shape=(capacity, current.shape[1])
+        )
+        grown[:self.manifest["count"]] = current[:self.manifest["count"]]
+        grown.flush()
+        del grown
+        self._swap_in()
+
+    def _compact(self):
+        current = self.vectors
+        live = sum(entry["rows"] for entry in self.manifest["questions"].values())
+        compacted = np.lib.format.open_memmap(
+            self.vectors_path + ".tmp", mode="w+", dtype=np.float16,
+            shape=(max(REFERENCE_INDEX_INITIAL_ROWS, live), current.shape[1]),
+        )
+        position = 0
+        for entry in self.manifest["questions"].values():
+            compacted[position:position + entry["rows"]] = current[entry["start"]:entry["start"] + entry["rows"]]
+            entry["start"] = position
+            position += entry["rows"]
+        compacted.flush()
+        del compacted
+        self.manifest["count"] = position
+        self.manifest["dead"] = 0
+        self._swap_in()
+
+    def _swap_in(self):
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+    def _save(self):
+        self.vectors.flush()
+        with open(self.manifest_path + ".tmp", "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+        self.version = self._manifest_version()
+
+
+class ReferenceIndex:
+    """
+    Precomputed embeddings of each question's reference answers and rubric
+    items, so grading an answer costs one embedding of the answer and a
+    matrix-vector product against the question's cached rows.
+    """
+
+    def __init__(self, root=REFERENCE_INDEX_DIR):
+        self.root = root
+        self.tenants = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.indexed = 0
+        self.unchanged = 0
+
+    def tenant(self, tenant):
+        if not TENANT_PATTERN.match(tenant):
+            raise ValueError(f"Invalid tenant: {tenant}")
+        with self.lock:
+            index = self.tenants.get(tenant)
+            if index is None:
+                index = self.tenants[tenant] = _TenantIndex(os.path.join(self.root, tenant))
+            return index
+
+    def is_current(self, tenant, question_id, fingerprint):
+        """True when the question is indexed from exactly these references"""
+        entry = self.tenant(tenant).entry(question_id)
+        current = entry is not None and entry["fingerprint"] == fingerprint
+        if current:
+            self.unchanged += 1
+        return current
+
+    def upsert(self, tenant, question_id, fingerprint, labels, vectors):
+        self.tenant(tenant).upsert(question_id, fingerprint, labels, vectors)
+        self.indexed += 1
+
+    def delete(self, tenant, question_id):
+        return self.tenant(tenant).delete(question_id)
+
+    def similarity(self, tenant, question_id, vector):
+        """Cosine similarity of an embedded answer to each reference row, or None if not indexed"""
+        found = self.tenant(tenant).rows(question_id)
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        labels, rows = found
+        scores = rows.astype(np.float32) @ np.asarray(vector, dtype=np.float32)
+        return [{"label": label, "similarity": round(float(score), 4)} for label, score in zip(labels, scores)]
+
+    def stats(self):
+        with self.lock:
+            tenants = list(self.tenants.values())
+        return {
+            "tenants_loaded": len(tenants),
+            "questions": sum(len(index.manifest["questions"]) for index in tenants),
+            "rows": sum(index.manifest["count"] - index.manifest["dead"] for index in tenants),
+            "hits": self.hits,
+            "misses": self.misses,
+            "indexed": self.indexed,
+            "unchanged": self.unchanged,
+        }
@@ -0,0 +1,167 @@
+"""
+Content-addressed cache of grading results
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "86400"))
+# Bump when models or prompts change so results graded by the old ones are not reused
+GRADING_MODEL_VERSION = os.getenv("GRADING_MODEL_VERSION", "1")
+
+KEY_PREFIX = "grading:result:"
+
+# Fields identifying who/when rather than what was submitted; left out of the key
+# and copied from the current submission onto a cached result
+VOLATILE_FIELDS = (
+    "submission_id", "candidate_id", "interview_id", "session_id",
+    "submitted_at", "created_at", "timestamp",
+)
+
+# Fields holding source code, compared with whitespace-only differences ignored
+CODE_FIELDS = ("code",)
+
+
+def normalize_code(code):
+    """Drop trailing whitespace, blank edge lines and line-ending differences"""
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+def criteria_version(payload):
+    """The submission's explicit criteria version, else a digest of its grading criteria"""
+    if payload.get("criteria_version") is not None:
+        return str(payload["criteria_version"])
+    criteria = payload.get("grading_criteria")
+    if criteria is None:
+        return None
+    return hashlib.sha256(json.dumps(criteria, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def result_key(kind, submission, model_version=GRADING_MODEL_VERSION):
+    """Hash of the normalized submission, question, grading criteria version and model version"""
+    payload = submission.model_dump(mode="json")
+    content = {
+        field: normalize_code(value) if field in CODE_FIELDS and isinstance(value, str) else value
+        for field, value in payload.items()
+        if field not in VOLATILE_FIELDS
+    }
+    identity = {
+        "kind": kind,
+        "question_id": payload.get("question_id"),
+        "criteria_version": criteria_version(payload),
+        "model_version": model_version,
+        "content": content,
+    }
+    encoded = json.dumps(identity, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def restamp(result, submission):
+    """Copy the current submission's identifiers onto a cached result"""
+    updates = {
+        field: getattr(submission, field)
+        for field in VOLATILE_FIELDS
+        if hasattr(submission, field) and field in result
+    }
+    return {**result, **updates}
+
+
+class ResultCache:
+    """
+    Two tiers of grading results, both keyed by result_key(): an in-process
+    LRU with TTL in front of Redis shared by all service instances. Values are
+    the JSON form of a result. Redis being unavailable only costs misses.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL, redis_url=REDIS_URL,
+                 key_prefix=KEY_PREFIX, local_ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Shorter for values that can change, so other instances pick up new ones from Redis
+        self.local_ttl = ttl if local_ttl is None else local_ttl
+        self.key_prefix = key_prefix
+        self.redis_url = redis_url
+        self.redis = None
+        self.local = OrderedDict()
+
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key):
+        entry = self.local.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self.local.move_to_end(key)
+                self.local_hits += 1
+                return value
+            del self.local[key]
+
+        try:
+            raw = await self._redis().get(self.key_prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Result cache read failed: {e}")
+            raw = None
+
+        if raw is None:
+            self.misses += 1
+            return None
+
+        value = json.loads(raw)
+        self._set_local(key, value)
+        self.redis_hits += 1
+        return value
+
+    async def set(self, key, value):
+        self._set_local(key, value)
+        try:
+            await self._redis().set(self.key_prefix + key, json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Result cache write failed: {e}")
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def stats(self):
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "local_entries": len(self.local),
+            "model_version": GRADING_MODEL_VERSION,
+        }
+
+    def _set_local(self, key, value):
+        self.local[key] = (value, time.monotonic() + self.local_ttl)
+        self.local.move_to_end(key)
+        while len(self.local) > self.max_entries:
+            self.local.popitem(last=False)
+
+    def _redis(self):
+        if self.redis is None:
+            self.redis = redis.from_url(
+                self.redis_url,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            )
+        return self.redis
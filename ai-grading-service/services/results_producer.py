@@ -0,0 +1,146 @@
+"""
+Publishes grading results to Kafka
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+from kafka import KafkaProducer
+
+logger = logging.getLogger(__name__)
+
+KAFKA_BOOTSTRAP_SERVERS = [server.strip() for server in os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092").split(",")]
+KAFKA_TOPIC_RESULTS = os.getenv("KAFKA_TOPIC_RESULTS", "grading-results")
+
+# Wait up to linger_ms for a batch to fill before sending it
+KAFKA_PRODUCER_LINGER_MS = int(os.getenv("KAFKA_PRODUCER_LINGER_MS", "20"))
+KAFKA_PRODUCER_BATCH_SIZE = int(os.getenv("KAFKA_PRODUCER_BATCH_SIZE", "65536"))
+KAFKA_PRODUCER_COMPRESSION = os.getenv("KAFKA_PRODUCER_COMPRESSION", "lz4") or None
+# Results accepted but not yet acknowledged; publish() waits when this many are pending
+KAFKA_PRODUCER_MAX_PENDING = int(os.getenv("KAFKA_PRODUCER_MAX_PENDING", "1000"))
+KAFKA_PRODUCER_RETRIES = int(os.getenv("KAFKA_PRODUCER_RETRIES", "5"))
+
+PRODUCER_CONFIG = {
+    "linger_ms": KAFKA_PRODUCER_LINGER_MS,
+    "batch_size": KAFKA_PRODUCER_BATCH_SIZE,
+    "compression_type": KAFKA_PRODUCER_COMPRESSION,
+    "acks": "all",
+    "retries": KAFKA_PRODUCER_RETRIES,
+    # kafka-python has no idempotent producer; one request in flight per
+    # connection keeps retries from reordering a partition
+    "max_in_flight_requests_per_connection": 1,
+}
+
+
+def record_key(tenant, candidate_id, submission_id=None):
+    """Partition key keeping each candidate's results in order within their tenant"""
+    if tenant and candidate_id:
+        return f"{tenant}:{candidate_id}"
+    return submission_id
+
+
+class ResultsProducer:
+    """
+    The process-wide producer for grading results. Records are batched by
+    linger/batch size and compressed; at most max_pending are buffered, and
+    publish() resolves once the broker has acknowledged the record.
+    """
+
+    def __init__(self, topic=KAFKA_TOPIC_RESULTS, bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+                 max_pending=KAFKA_PRODUCER_MAX_PENDING):
+        self.topic = topic
+        self.bootstrap_servers = bootstrap_servers
+        self.max_pending = max_pending
+        self.producer = None
+        # Topics whose metadata is loaded, so send() to them does not block
+        self.topics = set()
+        self.slots = None
+        self.lock = None
+        self.pending = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def start(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+            self.slots = asyncio.Semaphore(self.max_pending)
+        async with self.lock:
+            if self.producer is None:
+                self.producer = await asyncio.to_thread(self._create_producer)
+
+    async def stop(self):
+        if self.producer is not None:
+            # close() flushes whatever is still buffered
+            await asyncio.to_thread(self.producer.close)
+            self.producer = None
+
+    async def publish(self, key, value, topic=None):
+        """Send one result (to topic, by default the results topic) and wait for the broker's acknowledgement"""
+        if self.producer is None:
+            await self.start()
+        topic = topic or self.topic
+        if topic not in self.topics:
+            await asyncio.to_thread(self.producer.partitions_for, topic)
+            self.topics.add(topic)
+        loop = asyncio.get_running_loop()
+        delivered = loop.create_future()
+
+        await self.slots.acquire()
+        self.pending += 1
+        try:
+            # Metadata is loaded in start() and the buffer is bounded by slots, so send() does not block
+            record = self.producer.send(topic, key=key, value=value)
+        except Exception:
+            self._release()
+            self.failed += 1
+            raise
+        record.add_callback(lambda metadata: loop.call_soon_threadsafe(self._resolve, delivered, metadata))
+        record.add_errback(lambda error: loop.call_soon_threadsafe(self._reject, delivered, error))
+
+        metadata = await delivered
+        self.sent += 1
+        return metadata
+
+    def stats(self):
+        return {
+            "topic": self.topic,
+            "sent": self.sent,
+            "failed": self.failed,
+            "pending": self.pending,
+            "compression": KAFKA_PRODUCER_COMPRESSION,
+            "linger_ms": KAFKA_PRODUCER_LINGER_MS,
+            "batch_size": KAFKA_PRODUCER_BATCH_SIZE,
+        }
+
+    def _create_producer(self):
+        producer = KafkaProducer(
+            bootstrap_servers=self.bootstrap_servers,
+            key_serializer=lambda key: key.encode() if key is not None else None,
+            value_serializer=lambda value: json.dumps(value, default=str).encode(),
+            **PRODUCER_CONFIG,
+        )
+        # Fetch topic metadata up front so the first send() does not wait for it
+        producer.partitions_for(self.topic)
+        self.topics.add(self.topic)
+        return producer
+
+    def _release(self):
+        self.pending -= 1
+        self.slots.release()
+
+    def _resolve(self, future, metadata):
+        self._release()
+        if not future.done():
+            future.set_result(metadata)
+
+    def _reject(self, future, error):
+        self._release()
+        self.failed += 1
+        if not future.done():
+            future.set_exception(error)
+
+
+# One producer per process, shared by every publisher
+results_producer = ResultsProducer()
@@ -0,0 +1,259 @@
+"""
+Per-language pools of sandboxed runtimes for code execution
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+
+from .sandbox import (
+    EXECUTION_WORK_DIR, WALL_TIME_FACTOR, EXECUTION_MAX_OUTPUT_BYTES,
+    classify_exit, cpu_seconds_for, limit_status, private_copy, read_capped, reap, run_sandboxed, sandbox_preexec
+)
+
+logger = logging.getLogger(__name__)
+
+# e.g. "python=8,javascript=4,java=2"; languages not listed get default_size
+EXECUTION_POOL_SIZES = os.getenv("EXECUTION_POOL_SIZES", "")
+# Jobs a warm runtime serves before it is replaced
+EXECUTION_WORKER_MAX_JOBS = int(os.getenv("EXECUTION_WORKER_MAX_JOBS", "200"))
+
+FORKSERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forkserver.py")
+
+# Outcomes after which a warm runtime is retired rather than reused
+BREACH_STATUSES = ("timeout", "output_limit", "memory_limit", "sandbox_error")
+
+
+def pool_sizes(default_size, spec=EXECUTION_POOL_SIZES):
+    """Parse EXECUTION_POOL_SIZES into {language: size}"""
+    sizes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        language, _, size = entry.partition("=")
+        sizes[language.strip()] = int(size)
+    return lambda language: sizes.get(language, default_size)
+
+
+class ForkServer:
+    """
+    One warm, sandboxed Python runtime that forks a fresh child per job. It
+    runs as its own uid, so it can kill whatever a job leaves behind.
+    """
+
+    def __init__(self, uid=None):
+        self.uid = uid
+        self.process = None
+        self.channel = None
+        self.jobs = 0
+
+    async def start(self):
+        # SEQPACKET keeps each job and reply a single message
+        self.channel, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        # Only with a uid of its own: otherwise kill(-1) would reach the service
+        reap = ["reap"] if self.uid is not None else []
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                "python3", "-I", "-S", FORKSERVER, str(remote.fileno()), *reap,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                pass_fds=(remote.fileno(),),
+                cwd=EXECUTION_WORK_DIR,
+                env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "LANG": "C.UTF-8"},
+                preexec_fn=sandbox_preexec(uid=self.uid),
+            )
+        finally:
+            remote.close()
+        self.channel.setblocking(False)
+
+    def is_alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def run(self, workspace, source, stdin, time_limit, memory_limit):
+        loop = asyncio.get_running_loop()
+        scratch = tempfile.mkdtemp(dir=EXECUTION_WORK_DIR, prefix="run-")
+        copy = workspace
+        try:
+            copy = await asyncio.to_thread(private_copy, workspace, self.uid)
+            paths = [os.path.join(scratch, name) for name in ("stdin", "stdout", "stderr")]
+            with open(paths[0], "wb") as f:
+                f.write(stdin.encode())
+
+            cpu_seconds = cpu_seconds_for(time_limit)
+            job = {
+                "workspace": copy,
+                "source": source,
+                "cpu_seconds": cpu_seconds,
+                "memory_bytes": memory_limit * 1024 * 1024,
+                "output_bytes": EXECUTION_MAX_OUTPUT_BYTES,
+                "wall_seconds": time_limit * WALL_TIME_FACTOR,
+            }
+            # The sandbox user cannot open these files; it receives them already open
+            fds = [os.open(paths[0], os.O_RDONLY)] + [
+                os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600) for path in paths[1:]
+            ]
+            try:
+                socket.send_fds(self.channel, [json.dumps(job).encode()], fds)
+            finally:
+                for fd in fds:
+                    os.close(fd)
+
+            self.jobs += 1
+            reply = await loop.sock_recv(self.channel, 65536)
+            if not reply:
+                raise RuntimeError("Python runtime exited")
+            result = json.loads(reply)
+
+            return {
+                "status": classify_exit(result["returncode"], result["timed_out"], result["cpu_ms"], cpu_seconds),
+                "stdout": read_capped(paths[1]),
+                "stderr": read_capped(paths[2], 4096),
+                "time_ms": result["time_ms"],
+                "cpu_ms": result["cpu_ms"],
+            }
+        finally:
+            await asyncio.to_thread(shutil.rmtree, scratch, True)
+            if copy != workspace:
+                await asyncio.to_thread(shutil.rmtree, copy, True)
+
+    async def close(self):
+        """Stop the server and any job it is running (its children share its process group)"""
+        self.channel.close()
+        if self.is_alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+
+
+class WarmPythonPool:
+    """
+    Fork servers with the interpreter and common modules already loaded.
+    Each job is a fork of a clean server, so submissions never share state;
+    a server is replaced after max_jobs jobs, after any limit breach, or when
+    it dies.
+    """
+
+    def __init__(self, language, size, users, max_jobs=EXECUTION_WORKER_MAX_JOBS):
+        self.language = language
+        self.size = size
+        self.users = users
+        self.max_jobs = max_jobs
+        self.idle = asyncio.Queue()
+        self.busy = 0
+        self.jobs = 0
+        self.retired = 0
+
+    async def start(self):
+        for _ in range(self.size):
+            self.idle.put_nowait(await self._spawn())
+
+    async def stop(self):
+        while not self.idle.empty():
+            await self._close(self.idle.get_nowait())
+
+    async def run(self, spec, command, workspace, stdin, time_limit, memory_limit):
+        server = await self.idle.get()
+        self.busy += 1
+        healthy = False
+        try:
+            outcome = await server.run(workspace, spec["source"], stdin, time_limit, memory_limit)
+            breached = limit_status(outcome, spec["memory_markers"]) in BREACH_STATUSES
+            healthy = not breached and server.jobs < self.max_jobs and server.is_alive()
+            self.jobs += 1
+            return outcome
+        except asyncio.CancelledError:
+            # The job is still running: stop it before the caller removes the workspace
+            await server.close()
+            raise
+        except Exception as e:
+            return {"status": "sandbox_error", "stdout": "", "stderr": str(e), "time_ms": 0.0, "cpu_ms": 0.0}
+        finally:
+            self.busy -= 1
+            if healthy:
+                self.idle.put_nowait(server)
+            else:
+                self.retired += 1
+                asyncio.create_task(self._replace(server))
+
+    def stats(self):
+        return {
+            "warm": True,
+            "size": self.size,
+            "idle": self.idle.qsize(),
+            "busy": self.busy,
+            "jobs": self.jobs,
+            "retired": self.retired,
+        }
+
+    async def _spawn(self):
+        server = ForkServer(await self.users.acquire())
+        try:
+            await server.start()
+        except BaseException:
+            await self.users.release(server.uid)
+            raise
+        return server
+
+    async def _close(self, server):
+        try:
+            await server.close()
+        finally:
+            await self.users.release(server.uid)
+
+    async def _replace(self, server):
+        await self._close(server)
+        try:
+            self.idle.put_nowait(await self._spawn())
+        except Exception as e:
+            logger.error(f"Could not start a {self.language} runtime: {e}")
+
+
+class ColdPool:
+    """
+    A fresh sandboxed process per job for runtimes that cannot fork once
+    loaded (node, the JVM); size bounds how many run at once.
+    """
+
+    def __init__(self, language, size, process_pool, users):
+        self.language = language
+        self.size = size
+        self.process_pool = process_pool
+        self.users = users
+        self.slots = asyncio.Semaphore(size)
+        self.busy = 0
+        self.jobs = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def run(self, spec, command, workspace, stdin, time_limit, memory_limit):
+        async with self.slots, self.users.lease() as uid:
+            self.busy += 1
+            job = self.process_pool.submit(
+                run_sandboxed, command, workspace, stdin, time_limit, memory_limit, spec["limit_address_space"], uid
+            )
+            outcome = asyncio.wrap_future(job)
+            try:
+                return await asyncio.shield(outcome)
+            except asyncio.CancelledError:
+                # A started run cannot be cancelled in its worker: kill it through its uid
+                # (or let it hit its time limit) and keep the slot and uid until it is over
+                if not job.cancel():
+                    await asyncio.to_thread(reap, uid)
+                    await asyncio.wait([outcome])
+                raise
+            finally:
+                self.busy -= 1
+                self.jobs += 1
+
+    def stats(self):
+        return {"warm": False, "size": self.size, "busy": self.busy, "jobs": self.jobs}
@@ -0,0 +1,277 @@
+"""
+Process sandbox for running candidate code
+"""
+
+import asyncio
+import contextlib
+import ctypes
+import logging
+import math
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_WORK_DIR = os.getenv("EXECUTION_WORK_DIR", tempfile.gettempdir())
+EXECUTION_MAX_OUTPUT_BYTES = int(os.getenv("EXECUTION_MAX_OUTPUT_BYTES", "65536"))
+# Processes and threads a sandboxed program may have (the JVM alone starts ~20 threads)
+EXECUTION_MAX_PROCESSES = int(os.getenv("EXECUTION_MAX_PROCESSES", "256"))
+# Refuse to run code when a private network namespace cannot be created
+EXECUTION_REQUIRE_NETWORK_ISOLATION = os.getenv("EXECUTION_REQUIRE_NETWORK_ISOLATION", "true").lower() == "true"
+# Every live sandbox gets its own uid from this range, so one submission cannot read,
+# signal or exhaust the process limit of another (needs the service to run as root)
+SANDBOX_UID_BASE = int(os.getenv("SANDBOX_UID_BASE", "200000"))
+SANDBOX_UID_COUNT = int(os.getenv("SANDBOX_UID_COUNT", "1024"))
+
+# Wall-clock allowance over the CPU time limit, for programs that sleep or block
+WALL_TIME_FACTOR = 2
+
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+# Passes over /proc before giving up on a uid that keeps forking
+REAP_PASSES = 50
+
+
+def ping():
+    return os.getpid()
+
+
+def _unshare(flags):
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.unshare(flags) != 0:
+        raise OSError(ctypes.get_errno(), "unshare failed")
+
+
+def uid_isolation():
+    """Per-sandbox uids need root; otherwise sandboxes run as the service user in a user namespace"""
+    return os.geteuid() == 0
+
+
+def uid_processes(uid):
+    """Processes with uid as any of their user ids (read from status, which a process cannot hide)"""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+            # Zombies are already dead; their parent collects them
+            if str(uid) in fields["Uid"].split() and not fields["State"].strip().startswith("Z"):
+                pids.append(int(entry))
+        except (OSError, KeyError):
+            pass
+    return pids
+
+
+def reap(uid):
+    """Kill every process left running under a sandbox uid (its process limit bounds the passes needed)"""
+    if uid is None:
+        return True
+    for _ in range(REAP_PASSES):
+        pids = uid_processes(uid)
+        if not pids:
+            return True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        time.sleep(0.001)
+    return not uid_processes(uid)
+
+
+def give_to(path, uid):
+    """Make a directory tree owned by uid and closed to everyone else"""
+    if uid is None:
+        return
+    for root, dirs, files in os.walk(path):
+        os.chown(root, uid, uid)
+        os.chmod(root, 0o700)
+        for name in files:
+            os.lchown(os.path.join(root, name), uid, uid)
+
+
+def private_copy(workspace, uid):
+    """A copy of the workspace that only uid can open, for one sandboxed run"""
+    if uid is None:
+        return workspace
+    copy = tempfile.mkdtemp(dir=EXECUTION_WORK_DIR, prefix="run-")
+    shutil.copytree(workspace, copy, dirs_exist_ok=True)
+    give_to(copy, uid)
+    return copy
+
+
+class SandboxUsers:
+    """
+    Leases uids from SANDBOX_UID_BASE so no two live sandboxes share one.
+    Whatever a sandbox leaves running is killed before its uid is reused.
+    Without root, leases are None and sandboxes run as the service user.
+    """
+
+    def __init__(self, base=SANDBOX_UID_BASE, count=SANDBOX_UID_COUNT):
+        self.enabled = uid_isolation()
+        self.free = asyncio.Queue()
+        if self.enabled:
+            for uid in range(base, base + count):
+                self.free.put_nowait(uid)
+
+    async def acquire(self):
+        if not self.enabled:
+            return None
+        return await self.free.get()
+
+    async def release(self, uid):
+        if uid is None:
+            return
+        if await asyncio.to_thread(reap, uid):
+            self.free.put_nowait(uid)
+        else:
+            # Never hand out a uid something still runs as
+            logger.error(f"Processes of sandbox uid {uid} survived; retiring it")
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        uid = await self.acquire()
+        try:
+            yield uid
+        finally:
+            await self.release(uid)
+
+    def stats(self):
+        return {"uid_isolation": self.enabled, "free_uids": self.free.qsize()}
+
+
+def sandbox_preexec(cpu_seconds=None, memory_bytes=0, output_bytes=EXECUTION_MAX_OUTPUT_BYTES, uid=None):
+    """preexec_fn for the forked child: limits, no network, the sandbox's own unprivileged user"""
+    def apply():
+        os.setsid()
+        if cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_bytes:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output_bytes, output_bytes))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+        isolated = False
+        if os.geteuid() == 0:
+            if uid is None:
+                raise PermissionError("Refusing to run a sandbox as root without a sandbox uid")
+            try:
+                _unshare(CLONE_NEWNET)
+                isolated = True
+            except OSError:
+                pass
+            os.setgroups([])
+            os.setgid(uid)
+            os.setuid(uid)
+        # After dropping root so it counts against this sandbox's uid only
+        resource.setrlimit(resource.RLIMIT_NPROC, (EXECUTION_MAX_PROCESSES, EXECUTION_MAX_PROCESSES))
+        if not isolated:
+            try:
+                _unshare(CLONE_NEWUSER | CLONE_NEWNET)
+            except OSError:
+                if EXECUTION_REQUIRE_NETWORK_ISOLATION:
+                    raise
+    return apply
+
+
+def cpu_seconds_for(time_limit):
+    return max(1, math.ceil(time_limit))
+
+
+def classify_exit(returncode, timed_out, cpu_ms, cpu_seconds):
+    """ok, timeout, output_limit or runtime_error (memory breaches are recognised from stderr)"""
+    cpu_exceeded = returncode == -signal.SIGXCPU or returncode == -signal.SIGKILL and cpu_ms >= cpu_seconds * 1000
+    if timed_out or cpu_exceeded:
+        return "timeout"
+    if returncode == -signal.SIGXFSZ:
+        return "output_limit"
+    if returncode != 0:
+        return "runtime_error"
+    return "ok"
+
+
+def limit_status(outcome, memory_markers):
+    """Outcome status, with limit breaches the runtime reported as ordinary errors recognised"""
+    if any(marker in outcome["stderr"] for marker in memory_markers):
+        return "memory_limit"
+    # Python ignores SIGXFSZ, so an output breach surfaces as EFBIG
+    if outcome["status"] == "runtime_error" and "File too large" in outcome["stderr"]:
+        return "output_limit"
+    return outcome["status"]
+
+
+def read_capped(path, limit=EXECUTION_MAX_OUTPUT_BYTES):
+    with open(path, "rb") as f:
+        return f.read(limit).decode(errors="replace")
+
+
+def run_sandboxed(command, workspace, stdin, time_limit, memory_limit, limit_address_space=True, uid=None,
+                  private=True):
+    """
+    Start a fresh sandboxed process for one command as uid and return its
+    outcome. It runs in a private copy of the workspace unless private is
+    false, in which case the caller has given the workspace to uid.
+    """
+    scratch = tempfile.mkdtemp(dir=EXECUTION_WORK_DIR, prefix="run-")
+    cwd = private_copy(workspace, uid) if private else workspace
+    stdout_path = os.path.join(scratch, "stdout")
+    stderr_path = os.path.join(scratch, "stderr")
+    cpu_seconds = cpu_seconds_for(time_limit)
+    memory_bytes = memory_limit * 1024 * 1024 if limit_address_space else 0
+
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    try:
+        with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+            try:
+                process = subprocess.Popen(
+                    command,
+                    cwd=cwd,
+                    stdin=subprocess.PIPE,
+                    stdout=stdout,
+                    stderr=stderr,
+                    env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": cwd, "LANG": "C.UTF-8"},
+                    preexec_fn=sandbox_preexec(cpu_seconds, memory_bytes, uid=uid),
+                    close_fds=True,
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                return {"status": "sandbox_error", "stdout": "", "stderr": str(e), "time_ms": 0.0, "cpu_ms": 0.0}
+
+            try:
+                process.communicate(stdin.encode(), timeout=time_limit * WALL_TIME_FACTOR)
+                timed_out = False
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                timed_out = True
+            except BrokenPipeError:
+                # Program exited without reading all of its input
+                process.wait()
+                timed_out = False
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_ms = (
+            (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+        ) * 1000
+
+        return {
+            "status": classify_exit(process.returncode, timed_out, cpu_ms, cpu_seconds),
+            "stdout": read_capped(stdout_path),
+            "stderr": read_capped(stderr_path, 4096),
+            "time_ms": round(elapsed_ms, 2),
+            "cpu_ms": round(cpu_ms, 2),
+        }
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if cwd != workspace:
+            shutil.rmtree(cwd, ignore_errors=True)
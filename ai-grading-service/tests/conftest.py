@@ -0,0 +1,12 @@
+import os
+import sys
+import types
+
+# The service modules import each other relatively from the service root, which is
+# not itself importable (its directory name has dashes); expose it as a package.
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "ai_grading_service" not in sys.modules:
+    package = types.ModuleType("ai_grading_service")
+    package.__path__ = [SERVICE_ROOT]
+    sys.modules["ai_grading_service"] = package
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+from kafka import TopicPartition
+
+pytest.importorskip("ai_grading_service.models.grading_models")
+
+from ai_grading_service.services import batch_consumer  # noqa: E402
+from ai_grading_service.services.batch_consumer import BatchedKafkaConsumer  # noqa: E402
+
+TP = TopicPartition("interview-submissions", 0)
+
+
+class FlakyProducer:
+    """Fails every publish to the topics in failing"""
+
+    def __init__(self, *failing):
+        self.failing = set(failing)
+        self.published = []
+
+    async def publish(self, key, value, topic=None):
+        topic = topic or "grading-results"
+        if topic in self.failing:
+            raise RuntimeError(f"{topic} unavailable")
+        self.published.append((topic, value))
+
+
+def message(offset):
+    return SimpleNamespace(offset=offset, value=json.dumps({"submission_type": "unknown"}).encode())
+
+
+def consumer_with(producer, tmp_path):
+    consumer = BatchedKafkaConsumer(
+        grade=None, producer=producer, dead_letter_file=str(tmp_path / "dead-letter.jsonl")
+    )
+    consumer.running = True
+    return consumer
+
+
+def handle_all(consumer, offsets):
+    async def run():
+        consumer.offsets[TP] = OrderedDict((offset, False) for offset in offsets)
+        await asyncio.gather(*(consumer._handle(TP, message(offset)) for offset in offsets))
+    asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delays(monkeypatch):
+    monkeypatch.setattr(batch_consumer, "PUBLISH_RETRY_DELAYS", (0,))
+
+
+def test_offsets_advance_contiguously(tmp_path):
+    consumer = consumer_with(FlakyProducer(), tmp_path)
+    consumer.offsets[TP] = OrderedDict((offset, False) for offset in (5, 6, 7))
+
+    consumer._finish(TP, 6)
+    assert TP not in consumer.ready
+    consumer._finish(TP, 5)
+    assert consumer.ready[TP] == 7
+    consumer._finish(TP, 7)
+    assert consumer.ready[TP] == 8
+
+
+def test_unpublishable_result_goes_to_dead_letter_topic_and_commits(tmp_path):
+    producer = FlakyProducer("grading-results")
+    consumer = consumer_with(producer, tmp_path)
+
+    handle_all(consumer, [0, 1])
+
+    assert consumer.ready[TP] == 2
+    assert consumer.dead_lettered == 2
+    assert [topic for topic, _ in producer.published] == [consumer.dead_letter_topic] * 2
+    assert producer.published[0][1]["source"]["offset"] in (0, 1)
+
+
+def test_dead_letter_file_when_no_topic_is_reachable(tmp_path):
+    consumer = consumer_with(FlakyProducer("grading-results", "grading-results-dead-letter"), tmp_path)
+
+    handle_all(consumer, [0])
+
+    assert consumer.ready[TP] == 1
+    records = [json.loads(line) for line in (tmp_path / "dead-letter.jsonl").read_text().splitlines()]
+    assert records[0]["status"] == "failed"
+    assert "grading-results unavailable" in records[0]["publish_error"]
+
+
+def test_publish_failure_during_shutdown_is_left_for_redelivery(tmp_path):
+    consumer = consumer_with(FlakyProducer("grading-results"), tmp_path)
+    consumer.running = False
+
+    handle_all(consumer, [0])
+
+    assert TP not in consumer.ready
+    assert consumer.dead_lettered == 0
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import BaseModel
+from sqlalchemy import update
+
+pytest.importorskip("ai_grading_service.models.grading_models")
+
+from ai_grading_service.services import batch_jobs  # noqa: E402
+from ai_grading_service.services.batch_jobs import BatchJobManager, BatchJobStore  # noqa: E402
+from ai_grading_service.services.mcq_grader import AnswerKeyCache  # noqa: E402
+
+OPTIONS = [{"id": "a", "is_correct": True}, {"id": "b", "is_correct": False}]
+
+
+class ChoiceSubmission(BaseModel):
+    question_id: str
+    selected_options: list
+    mcq_data: dict
+
+
+class Scored(BaseModel):
+    score: float
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'jobs' / 'grading_jobs.db'}"
+
+
+def test_default_database_is_an_absolute_path():
+    assert batch_jobs.GRADING_JOBS_DB_URL.startswith("sqlite:////")
+
+
+def test_store_creates_database_directory(db_url, tmp_path):
+    BatchJobStore(db_url)
+
+    assert (tmp_path / "jobs" / "grading_jobs.db").exists()
+
+
+def test_only_one_worker_claims_a_job(db_url):
+    first, second = BatchJobStore(db_url), BatchJobStore(db_url)
+    first.create_job("job", [("code", {"code": "print(1)"})])
+
+    assert first.claim_job("job", "worker-1")
+    assert not second.claim_job("job", "worker-2")
+    assert second.claimable_job_ids() == []
+
+
+def test_lapsed_lease_is_claimed_by_another_worker(db_url):
+    store = BatchJobStore(db_url)
+    store.create_job("job", [("code", {"code": "print(1)"})])
+    store.claim_job("job", "worker-1")
+    with store.engine.begin() as conn:
+        conn.execute(
+            update(batch_jobs.batch_jobs).values(lease_expires=datetime.utcnow() - timedelta(seconds=1))
+        )
+
+    assert store.claimable_job_ids() == ["job"]
+    assert store.claim_job("job", "worker-2")
+
+
+def test_released_jobs_are_claimable(db_url):
+    store = BatchJobStore(db_url)
+    store.create_job("job", [("code", {"code": "print(1)"})])
+    store.claim_job("job", "worker-1")
+
+    store.release_jobs("worker-1")
+
+    assert store.claimable_job_ids() == ["job"]
+
+
+def test_workers_resume_each_job_once(db_url):
+    graded = []
+
+    async def grade(kind, submission):
+        graded.append(submission)
+        return Scored(score=1)
+
+    async def run():
+        BatchJobStore(db_url).create_job("job", [("code", {"code": "print(1)"})])
+        managers = [BatchJobManager(grade, store=BatchJobStore(db_url)) for _ in range(3)]
+        await asyncio.gather(*(manager._claim_orphans() for manager in managers))
+        await asyncio.gather(*(task for manager in managers for task in list(manager.tasks.values())))
+
+    asyncio.run(run())
+
+    assert len(graded) == 1
+
+
+def test_choice_items_skip_the_graders(db_url, monkeypatch):
+    monkeypatch.setitem(batch_jobs.SUBMISSION_MODELS, "multiple_choice", ChoiceSubmission)
+    monkeypatch.setattr(
+        batch_jobs, "direct_result",
+        lambda submission, fraction, feedback, graded_by: Scored(score=fraction * 100),
+    )
+
+    async def grade(kind, submission):
+        raise AssertionError("answer-key items must not reach the graders")
+
+    items = [
+        ("multiple_choice", {"question_id": "q1", "selected_options": [pick], "mcq_data": {"options": OPTIONS}})
+        for pick in ("a", "b", "a")
+    ]
+    items.append((
+        "multiple_choice",
+        {"question_id": "q2", "selected_options": ["a"], "mcq_data": {"options": [{"id": "a", "is_correct": False}]}},
+    ))
+    store = BatchJobStore(db_url)
+    store.create_job("job", items)
+    answer_keys = AnswerKeyCache()
+
+    asyncio.run(BatchJobManager(grade, store=store, answer_keys=answer_keys)._run("job"))
+
+    job = store.get_job("job")
+    assert [item["result"]["score"] for item in job["results"][:3]] == [100, 0, 100]
+    assert "no correct option" in job["results"][3]["error"]
+    assert (job["completed"], job["failed"], job["status"]) == (3, 1, "completed_with_errors")
+    # One compiled key served every sheet of q1
+    assert answer_keys.stats()["hits"] == 2
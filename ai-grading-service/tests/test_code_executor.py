@@ -0,0 +1,69 @@
+import asyncio
+import os
+
+from ai_grading_service.models.execution_models import CodeExecutionRequest
+from ai_grading_service.models.execution_models import TestCase as Case
+from ai_grading_service.services.code_executor import CodeExecutionEngine
+from ai_grading_service.services.result_cache import ResultCache
+
+
+class ScriptedRuntime:
+    """Echoes stdin back, except input "hang", which runs until cancelled"""
+
+    def __init__(self):
+        self.cancelled = []
+
+    async def run(self, spec, command, workspace, stdin, time_limit, memory_limit):
+        if stdin == "hang":
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                self.cancelled.append(os.path.isdir(workspace))
+                raise
+        return {"status": "ok", "stdout": stdin, "stderr": "", "time_ms": 1.0, "cpu_ms": 1.0}
+
+
+def engine_with(runtime):
+    engine = CodeExecutionEngine(test_cache=ResultCache(redis_url="redis://127.0.0.1:1/0"))
+    engine.runtimes["python"] = runtime
+    return engine
+
+
+def request(**fields):
+    cases = [Case(input="1", expected_output="1"), Case(input="hang", expected_output="")]
+    return CodeExecutionRequest(code="print(input())", test_cases=cases, **fields)
+
+
+def test_closing_stream_stops_runs_before_workspace_is_removed(monkeypatch):
+    runtime = ScriptedRuntime()
+    engine = engine_with(runtime)
+    workspaces = []
+    prepare = engine._prepare_workspace
+
+    def recording_prepare(spec, code):
+        workspaces.append(prepare(spec, code))
+        return workspaces[-1]
+
+    monkeypatch.setattr(engine, "_prepare_workspace", recording_prepare)
+
+    async def disconnect_after_first_result():
+        stream = engine.execute_stream(request())
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    first = asyncio.run(disconnect_after_first_result())
+
+    assert first.passed
+    assert runtime.cancelled == [True]
+    assert not os.path.exists(workspaces[0])
+
+
+def test_history_is_scoped_to_tenant_schema():
+    engine = engine_with(ScriptedRuntime())
+    same_ids = dict(candidate_id="c1", question_id="q1")
+
+    assert engine._history_key(request(**same_ids)) is None
+    assert engine._history_key(request(schema_name="tenant_a", **same_ids)) != engine._history_key(
+        request(schema_name="tenant_b", **same_ids)
+    )
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+pytest.importorskip("ai_grading_service.models.grading_models")
+
+from ai_grading_service.services.grading_cascade import GradingCascade, escalates  # noqa: E402
+
+
+class Answer(BaseModel):
+    schema_name: str
+    question_id: str
+    answer: str
+
+
+class FixedSettings:
+    def __init__(self, **config):
+        self.config = {"ai_grading_model": None, "manual_review_threshold": 0.7, "confidence_band": 0.1, **config}
+        self.tenants = []
+
+    async def get(self, tenant):
+        self.tenants.append(tenant)
+        return self.config
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.parametrize("confidence, escalated", [
+    (0.0, True),
+    (0.3, True),
+    (0.59, True),
+    (0.7, True),
+    (0.79, True),
+    (0.8, False),
+    (0.95, False),
+])
+def test_escalates_everything_below_threshold_plus_band(confidence, escalated):
+    assert escalates(confidence, 0.7, 0.1) is escalated
+
+
+def test_low_confidence_verdict_goes_to_full_grader():
+    settings = FixedSettings()
+
+    async def fast(submission):
+        return 0.1, 0.2, {}
+
+    async def full(submission):
+        return "full"
+
+    cascade = GradingCascade({"text": fast}, {"text": full}, settings=settings)
+    result = asyncio.run(cascade.grade("text", Answer(schema_name="tenant_acme", question_id="q1", answer="x")))
+
+    assert result == "full"
+    assert cascade.outcomes["escalated"] == 1
+    assert settings.tenants == ["tenant_acme"]
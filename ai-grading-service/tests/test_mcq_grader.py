@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from ai_grading_service.services.mcq_grader import MAX_OPTIONS, AnswerKey, AnswerKeyCache, choice_question, popcount
+
+
+def question(question_id, correct, options="ABCD", allow_multiple=False, points=1):
+    return {
+        "question_id": question_id,
+        "options": [{"id": option, "is_correct": option in correct} for option in options],
+        "allow_multiple": allow_multiple,
+        "points": points,
+    }
+
+
+QUESTIONS = [
+    question("q1", "B"),
+    question("q2", "AC", allow_multiple=True, points=2),
+]
+
+
+def test_popcount():
+    masks = np.array([0, 1, 0b1011, 2**64 - 1], dtype=np.uint64)
+
+    assert popcount(masks).tolist() == [0, 1, 3, 64]
+
+
+def test_all_or_nothing():
+    key = AnswerKey(QUESTIONS)
+
+    scores, totals, max_score = key.grade([
+        {"q1": "B", "q2": ["A", "C"]},
+        {"q1": "A", "q2": ["A"]},
+        {"q1": ["B", "C"], "q2": ["C", "A", "A"]},
+        {},
+    ])
+
+    assert max_score == 3.0
+    assert totals.tolist() == [3.0, 0.0, 2.0, 0.0]
+    assert scores[2].tolist() == [0.0, 2.0]
+
+
+def test_partial_credit_subtracts_wrong_picks():
+    key = AnswerKey(QUESTIONS)
+
+    _, totals, _ = key.grade([{"q2": ["A"]}, {"q2": ["A", "B"]}, {"q2": ["B", "D"]}], scheme="partial")
+
+    assert totals.tolist() == [1.0, 0.0, 0.0]
+
+
+def test_per_option_counts_options_left_alone():
+    key = AnswerKey(QUESTIONS)
+
+    _, totals, _ = key.grade([{"q2": ["A"]}, {"q2": ["A", "B", "C"]}, {}], scheme="per_option")
+
+    assert totals.tolist() == [1.5, 1.5, 0.0]
+
+
+def test_unknown_questions_and_options_are_ignored():
+    key = AnswerKey(QUESTIONS)
+
+    _, totals, _ = key.grade([{"q1": ["B", "Z"], "q9": "A"}])
+
+    assert totals.tolist() == [1.0]
+
+
+def test_rejects_question_without_correct_option():
+    with pytest.raises(ValueError, match="no correct option"):
+        AnswerKey([question("q1", "B"), question("q2", "")])
+
+
+def test_rejects_too_many_options():
+    options = [str(index) for index in range(MAX_OPTIONS + 1)]
+
+    with pytest.raises(ValueError):
+        AnswerKey([question("q1", "0", options=options)])
+
+
+def test_rejects_unknown_scheme():
+    with pytest.raises(ValueError):
+        AnswerKey(QUESTIONS).grade([{}], scheme="bonus")
+
+
+def test_cache_compiles_each_key_once():
+    cache = AnswerKeyCache()
+
+    assert cache.get(QUESTIONS) is cache.get([dict(q) for q in QUESTIONS])
+    assert cache.stats() == {"compiled_keys": 1, "hits": 1, "misses": 1}
+
+
+def test_choice_question_from_nested_options():
+    payload = {"question_id": "q7", "selected_options": ["B"], "mcq_data": question("ignored", "B")}
+
+    found, selection = choice_question(payload)
+
+    assert found["question_id"] == "q7"
+    assert selection == ["B"]
+    _, totals, _ = AnswerKey([found]).grade([{"q7": selection}])
+    assert totals.tolist() == [1.0]
+
+
+def test_choice_question_needs_answer_key():
+    shown = {"question_id": "q7", "answer": "B", "options": [{"id": "A"}, {"id": "B"}]}
+
+    assert choice_question(shown) is None
+    assert choice_question({"question_id": "q7", "answer": "B"}) is None
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from ai_grading_service.services.reference_index import ReferenceIndex, _TenantIndex
+
+
+def vectors(*values):
+    return np.array([[value, 1.0 - value] for value in values], dtype=np.float32)
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return str(tmp_path / "tenant_acme")
+
+
+def test_writes_from_other_workers_are_kept(index_dir):
+    first, second = _TenantIndex(index_dir), _TenantIndex(index_dir)
+
+    first.upsert("q1", "f1", ["a"], vectors(0.1))
+    second.upsert("q2", "f2", ["b"], vectors(0.2))
+    first.upsert("q3", "f3", ["c"], vectors(0.3))
+
+    assert set(_TenantIndex(index_dir).manifest["questions"]) == {"q1", "q2", "q3"}
+    assert second.entry("q3")["fingerprint"] == "f3"
+    labels, rows = second.rows("q2")
+    assert labels == ["b"]
+    assert rows[0, 0] == pytest.approx(0.2, abs=1e-3)
+
+
+def _index_questions(index_dir, worker):
+    index = _TenantIndex(index_dir)
+    for number in range(10):
+        index.upsert(f"w{worker}-q{number}", "f", ["a"], vectors(0.1 * worker))
+
+
+def test_concurrent_processes_lose_no_questions(index_dir):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_index_questions, args=(index_dir, worker)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    assert len(_TenantIndex(index_dir).manifest["questions"]) == 40
+
+
+def test_deletes_from_other_workers_are_seen(index_dir):
+    first, second = _TenantIndex(index_dir), _TenantIndex(index_dir)
+    first.upsert("q1", "f1", ["a"], vectors(0.1))
+    assert second.entry("q1") is not None
+
+    first.delete("q1")
+
+    assert second.entry("q1") is None
+    assert second.rows("q1") is None
+
+
+def test_compaction_elsewhere_does_not_misplace_rows(index_dir, monkeypatch):
+    monkeypatch.setattr("ai_grading_service.services.reference_index.REFERENCE_INDEX_INITIAL_ROWS", 2)
+    first, second = _TenantIndex(index_dir), _TenantIndex(index_dir)
+    first.upsert("q1", "f1", ["a"], vectors(0.1))
+    first.upsert("q2", "f2", ["b"], vectors(0.2))
+    assert second.rows("q2") is not None
+
+    # Re-indexing q1 twice leaves more dead rows than live ones, so the file is compacted
+    first.upsert("q1", "f1", ["a"], vectors(0.4))
+    first.upsert("q1", "f1", ["a"], vectors(0.5))
+
+    _, rows = second.rows("q2")
+    assert rows[0, 0] == pytest.approx(0.2, abs=1e-3)
+
+
+def test_missing_vectors_means_empty_index_that_is_rebuilt(index_dir):
+    _TenantIndex(index_dir).upsert("q1", "f1", ["a"], vectors(0.1))
+    os.remove(os.path.join(index_dir, "vectors.npy"))
+
+    index = _TenantIndex(index_dir)
+    assert index.entry("q1") is None
+
+    index.upsert("q2", "f2", ["b"], vectors(0.2))
+    assert set(_TenantIndex(index_dir).manifest["questions"]) == {"q2"}
+
+
+def test_is_current_tracks_fingerprint(tmp_path):
+    index = ReferenceIndex(str(tmp_path))
+    index.upsert("tenant_acme", "q1", "f1", ["a"], vectors(0.1))
+
+    assert index.is_current("tenant_acme", "q1", "f1")
+    assert not index.is_current("tenant_acme", "q1", "f2")
+    assert not index.is_current("tenant_other", "q1", "f1")
+    with pytest.raises(ValueError):
+        index.tenant("../escape")
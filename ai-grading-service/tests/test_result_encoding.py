@@ -0,0 +1,24 @@
+import importlib.util
+import os
+import random
+
+import pytest
+
+pytest.importorskip("lz4")
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "benchmark_result_encoding.py")
+spec = importlib.util.spec_from_file_location("benchmark_result_encoding", SCRIPT)
+benchmark = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(benchmark)
+
+
+def test_batched_compressed_results_encode_smaller():
+    rng = random.Random(0)
+    messages = [benchmark.sample_result(rng) for _ in range(500)]
+
+    single_bytes, single_batches, _ = benchmark.encode(messages, None, 16384, records_per_batch=1)
+    batched_bytes, batched_batches, _ = benchmark.encode(messages, "lz4", 65536)
+
+    assert single_batches == 500
+    assert batched_batches < 10
+    assert batched_bytes < single_bytes / 2
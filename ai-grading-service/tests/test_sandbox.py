@@ -0,0 +1,95 @@
+import os
+import shutil
+import signal
+import tempfile
+
+import pytest
+from pydantic import ValidationError
+
+from ai_grading_service.models.execution_models import MAX_TEST_CASES, CodeExecutionRequest
+from ai_grading_service.models.execution_models import TestCase as Case
+from ai_grading_service.services import sandbox
+from ai_grading_service.services.sandbox import SANDBOX_UID_BASE, classify_exit, run_sandboxed, sandbox_preexec
+
+needs_root = pytest.mark.skipif(os.geteuid() != 0, reason="per-sandbox uids need root")
+
+
+@pytest.fixture
+def workspace():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.mark.parametrize("field, value", [
+    ("memory_limit", 0),
+    ("memory_limit", -1),
+    ("memory_limit", 1 << 20),
+    ("execution_time_limit", 0),
+    ("execution_time_limit", 3600),
+])
+def test_request_rejects_limits_out_of_bounds(field, value):
+    with pytest.raises(ValidationError):
+        CodeExecutionRequest(code="print(1)", **{field: value})
+
+
+def test_request_caps_test_cases():
+    half = [Case(input=str(i)) for i in range(MAX_TEST_CASES // 2 + 1)]
+
+    with pytest.raises(ValidationError):
+        CodeExecutionRequest(code="print(1)", test_cases=half, hidden_test_cases=half)
+    assert CodeExecutionRequest(code="print(1)", test_cases=half[:-1], hidden_test_cases=half[:-1])
+
+
+def test_classify_exit():
+    assert classify_exit(0, False, 10, 1) == "ok"
+    assert classify_exit(0, True, 10, 1) == "timeout"
+    assert classify_exit(-signal.SIGXCPU, False, 900, 1) == "timeout"
+    assert classify_exit(-signal.SIGKILL, False, 1000, 1) == "timeout"
+    assert classify_exit(-signal.SIGKILL, False, 10, 1) == "runtime_error"
+    assert classify_exit(-signal.SIGXFSZ, False, 10, 1) == "output_limit"
+    assert classify_exit(1, False, 10, 1) == "runtime_error"
+
+
+@needs_root
+def test_preexec_refuses_root_without_uid():
+    pid = os.fork()
+    if pid == 0:
+        try:
+            sandbox_preexec(1)()
+        except PermissionError:
+            os._exit(0)
+        os._exit(1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+@needs_root
+def test_cpu_limit_stops_busy_loop(workspace, monkeypatch):
+    monkeypatch.setattr(sandbox, "EXECUTION_REQUIRE_NETWORK_ISOLATION", False)
+
+    outcome = run_sandboxed(["/bin/sh", "-c", "while :; do :; done"], workspace, "", 1, 64, uid=SANDBOX_UID_BASE)
+
+    assert outcome["status"] == "timeout"
+    assert sandbox.reap(SANDBOX_UID_BASE)
+
+
+@needs_root
+def test_output_limit(workspace, monkeypatch):
+    monkeypatch.setattr(sandbox, "EXECUTION_REQUIRE_NETWORK_ISOLATION", False)
+
+    outcome = run_sandboxed(["/bin/sh", "-c", "yes"], workspace, "", 5, 64, uid=SANDBOX_UID_BASE)
+
+    assert outcome["status"] in ("output_limit", "runtime_error")
+    assert len(outcome["stdout"]) <= sandbox.EXECUTION_MAX_OUTPUT_BYTES
+
+
+@needs_root
+def test_sandbox_runs_as_its_own_uid(workspace, monkeypatch):
+    monkeypatch.setattr(sandbox, "EXECUTION_REQUIRE_NETWORK_ISOLATION", False)
+
+    outcome = run_sandboxed(["/bin/sh", "-c", "id -u; ls /root"], workspace, "", 2, 64, uid=SANDBOX_UID_BASE)
+
+    assert outcome["stdout"].split()[0] == str(SANDBOX_UID_BASE)
+    assert outcome["status"] == "runtime_error"
@@ -148,6 +148,8 @@ def migrate_tenant_data():
             
         except Exception as e:
             print(f"❌ Error migrating data for tenant {tenant.name}: {e}")
+            # The session's search_path is unknown after a failure; make the reset below send its SET
+            SchemaManager.forget_search_path()
         
         finally:
             # Return to public schema
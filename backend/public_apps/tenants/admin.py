@@ -4,11 +4,11 @@ from .models import Tenant, TenantUser, TenantSettings
 
 @admin.register(Tenant)
 class TenantAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'schema_name', 'plan', 'is_active', 'created_at']
-    list_filter = ['plan', 'is_active', 'created_at']
+    list_display = ['name', 'slug', 'schema_name', 'plan', 'is_active', 'provisioning_status', 'created_at']
+    list_filter = ['plan', 'is_active', 'provisioning_status', 'created_at']
     search_fields = ['name', 'slug', 'domain']
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ['schema_name']
+    readonly_fields = ['schema_name', 'provisioning_status', 'provisioning_error']
 
 
 @admin.register(TenantUser)
@@ -0,0 +1,84 @@
+"""
+In-process caches for the multi-tenant request path
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live (seconds)"""
+
+    def __init__(self, max_entries=1024, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# Tenant lookups keyed by (field, value), e.g. ('domain', 'acme.com') or ('slug', 'acme').
+# A cached None marks a lookup that matched no active tenant (negative entry).
+# Entries live for at most TENANT_CACHE_TTL seconds, which bounds how long other
+# workers keep serving a tenant after it has been changed or deactivated.
+tenant_cache = TTLCache(
+    max_entries=settings.TENANT_CACHE_MAX_ENTRIES,
+    ttl=settings.TENANT_CACHE_TTL,
+)
+
+
+_redis_client = None
+
+
+def get_redis_client():
+    """Return the shared Redis client for REDIS_URL, or None if Redis is unavailable"""
+    global _redis_client
+    if _redis_client is None:
+        try:
+            import redis
+            _redis_client = redis.Redis.from_url(
+                settings.REDIS_URL,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            )
+        except Exception:
+            return None
+    return _redis_client
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from public_apps.tenants.models import Tenant
+from public_apps.tenants.provisioning import set_provisioning_status
+from public_apps.tenants.schema_utils import SchemaManager
+
+
+class Command(BaseCommand):
+    help = (
+        'Mark tenants provisioned before provisioning_status existed as ready. '
+        'Run once after the migration that adds the field, before serving traffic.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the tenants that would be marked ready without changing them',
+        )
+
+    def schema_is_migrated(self, schema_name):
+        """A schema that exists and has migrations recorded was provisioned the old way"""
+        if not SchemaManager.schema_exists(schema_name):
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [f'"{schema_name}"."django_migrations"'])
+            if cursor.fetchone()[0] is None:
+                return False
+            cursor.execute(f'SELECT EXISTS(SELECT 1 FROM "{schema_name}"."django_migrations")')
+            return cursor.fetchone()[0]
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.filter(provisioning_status=Tenant.PROVISIONING_PENDING).order_by('slug')
+        marked = skipped = 0
+
+        for tenant in tenants:
+            if not self.schema_is_migrated(tenant.schema_name):
+                # Genuinely still waiting for provisioning
+                self.stdout.write(f'  {tenant.slug}: schema {tenant.schema_name} not migrated, left pending')
+                skipped += 1
+                continue
+            if not options['dry_run']:
+                set_provisioning_status(tenant, Tenant.PROVISIONING_READY)
+            self.stdout.write(self.style.SUCCESS(f'  {tenant.slug}: ready'))
+            marked += 1
+
+        verb = 'Would mark' if options['dry_run'] else 'Marked'
+        self.stdout.write(f'{verb} {marked} tenant(s) ready, left {skipped} pending')
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from public_apps.tenants.schema_utils import SchemaManager, schema_router
+from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test tenant switching: many threads switch between tenant schemas '
+        'and verify every query runs in the schema they selected'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=32,
+            help='Number of concurrent workers (each holds its own connection)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=500,
+            help='Tenant switches per worker',
+        )
+
+    def handle(self, *args, **options):
+        schemas = SchemaManager.list_tenant_schemas()
+        if len(schemas) < 2:
+            raise CommandError('At least two tenant schemas are needed to check isolation')
+
+        threads = options['threads']
+        iterations = options['iterations']
+        self.stdout.write(
+            f'Switching between {len(schemas)} schemas with {threads} workers x {iterations} iterations...'
+        )
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(
+                lambda seed: self.run_worker(schemas, iterations, seed),
+                range(threads),
+            ))
+        elapsed = time.monotonic() - started
+
+        checks = sum(result[0] for result in results)
+        leaks = [leak for result in results for leak in result[1]]
+
+        self.stdout.write(f'Checks: {checks} in {elapsed:.2f}s ({checks / elapsed:.0f}/s)')
+        if leaks:
+            for expected, actual in leaks[:10]:
+                self.stdout.write(self.style.ERROR(f'Expected schema {expected}, query ran in {actual}'))
+            raise CommandError(f'{len(leaks)} cross-tenant leaks detected')
+
+        self.stdout.write(self.style.SUCCESS('No cross-tenant leakage detected'))
+
+    def run_worker(self, schemas, iterations, seed):
+        """Switch tenants repeatedly and record any query that ran in another schema"""
+        rng = random.Random(seed)
+        checks = 0
+        leaks = []
+        try:
+            for _ in range(iterations):
+                schema_name = rng.choice(schemas)
+                schema_router.set_tenant_schema(schema_name)
+
+                # Autocommit statement, then several statements in one transaction
+                actual = SchemaManager.get_current_schema()
+                checks += 1
+                if actual != schema_name:
+                    leaks.append((schema_name, actual))
+
+                with transaction.atomic():
+                    for _ in range(2):
+                        actual = SchemaManager.get_current_schema()
+                        checks += 1
+                        if actual != schema_name:
+                            leaks.append((schema_name, actual))
+        finally:
+            schema_router.clear_tenant_schema()
+            connection.close()
+        return checks, leaks
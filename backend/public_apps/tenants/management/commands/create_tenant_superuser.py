@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from public_apps.tenants.models import Tenant
+from public_apps.tenants.provisioning import provision_tenant
 from public_apps.tenants.schema_utils import SchemaManager
 import getpass
 import logging
@@ -66,7 +67,7 @@ class Command(BaseCommand):
         
         try:
             with transaction.atomic():
-                # Create tenant (this will trigger schema creation via signals)
+                # Create tenant (signals queue provisioning for after commit)
                 self.stdout.write('Creating tenant...')
                 tenant = Tenant.objects.create(
                     name=tenant_name,
@@ -76,14 +77,19 @@ class Command(BaseCommand):
                 )
                 
                 self.stdout.write(f'✓ Created tenant: {tenant.name}')
-                self.stdout.write(f'✓ Schema created: {tenant.schema_name}')
                 
-                # Wait for schema creation to complete
-                if not tenant.schema_exists():
+                # The superuser needs the schema now, so provision inline;
+                # the queued background task will find the tenant ready
+                tenant = provision_tenant(tenant.id)
+                if not tenant.is_ready:
                     self.stdout.write(
-                        self.style.ERROR(f'Schema {tenant.schema_name} was not created successfully!')
+                        self.style.ERROR(
+                            f'Schema {tenant.schema_name} was not created successfully: '
+                            f'{tenant.provisioning_error}'
+                        )
                     )
                     return
+                self.stdout.write(f'✓ Schema created: {tenant.schema_name}')
                 
                 # Switch to tenant schema to create superuser
                 self.stdout.write('Creating superuser in tenant schema...')
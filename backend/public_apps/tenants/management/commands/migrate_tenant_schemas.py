@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from public_apps.tenants.schema_utils import SchemaManager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import time
+
+
+def init_worker():
+    """Set up Django in a pool process (already done when the pool forks)"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def migrate_one(schema_name, app_labels):
+    """
+    Migrate one schema on this worker's own connection.
+    Returns (schema, error or None, migrations applied, migrations recorded, seconds).
+    """
+    started = time.monotonic()
+    before = SchemaManager.count_applied_migrations(schema_name)
+    error = None
+    try:
+        SchemaManager.migrate_schema(schema_name, app_labels, raise_errors=True)
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+    recorded = SchemaManager.count_applied_migrations(schema_name)
+    if error is None and recorded == 0:
+        error = 'No migrations are recorded for this schema after migrating'
+    return schema_name, error, recorded - before, recorded, time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = 'Run migrations for all tenant schemas with a bounded pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(8, os.cpu_count() or 1),
+            help='Number of schemas migrated concurrently',
+        )
+        parser.add_argument(
+            '--app-label',
+            dest='app_labels',
+            action='append',
+            help='Only migrate this app (can be repeated)',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip schemas that migrated successfully in the previous run',
+        )
+        parser.add_argument(
+            '--state-file',
+            default=os.path.join(settings.BASE_DIR, '.migrate_tenant_schemas.json'),
+            help='Where per-schema results are recorded for --resume',
+        )
+
+    def handle(self, *args, **options):
+        state_file = options['state_file']
+        schemas = SchemaManager.list_tenant_schemas()
+
+        state = {}
+        if options['resume'] and os.path.exists(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+            done = {name for name, result in state.items() if result['status'] == 'ok'}
+            skipped = len([name for name in schemas if name in done])
+            schemas = [name for name in schemas if name not in done]
+            self.stdout.write(f'Resuming: skipping {skipped} already migrated schemas')
+
+        # Keep new-tenant provisioning in step with the migrations being rolled out
+        if not SchemaManager.ensure_template_schema():
+            self.stderr.write('Could not rebuild the tenant template schema, see logs')
+
+        if not schemas:
+            self.stdout.write(self.style.SUCCESS('Nothing to migrate'))
+            return
+
+        workers = max(1, options['workers'])
+        self.stdout.write(f'Migrating {len(schemas)} schemas with {workers} workers...')
+
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+
+        started = time.monotonic()
+        failed = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = {
+                executor.submit(migrate_one, schema_name, options['app_labels']): schema_name
+                for schema_name in schemas
+            }
+            for position, future in enumerate(as_completed(futures), start=1):
+                schema_name = futures[future]
+                try:
+                    _, error, applied, recorded, seconds = future.result()
+                except Exception as e:
+                    error, applied, recorded, seconds = f'worker error: {e}', 0, None, 0.0
+
+                state[schema_name] = {
+                    'status': 'failed' if error else 'ok',
+                    'applied': applied,
+                    'recorded': recorded,
+                    'error': error,
+                    'seconds': round(seconds, 3),
+                }
+                self.write_state(state_file, state)
+
+                if error is None:
+                    self.stdout.write(
+                        f'[{position}/{len(schemas)}] {schema_name} ok, '
+                        f'{applied} applied, {recorded} recorded ({seconds:.2f}s)'
+                    )
+                else:
+                    failed.append(schema_name)
+                    self.stdout.write(self.style.ERROR(
+                        f'[{position}/{len(schemas)}] {schema_name} FAILED ({seconds:.2f}s): {error}'
+                    ))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'Finished {len(schemas)} schemas in {elapsed:.2f}s')
+
+        if failed:
+            raise CommandError(
+                f'{len(failed)} schemas failed: {", ".join(sorted(failed))}. '
+                f'Re-run with --resume to retry them'
+            )
+        self.stdout.write(self.style.SUCCESS('All tenant schemas migrated'))
+
+    def write_state(self, state_file, state):
+        """Persist progress after every schema so an interrupted run can resume"""
+        tmp_file = f'{state_file}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, state_file)
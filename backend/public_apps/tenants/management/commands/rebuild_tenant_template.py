@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from public_apps.tenants.schema_utils import SchemaManager
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pre-migrated template schema that new tenant schemas are cloned from'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild even if the template already matches the current migrations',
+        )
+
+    def handle(self, *args, **options):
+        template = settings.TENANT_TEMPLATE_SCHEMA
+        fingerprint = SchemaManager.get_migration_fingerprint()
+        self.stdout.write(f'Checking template schema {template} (migration state {fingerprint})...')
+
+        if not SchemaManager.ensure_template_schema(force=options['force']):
+            raise CommandError(f'Could not build template schema {template}, see logs')
+
+        self.stdout.write(self.style.SUCCESS(f'Template schema {template} is up to date'))
@@ -1,11 +1,16 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
-from django.http import Http404
+from django.http import JsonResponse
+from .cache import tenant_cache
 from .models import Tenant
 from .schema_utils import SchemaManager, schema_router
 import logging
 
 logger = logging.getLogger(__name__)
 
+_NOT_CACHED = object()
+
 
 class TenantMiddleware(MiddlewareMixin):
     """
@@ -16,6 +21,27 @@ class TenantMiddleware(MiddlewareMixin):
     4. Header (X-Tenant-Slug)
     """
     
+    def lookup_tenant(self, field, value):
+        """Find the active tenant whose field matches value, using the resolution cache"""
+        key = (field, value)
+        tenant = tenant_cache.get(key, _NOT_CACHED)
+        if tenant is not _NOT_CACHED:
+            return tenant
+        
+        try:
+            tenant = Tenant.objects.filter(**{field: value, 'is_active': True}).first()
+        except:
+            return None  # Database might not be migrated yet
+        
+        # Tenants still being provisioned are not cached, so they start serving as soon as they are ready
+        if tenant and not tenant.is_ready:
+            return tenant
+        
+        # Unknown hosts and slugs are cached for a shorter time than real tenants
+        ttl = None if tenant else settings.TENANT_CACHE_NEGATIVE_TTL
+        tenant_cache.set(key, tenant, ttl=ttl)
+        return tenant
+    
     def process_request(self, request):
         # Skip tenant resolution for admin and API documentation
         if request.path.startswith('/admin/') or request.path.startswith('/api/schema/'):
@@ -29,45 +55,40 @@ class TenantMiddleware(MiddlewareMixin):
         try:
             # Method 1: Check for custom domain
             host = request.get_host().split(':')[0].lower()
-            try:
-                tenant = Tenant.objects.filter(domain=host, is_active=True).first()
-            except:
-                pass  # Database might not be migrated yet
+            tenant = self.lookup_tenant('domain', host)
             
             # Method 2: Check for subdomain
             if not tenant and '.' in host:
                 subdomain = host.split('.')[0]
                 if subdomain != 'www':
-                    try:
-                        tenant = Tenant.objects.filter(slug=subdomain, is_active=True).first()
-                    except:
-                        pass
+                    tenant = self.lookup_tenant('slug', subdomain)
             
             # Method 3: Check URL path pattern /tenant/slug/
             if not tenant and request.path.startswith('/tenant/'):
                 path_parts = request.path.strip('/').split('/')
                 if len(path_parts) > 1:
-                    tenant_slug = path_parts[1]
-                    try:
-                        tenant = Tenant.objects.filter(slug=tenant_slug, is_active=True).first()
-                    except:
-                        pass
+                    tenant = self.lookup_tenant('slug', path_parts[1])
             
             # Method 4: Check X-Tenant-Slug header
             if not tenant:
                 tenant_slug = request.META.get('HTTP_X_TENANT_SLUG')
                 if tenant_slug:
-                    try:
-                        tenant = Tenant.objects.filter(slug=tenant_slug, is_active=True).first()
-                    except:
-                        pass
+                    tenant = self.lookup_tenant('slug', tenant_slug)
             
             # Set tenant and schema
             if tenant:
-                # Verify schema exists
-                if not tenant.schema_exists():
-                    logger.warning(f"Schema {tenant.schema_name} does not exist for tenant {tenant.slug}")
-                    raise Http404(f"Tenant {tenant.slug} is not properly configured")
+                # Refuse traffic until provisioning has finished
+                if not tenant.is_ready:
+                    logger.warning(f"Tenant {tenant.slug} is not ready: {tenant.provisioning_status}")
+                    SchemaManager.set_search_path('public')
+                    request.tenant = None
+                    return JsonResponse(
+                        {
+                            'detail': f"Tenant {tenant.slug} is not ready",
+                            'provisioning_status': tenant.provisioning_status,
+                        },
+                        status=503
+                    )
                 
                 # Set PostgreSQL schema
                 schema_router.set_tenant_schema(tenant.schema_name)
@@ -90,17 +111,42 @@ class TenantMiddleware(MiddlewareMixin):
             request.tenant = None
     
     def process_response(self, request, response):
-        # Reset to public schema after request
+        # Forget the tenant after request. search_path is left as is: every request
+        # sets it in process_request before touching the database, so resetting it
+        # here would only cost an extra round-trip.
         try:
-            schema_router.clear_tenant_schema()
+            schema_router.clear_tenant_schema(reset_search_path=False)
         except:
             pass  # Ignore errors during cleanup
         return response
     
     def process_exception(self, request, exception):
-        # Reset to public schema on exception
+        # Forget the tenant on exception
         try:
-            schema_router.clear_tenant_schema()
+            schema_router.clear_tenant_schema(reset_search_path=False)
         except:
             pass  # Ignore errors during cleanup
         return None
+
+
+class AsyncTenantMiddleware(TenantMiddleware):
+    """
+    Async-only variant of TenantMiddleware for ASGI deployments.
+    
+    Tenant resolution still needs the ORM, so it runs in a worker thread; the
+    tenant context it sets is copied back into the request's task. Cleanup
+    touches no database and runs inline, saving a thread hop per request.
+    """
+    
+    sync_capable = False
+    async_capable = True
+    
+    async def __acall__(self, request):
+        try:
+            # process_request answers directly for tenants that are not ready yet
+            response = await sync_to_async(self.process_request, thread_sensitive=True)(request)
+            if response is None:
+                response = await self.get_response(request)
+            return response
+        finally:
+            schema_router.clear_tenant_schema(reset_search_path=False)
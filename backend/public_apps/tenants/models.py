@@ -1,6 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
-from .schema_utils import SchemaManager
+from .schema_utils import SchemaManager, schema_registry
+from .stats import collect_tenant_stats, stats_from_counters
 import uuid
 
 
@@ -14,6 +16,20 @@ class Tenant(models.Model):
         ('enterprise', 'Enterprise'),
     ]
     
+    PROVISIONING_PENDING = 'pending'
+    PROVISIONING_SCHEMA_CREATED = 'schema_created'
+    PROVISIONING_MIGRATED = 'migrated'
+    PROVISIONING_READY = 'ready'
+    PROVISIONING_FAILED = 'failed'
+    
+    PROVISIONING_STATUS_CHOICES = [
+        (PROVISIONING_PENDING, 'Pending'),
+        (PROVISIONING_SCHEMA_CREATED, 'Schema Created'),
+        (PROVISIONING_MIGRATED, 'Migrated'),
+        (PROVISIONING_READY, 'Ready'),
+        (PROVISIONING_FAILED, 'Failed'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
@@ -26,6 +42,12 @@ class Tenant(models.Model):
     plan = models.CharField(max_length=20, choices=PLAN_CHOICES, default='free')
     is_active = models.BooleanField(default=True)
     
+    # Provisioning (schema, migrations and settings are set up in the background)
+    provisioning_status = models.CharField(
+        max_length=20, choices=PROVISIONING_STATUS_CHOICES, default=PROVISIONING_PENDING
+    )
+    provisioning_error = models.TextField(blank=True)
+    
     # Settings
     allow_public_signup = models.BooleanField(default=False)
     max_interviews = models.IntegerField(default=10)
@@ -55,7 +77,12 @@ class Tenant(models.Model):
     
     def schema_exists(self):
         """Check if tenant's schema exists"""
-        return SchemaManager.schema_exists(self.schema_name)
+        return schema_registry.contains(self.schema_name)
+    
+    @property
+    def is_ready(self):
+        """Whether provisioning has finished and the tenant can serve traffic"""
+        return self.provisioning_status == self.PROVISIONING_READY
         
     def __str__(self):
         return self.name
@@ -134,9 +161,57 @@ class TenantSettings(models.Model):
     enable_ai_grading = models.BooleanField(default=True)
     ai_grading_model = models.CharField(max_length=50, default='gpt-3.5-turbo')
     manual_review_threshold = models.FloatField(default=0.7)
+    # Local-model confidence below manual_review_threshold + this band is re-graded by ai_grading_model
+    ai_confidence_band = models.FloatField(default=0.15)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'tenant_settings'
+    
+    @property
+    def tenant(self):
+        """The public-schema Tenant these settings belong to"""
+        return Tenant.objects.get(id=self.tenant_id)
+
+
+class TenantStatsRollup(models.Model):
+    """Precomputed dashboard counters - stored in tenant's schema"""
+    
+    tenant_id = models.UUIDField(unique=True)  # Reference to tenant in public schema
+    
+    total_interviews = models.IntegerField(default=0)
+    active_interviews = models.IntegerField(default=0)
+    total_candidates = models.IntegerField(default=0)
+    total_questions = models.IntegerField(default=0)
+    
+    # Submission counters kept as sums; the average score is derived from them
+    total_submissions = models.IntegerField(default=0)
+    completed_submissions = models.IntegerField(default=0)
+    scored_submissions = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0.0)
+    
+    refreshed_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'tenant_stats_rollups'
+    
+    @classmethod
+    def refresh(cls, tenant):
+        """Recompute all counters for the tenant with a single query"""
+        counters = collect_tenant_stats(tenant)
+        rollup, _ = cls.objects.update_or_create(
+            tenant_id=tenant.id,
+            defaults={**counters, 'refreshed_at': timezone.now()}
+        )
+        return rollup
+    
+    @property
+    def age(self):
+        """Seconds since the counters were last fully recomputed"""
+        return (timezone.now() - self.refreshed_at).total_seconds()
+    
+    def as_stats(self):
+        """Dashboard statistics in the shape of TenantStatsSerializer"""
+        return stats_from_counters(self.__dict__)
@@ -0,0 +1,68 @@
+"""
+Tenant provisioning: schema creation, migrations and default settings
+"""
+
+import logging
+
+from .models import Tenant, TenantSettings
+from .schema_utils import SchemaManager
+
+logger = logging.getLogger(__name__)
+
+
+def set_provisioning_status(tenant, status, error=''):
+    """Persist a provisioning state transition"""
+    tenant.provisioning_status = status
+    tenant.provisioning_error = error
+    tenant.save(update_fields=['provisioning_status', 'provisioning_error', 'updated_at'])
+    logger.info(f"Tenant {tenant.slug} provisioning: {status}")
+
+
+def provision_tenant_schema(tenant):
+    """Create a migrated schema for the tenant, cloning the template when possible"""
+    # Fast path: copy the pre-migrated template schema
+    if SchemaManager.clone_template_schema(tenant.schema_name):
+        logger.info(f"Cloned template schema for tenant: {tenant.name}")
+        set_provisioning_status(tenant, Tenant.PROVISIONING_SCHEMA_CREATED)
+        return True
+    
+    # Slow path: create an empty schema and replay every migration
+    logger.warning(f"Template clone failed for tenant {tenant.name}, running migrations instead")
+    if not tenant.create_schema():
+        raise RuntimeError(f"Failed to create schema {tenant.schema_name}")
+    set_provisioning_status(tenant, Tenant.PROVISIONING_SCHEMA_CREATED)
+    
+    return SchemaManager.migrate_schema(tenant.schema_name)
+
+
+def provision_tenant(tenant_id):
+    """
+    Run the provisioning state machine for a tenant:
+    pending -> schema_created -> migrated -> ready, or failed on any error.
+    
+    Safe to call again for a failed or already provisioned tenant.
+    """
+    tenant = Tenant.objects.get(pk=tenant_id)
+    if tenant.is_ready:
+        return tenant
+    
+    try:
+        if tenant.provisioning_status != Tenant.PROVISIONING_MIGRATED:
+            if not provision_tenant_schema(tenant):
+                raise RuntimeError(f"Failed to run migrations for schema {tenant.schema_name}")
+            set_provisioning_status(tenant, Tenant.PROVISIONING_MIGRATED)
+        
+        # Switch to tenant schema and create settings
+        SchemaManager.set_search_path(tenant.schema_name)
+        try:
+            TenantSettings.objects.get_or_create(tenant_id=tenant.id)
+        finally:
+            # Always return to public schema
+            SchemaManager.set_search_path('public')
+        
+        set_provisioning_status(tenant, Tenant.PROVISIONING_READY)
+    except Exception as e:
+        logger.error(f"Error provisioning tenant {tenant.name}: {e}")
+        set_provisioning_status(tenant, Tenant.PROVISIONING_FAILED, error=str(e))
+    
+    return tenant
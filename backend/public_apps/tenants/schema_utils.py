@@ -2,16 +2,34 @@
 PostgreSQL Schema Management Utilities for Multi-Tenant Architecture
 """
 
+import contextlib
+import contextvars
+import hashlib
 import logging
-from pathlib import Path
+import os
+import threading
+import time
 
 from django.apps import apps
 from django.conf import settings
 from django.core.management import call_command
-from django.db import connection
+from django.db import connection, transaction
+
+from .cache import get_redis_client
 
 logger = logging.getLogger(__name__)
 
+# Tenant schema of the current request. Context variables are isolated per thread
+# and per asyncio task, matching how Django scopes the connection objects.
+_tenant_schema = contextvars.ContextVar('tenant_schema', default=None)
+
+# search_path applied per statement when TENANT_SCHEMA_MODE is 'transaction'
+_search_path = contextvars.ContextVar('search_path', default='public')
+
+# Migration fingerprint and template schema layout, computed once per process
+_migration_fingerprint = None
+_template_layouts = {}
+
 
 class SchemaManager:
     """Manages PostgreSQL schemas for multi-tenant architecture"""
@@ -28,6 +46,7 @@ class SchemaManager:
             try:
                 # Create schema
                 cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"')
+                schema_registry.add(schema_name)
                 logger.info(f"Created schema: {schema_name}")
                 return True
             except Exception as e:
@@ -40,6 +59,7 @@ class SchemaManager:
         with connection.cursor() as cursor:
             try:
                 cursor.execute(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE')
+                schema_registry.discard(schema_name)
                 logger.info(f"Dropped schema: {schema_name}")
                 return True
             except Exception as e:
@@ -48,7 +68,7 @@ class SchemaManager:
     
     @staticmethod
     def schema_exists(schema_name):
-        """Check if schema exists"""
+        """Check if schema exists (queries the catalog; use schema_registry on hot paths)"""
         with connection.cursor() as cursor:
             cursor.execute("""
                 SELECT EXISTS(
@@ -60,10 +80,44 @@ class SchemaManager:
     
     @staticmethod
     def set_search_path(schema_name):
-        """Set PostgreSQL search_path to use specific schema"""
+        """Set PostgreSQL search_path to use specific schema, skipping the SET if already active"""
+        if settings.TENANT_SCHEMA_MODE == 'transaction':
+            # Nothing is sent now; apply_local_search_path scopes it to each transaction
+            _search_path.set(schema_name)
+            return
+        
+        if (
+            connection.connection is not None
+            and not connection.in_atomic_block
+            and getattr(connection, 'tenant_search_path', None) == schema_name
+        ):
+            return
+        
         with connection.cursor() as cursor:
             cursor.execute(f'SET search_path TO "{schema_name}", public')
             logger.debug(f"Set search_path to: {schema_name}")
+        
+        # A SET inside a transaction is undone on rollback, so only remember it in autocommit
+        connection.tenant_search_path = None if connection.in_atomic_block else schema_name
+    
+    @staticmethod
+    def forget_search_path():
+        """
+        Drop the search_path remembered by set_search_path, after SQL outside it
+        may have changed the session's, so the next set_search_path sends its SET
+        """
+        connection.tenant_search_path = None
+    
+    @staticmethod
+    def get_active_schema():
+        """Schema last applied through set_search_path in this context, queried only if unknown"""
+        if settings.TENANT_SCHEMA_MODE == 'transaction':
+            return _search_path.get()
+        if connection.connection is not None and not connection.in_atomic_block:
+            schema_name = getattr(connection, 'tenant_search_path', None)
+            if schema_name:
+                return schema_name
+        return SchemaManager.get_current_schema()
     
     @staticmethod
     def get_current_schema():
@@ -73,22 +127,23 @@ class SchemaManager:
             return cursor.fetchone()[0]
         
     @staticmethod
-    def get_user_defined_public_apps():
-        user_public_apps = []
-        project_root = Path(settings.BASE_DIR)
-        apps_dir = project_root / 'apps'
-        if not apps_dir.is_dir():
-            logger.warning(f"Apps directory not found: {apps_dir}")
-            return user_public_apps
-
-        user_public_apps = [item.name for item in apps_dir.iterdir() if item.is_dir()]
-
-        return user_public_apps
-            
+    def get_tenant_app_labels():
+        """Labels of installed apps under tenant_apps that have migrations, in INSTALLED_APPS order"""
+        from django.db.migrations.loader import MigrationLoader
+        migrated_apps = MigrationLoader(None, ignore_no_migrations=True).migrated_apps
+        return [
+            app_config.label for app_config in apps.get_app_configs()
+            if app_config.name.startswith('tenant_apps.') and app_config.label in migrated_apps
+        ]
     
     @staticmethod
-    def migrate_schema(schema_name, app_labels=None):
-        """Run Django migrations for a specific schema"""
+    def migrate_schema(schema_name, app_labels=None, raise_errors=False):
+        """
+        Run Django migrations for a specific schema.
+        
+        Returns False on failure, or with raise_errors re-raises the error,
+        including a failure of a single app and finding no apps to migrate.
+        """
         try:
             
             # Set search path to the tenant schema
@@ -99,13 +154,16 @@ class SchemaManager:
                 for app_label in app_labels:
                     call_command('migrate', app_label, verbosity=0, interactive=False)
             else:
-                # Get all installed apps except tenants
-                tenant_apps = SchemaManager.get_user_defined_public_apps()
+                tenant_apps = SchemaManager.get_tenant_app_labels()
+                if not tenant_apps and raise_errors:
+                    raise RuntimeError("No tenant apps with migrations found to migrate")
                 
                 for app_label in tenant_apps:
                     try:
                         call_command('migrate', app_label, verbosity=0, interactive=False)
                     except Exception as app_error:
+                        if raise_errors:
+                            raise RuntimeError(f"{app_label}: {app_error}") from app_error
                         logger.warning(f"Could not migrate app {app_label} for schema {schema_name}: {app_error}")
         
             logger.info(f"Migrations completed for schema: {schema_name}")
@@ -113,39 +171,362 @@ class SchemaManager:
             
         except Exception as e:
             logger.error(f"Error running migrations for schema {schema_name}: {e}")
+            if raise_errors:
+                raise
             return False
         finally:
             # Reset to public schema
             SchemaManager.set_search_path('public')
     
+    @staticmethod
+    def count_applied_migrations(schema_name):
+        """Migrations recorded in a schema's django_migrations table (0 if it has none)"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [f'"{schema_name}"."django_migrations"'])
+            if cursor.fetchone()[0] is None:
+                return 0
+            cursor.execute(f'SELECT COUNT(*) FROM "{schema_name}"."django_migrations"')
+            return cursor.fetchone()[0]
+    
+    @staticmethod
+    def get_missing_migrations(schema_name):
+        """Tenant app migrations on disk that are not recorded in a schema's django_migrations"""
+        from django.db.migrations.loader import MigrationLoader
+        tenant_apps = set(SchemaManager.get_tenant_app_labels())
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        expected = {key for key in loader.disk_migrations if key[0] in tenant_apps}
+        
+        recorded = set()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [f'"{schema_name}"."django_migrations"'])
+            if cursor.fetchone()[0] is not None:
+                cursor.execute(f'SELECT app, name FROM "{schema_name}"."django_migrations"')
+                recorded = set(cursor.fetchall())
+        return sorted(expected - recorded)
+    
     @staticmethod
     def list_tenant_schemas():
-        """List all tenant schemas"""
+        """List all tenant schemas (excluding the provisioning template)"""
         with connection.cursor() as cursor:
             cursor.execute("""
                 SELECT schema_name FROM information_schema.schemata 
-                WHERE schema_name LIKE 'tenant_%'
+                WHERE schema_name LIKE 'tenant_%%' AND schema_name <> %s
                 ORDER BY schema_name
-            """)
+            """, [settings.TENANT_TEMPLATE_SCHEMA])
             return [row[0] for row in cursor.fetchall()]
+    
+    @staticmethod
+    def get_migration_fingerprint():
+        """Short hash of every migration on disk - changes whenever the migration state does"""
+        global _migration_fingerprint
+        if _migration_fingerprint is None:
+            from django.db.migrations.loader import MigrationLoader
+            loader = MigrationLoader(None, ignore_no_migrations=True)
+            nodes = sorted(f'{app_label}.{name}' for app_label, name in loader.disk_migrations)
+            _migration_fingerprint = hashlib.sha256('\n'.join(nodes).encode()).hexdigest()[:16]
+        return _migration_fingerprint
+    
+    @staticmethod
+    def ensure_template_schema(force=False):
+        """
+        Make sure the pre-migrated template schema matches the current migrations.
+        
+        The migration fingerprint is stored as the schema's comment; when it
+        differs a new template is migrated in a staging schema and swapped in.
+        Migrations run outside any transaction, since some cannot run atomically,
+        and clones never see a half-built template. A staging schema that fails
+        to migrate, or lacks any tenant migration, is never swapped in.
+        """
+        template = settings.TENANT_TEMPLATE_SCHEMA
+        fingerprint = SchemaManager.get_migration_fingerprint()
+        # Not matched by list_tenant_schemas, so tenant migrations leave it alone
+        staging = f'build_{template}_{os.getpid()}'
+        
+        def template_fingerprint(cursor):
+            cursor.execute(
+                "SELECT obj_description(oid, 'pg_namespace') FROM pg_namespace WHERE nspname = %s",
+                [template]
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        
+        with connection.cursor() as cursor:
+            if not force and template_fingerprint(cursor) == fingerprint:
+                return True
+        
+        try:
+            logger.info(f"Rebuilding template schema {template} for migration state {fingerprint}")
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP SCHEMA IF EXISTS "{staging}" CASCADE')
+                cursor.execute(f'CREATE SCHEMA "{staging}"')
+            
+            SchemaManager.migrate_schema(staging, raise_errors=True)
+            missing = SchemaManager.get_missing_migrations(staging)
+            if missing:
+                raise RuntimeError(
+                    f"Template schema {template} is missing {len(missing)} tenant migrations, "
+                    f"e.g. {'.'.join(missing[0])}"
+                )
+            
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    # Serialize swaps across processes; the first finished build wins
+                    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [template])
+                    if force or template_fingerprint(cursor) != fingerprint:
+                        cursor.execute(f'DROP SCHEMA IF EXISTS "{template}" CASCADE')
+                        cursor.execute(f'ALTER SCHEMA "{staging}" RENAME TO "{template}"')
+                        cursor.execute(f'COMMENT ON SCHEMA "{template}" IS %s', [fingerprint])
+            return True
+        except Exception as e:
+            logger.error(f"Error building template schema {template}: {e}")
+            return False
+        finally:
+            # The build migrated under the staging schema and renamed schemas underneath the session
+            SchemaManager.forget_search_path()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP SCHEMA IF EXISTS "{staging}" CASCADE')
+            except Exception as e:
+                logger.warning(f"Could not drop staging schema {staging}: {e}")
+    
+    @staticmethod
+    def get_template_layout():
+        """Tables and foreign keys of the template schema, cached per migration state"""
+        fingerprint = SchemaManager.get_migration_fingerprint()
+        if fingerprint in _template_layouts:
+            return _template_layouts[fingerprint]
+        
+        template = settings.TENANT_TEMPLATE_SCHEMA
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # With the template first in search_path, constraint definitions
+                # reference its tables unqualified and can be replayed elsewhere
+                cursor.execute(f'SET LOCAL search_path TO "{template}", public')
+                cursor.execute("""
+                    SELECT c.relname FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = %s AND c.relkind IN ('r', 'p')
+                    ORDER BY c.relname
+                """, [template])
+                tables = [row[0] for row in cursor.fetchall()]
+                cursor.execute("""
+                    SELECT cl.relname, con.conname, pg_get_constraintdef(con.oid)
+                    FROM pg_constraint con
+                    JOIN pg_class cl ON cl.oid = con.conrelid
+                    JOIN pg_namespace n ON n.oid = cl.relnamespace
+                    WHERE n.nspname = %s AND con.contype = 'f'
+                    ORDER BY cl.relname, con.conname
+                """, [template])
+                foreign_keys = cursor.fetchall()
+        # Inside an outer transaction the SET LOCAL is still in effect
+        SchemaManager.forget_search_path()
+        
+        _template_layouts[fingerprint] = (tables, foreign_keys)
+        return tables, foreign_keys
+    
+    @staticmethod
+    def clone_template_schema(schema_name):
+        """
+        Create a tenant schema as a copy of the template schema, without running migrations.
+        
+        Tables are copied with CREATE TABLE ... (LIKE ... INCLUDING ALL), which
+        brings columns, defaults, identity columns, checks and indexes; foreign
+        keys are re-added from the template's definitions and applied
+        migrations are copied so later migrate runs pick up where it left off.
+        Everything is sent as a single statement inside one transaction.
+        """
+        template = settings.TENANT_TEMPLATE_SCHEMA
+        try:
+            if not SchemaManager.ensure_template_schema():
+                return False
+            tables, foreign_keys = SchemaManager.get_template_layout()
+            
+            statements = [
+                f'CREATE SCHEMA "{schema_name}"',
+                f'SET LOCAL search_path TO "{schema_name}", public',
+            ]
+            for table in tables:
+                statements.append(
+                    f'CREATE TABLE "{schema_name}"."{table}" (LIKE "{template}"."{table}" INCLUDING ALL)'
+                )
+            for table, constraint, definition in foreign_keys:
+                statements.append(
+                    f'ALTER TABLE "{schema_name}"."{table}" ADD CONSTRAINT "{constraint}" {definition}'
+                )
+            if 'django_migrations' in tables:
+                # Without ids, so the clone's own identity sequence numbers later migrations
+                statements.append(
+                    f'INSERT INTO "{schema_name}"."django_migrations" (app, name, applied) '
+                    f'SELECT app, name, applied FROM "{template}"."django_migrations" ORDER BY id'
+                )
+            
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(';\n'.join(statements))
+            finally:
+                # Inside an outer transaction the SET LOCAL is still in effect
+                SchemaManager.forget_search_path()
+            
+            schema_registry.add(schema_name)
+            logger.info(f"Cloned schema {schema_name} from {template} ({len(tables)} tables)")
+            return True
+        except Exception as e:
+            logger.error(f"Error cloning template schema into {schema_name}: {e}")
+            return False
 
 
-class TenantSchemaRouter:
-    """Database router for schema-based multi-tenancy"""
+def apply_local_search_path(execute, sql, params, many, context):
+    """
+    Connection execute_wrapper used when TENANT_SCHEMA_MODE is 'transaction'.
+    
+    Each statement is prefixed with SET LOCAL so the search_path only lives as
+    long as its transaction and never sticks to a pooled server connection
+    (PgBouncer transaction pooling). Both statements go out in one round-trip.
+    """
+    set_local = f'SET LOCAL search_path TO "{_search_path.get()}", public'
+    if not many:
+        return execute(f'{set_local}; {sql}', params)
+    
+    cursor = context['cursor'].cursor
+    if not context['connection'].get_autocommit():
+        # Inside a transaction the SET LOCAL holds for every row
+        cursor.execute(set_local)
+        return execute(sql, params)
+    
+    # In autocommit every row is its own transaction
+    for row_params in params:
+        cursor.execute(f'{set_local}; {sql}', row_params)
+
+
+@contextlib.contextmanager
+def schema_context(schema_name):
+    """Temporarily switch search_path to schema_name, restoring the previous schema afterwards"""
+    previous = SchemaManager.get_active_schema()
+    SchemaManager.set_search_path(schema_name)
+    try:
+        yield
+    finally:
+        SchemaManager.set_search_path(previous)
+
+
+class SchemaRegistry:
+    """
+    In-memory set of tenant schemas, loaded once per process.
+    
+    create_schema/drop_schema update the local set and bump a version counter
+    in Redis; other processes compare their version against it at most every
+    SCHEMA_REGISTRY_CHECK_INTERVAL seconds and reload when it has moved. If
+    Redis is unreachable the set is simply reloaded on that interval.
+    """
+    
+    VERSION_KEY = 'skiller:tenant_schemas:version'
     
     def __init__(self):
-        self.tenant_schema = None
+        self._schemas = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    def contains(self, schema_name):
+        """Check if schema exists without querying information_schema on a hit"""
+        with self._lock:
+            self._sync()
+            if schema_name in self._schemas:
+                return True
+        
+        # Unknown locally - it may have just been created by another process
+        if SchemaManager.schema_exists(schema_name):
+            self.add(schema_name, publish=False)
+            return True
+        return False
+    
+    def add(self, schema_name, publish=True):
+        """Record a newly created schema"""
+        with self._lock:
+            if self._schemas is not None:
+                self._schemas.add(schema_name)
+            if publish:
+                self._publish()
+    
+    def discard(self, schema_name):
+        """Record a dropped schema"""
+        with self._lock:
+            if self._schemas is not None:
+                self._schemas.discard(schema_name)
+            self._publish()
+    
+    def reload(self):
+        """Force a reload from the catalog on next access"""
+        with self._lock:
+            self._schemas = None
+    
+    def _sync(self):
+        now = time.monotonic()
+        if self._schemas is not None and now - self._checked_at < settings.SCHEMA_REGISTRY_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        
+        version = self._remote_version()
+        if self._schemas is None or version is None or version != self._version:
+            self._schemas = set(SchemaManager.list_tenant_schemas())
+            self._version = version
+            logger.debug(f"Loaded {len(self._schemas)} tenant schemas (version {version})")
+    
+    def _remote_version(self):
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            return int(client.get(self.VERSION_KEY) or 0)
+        except Exception as e:
+            logger.debug(f"Could not read schema registry version: {e}")
+            return None
+    
+    def _publish(self):
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            version = client.incr(self.VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Could not publish schema registry change: {e}")
+            return
+        
+        # Only our own change happened since the last sync - no reload needed
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+        else:
+            self._version = None
+
+
+class TenantSchemaRouter:
+    """
+    Database router for schema-based multi-tenancy.
+    
+    The active tenant lives in a context variable rather than on the instance,
+    so concurrent requests in threaded or ASGI workers each see their own
+    tenant. search_path is applied to `connection`, which Django also keeps
+    per thread / async context.
+    """
+    
+    @property
+    def tenant_schema(self):
+        """Tenant schema active in the current context, or None"""
+        return _tenant_schema.get()
     
     def set_tenant_schema(self, schema_name):
         """Set the current tenant schema"""
-        self.tenant_schema = schema_name
+        _tenant_schema.set(schema_name)
         SchemaManager.set_search_path(schema_name)
     
-    def clear_tenant_schema(self):
+    def clear_tenant_schema(self, reset_search_path=True):
         """Clear tenant schema and return to public"""
-        self.tenant_schema = None
-        SchemaManager.set_search_path('public')
+        _tenant_schema.set(None)
+        if reset_search_path:
+            SchemaManager.set_search_path('public')
 
 
-# Global router instance
+# Global instances
+schema_registry = SchemaRegistry()
 schema_router = TenantSchemaRouter()
@@ -7,9 +7,21 @@ class TenantSerializer(serializers.ModelSerializer):
         model = Tenant
         fields = [
             'id', 'name', 'slug', 'domain', 'logo', 'description',
-            'plan', 'is_active', 'created_at', 'updated_at'
+            'plan', 'is_active', 'provisioning_status', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'provisioning_status', 'created_at', 'updated_at']
+
+
+class TenantProvisioningStatusSerializer(serializers.ModelSerializer):
+    is_ready = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = Tenant
+        fields = [
+            'id', 'slug', 'provisioning_status', 'provisioning_error',
+            'is_ready', 'updated_at'
+        ]
+        read_only_fields = fields
 
 
 class TenantUserSerializer(serializers.ModelSerializer):
@@ -37,7 +49,7 @@ class TenantSettingsSerializer(serializers.ModelSerializer):
             'default_interview_duration', 'allow_code_execution',
             'require_webcam', 'auto_submit_on_time_end',
             'enable_ai_grading', 'ai_grading_model',
-            'manual_review_threshold'
+            'manual_review_threshold', 'ai_confidence_band'
         ]
 
 
@@ -49,3 +61,4 @@ class TenantStatsSerializer(serializers.Serializer):
     total_questions = serializers.IntegerField()
     completion_rate = serializers.FloatField()
     average_score = serializers.FloatField()
+    rollup_age = serializers.FloatField(allow_null=True, help_text="Seconds since the rollup was refreshed; null for live stats")
@@ -1,42 +1,71 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .cache import tenant_cache
 from .models import Tenant, TenantSettings
-from .schema_utils import SchemaManager
+from .provisioning import provision_tenant
+from .schema_utils import apply_local_search_path
+from .tasks import provision_tenant_task, push_tenant_grading_settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@receiver(connection_created)
+def prepare_tenant_connection(sender, connection, **kwargs):
+    """Reset search_path tracking on a new connection and install per-transaction switching"""
+    # A new database connection starts with the server's default search_path
+    connection.tenant_search_path = None
+    
+    if settings.TENANT_SCHEMA_MODE == 'transaction' and apply_local_search_path not in connection.execute_wrappers:
+        connection.execute_wrappers.append(apply_local_search_path)
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    """Drop cached tenant lookups so domain/slug/is_active changes apply immediately in this process"""
+    tenant_cache.clear()
+
+
 @receiver(post_save, sender=Tenant)
 def create_tenant_schema_and_settings(sender, instance, created, **kwargs):
-    """Create schema and default settings when a new tenant is created"""
-    if created:
+    """Provision schema and default settings when a new tenant is created"""
+    if not created:
+        return
+    
+    if not settings.TENANT_PROVISIONING_ASYNC:
+        provision_tenant(instance.id)
+        return
+    
+    tenant_id = str(instance.id)
+    
+    def enqueue():
+        try:
+            provision_tenant_task.delay(tenant_id)
+        except Exception as e:
+            # Broker unavailable - provision inline rather than leave the tenant pending
+            logger.error(f"Could not queue provisioning for tenant {instance.name}: {e}")
+            provision_tenant(tenant_id)
+    
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_save, sender=TenantSettings)
+def sync_grading_settings(sender, instance, **kwargs):
+    """Push grading model and review thresholds to the AI service's grading cascade"""
+    # The service keys settings by schema name, whichever schema this save went through
+    schema_name = instance.tenant.schema_name
+    
+    def enqueue():
         try:
-            # Create PostgreSQL schema for the tenant
-            if instance.create_schema():
-                logger.info(f"Created schema for tenant: {instance.name}")
-                
-                # Run migrations in the new schema
-                if SchemaManager.migrate_schema(instance.schema_name):
-                    logger.info(f"Migrations completed for tenant: {instance.name}")
-                    
-                    # Switch to tenant schema and create settings
-                    SchemaManager.set_search_path(instance.schema_name)
-                    try:
-                        TenantSettings.objects.create(tenant_id=instance.id)
-                        logger.info(f"Created settings for tenant: {instance.name}")
-                    except Exception as e:
-                        logger.error(f"Error creating settings for tenant {instance.name}: {e}")
-                    finally:
-                        # Always return to public schema
-                        SchemaManager.set_search_path('public')
-                else:
-                    logger.error(f"Failed to run migrations for tenant: {instance.name}")
-            else:
-                logger.error(f"Failed to create schema for tenant: {instance.name}")
-                
+            push_tenant_grading_settings.delay(schema_name)
         except Exception as e:
-            logger.error(f"Error in tenant creation process for {instance.name}: {e}")
+            logger.error(f"Could not queue grading settings sync for {schema_name}: {e}")
+    
+    transaction.on_commit(enqueue)
 
 
 @receiver(post_delete, sender=Tenant)
@@ -0,0 +1,84 @@
+"""
+Tenant dashboard statistics
+"""
+
+from django.apps import apps
+from django.db import connection
+
+
+def _optional_model(app_label, model_name):
+    """A tenant app's model, or None while the app does not define it yet"""
+    try:
+        return apps.get_model(app_label, model_name)
+    except LookupError:
+        return None
+
+
+def collect_tenant_stats(tenant):
+    """
+    Compute the raw dashboard counters for a tenant in one round-trip.
+    
+    Each table is scanned once with conditional aggregates, and tables are
+    qualified with the tenant's schema so the result does not depend on the
+    connection's current search_path. Interviews, candidates and submissions
+    count as zero until their apps define those models.
+    """
+    # Import here to avoid circular imports
+    from tenant_apps.questions.models import Question
+    Interview = _optional_model('interviews', 'Interview')
+    Candidate = _optional_model('candidates', 'Candidate')
+    Submission = _optional_model('submissions', 'Submission')
+    
+    def table(model):
+        return f'{connection.ops.quote_name(tenant.schema_name)}.{connection.ops.quote_name(model._meta.db_table)}'
+    
+    interviews = f"""
+        (SELECT COUNT(*) AS total,
+                COUNT(*) FILTER (WHERE status = 'active') AS active
+         FROM {table(Interview)})""" if Interview else "(SELECT 0 AS total, 0 AS active)"
+    candidates = f"(SELECT COUNT(*) AS total FROM {table(Candidate)})" if Candidate else "(SELECT 0 AS total)"
+    submissions = f"""
+        (SELECT COUNT(*) AS total,
+                COUNT(*) FILTER (WHERE status = 'completed') AS completed,
+                COUNT(total_score) FILTER (WHERE status = 'completed') AS scored,
+                COALESCE(SUM(total_score) FILTER (WHERE status = 'completed'), 0) AS score_sum
+         FROM {table(Submission)})""" if Submission else (
+        "(SELECT 0 AS total, 0 AS completed, 0 AS scored, 0 AS score_sum)"
+    )
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT i.total, i.active, c.total, q.total,
+                   s.total, s.completed, s.scored, s.score_sum
+            FROM
+                {interviews} i,
+                {candidates} c,
+                (SELECT COUNT(*) AS total FROM {table(Question)}) q,
+                {submissions} s
+        """)
+        row = cursor.fetchone()
+    
+    return {
+        'total_interviews': row[0],
+        'active_interviews': row[1],
+        'total_candidates': row[2],
+        'total_questions': row[3],
+        'total_submissions': row[4],
+        'completed_submissions': row[5],
+        'scored_submissions': row[6],
+        'score_sum': float(row[7]),
+    }
+
+
+def stats_from_counters(counters):
+    """Dashboard statistics in the shape of TenantStatsSerializer"""
+    total = counters['total_submissions']
+    scored = counters['scored_submissions']
+    return {
+        'total_interviews': counters['total_interviews'],
+        'active_interviews': counters['active_interviews'],
+        'total_candidates': counters['total_candidates'],
+        'total_questions': counters['total_questions'],
+        'completion_rate': counters['completed_submissions'] / total if total else 0.0,
+        'average_score': counters['score_sum'] / scored if scored else 0.0,
+    }
@@ -0,0 +1,58 @@
+import requests
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+from .models import Tenant, TenantSettings, TenantStatsRollup
+from .provisioning import provision_tenant
+from .schema_utils import schema_context
+
+
+@shared_task(name='tenants.provision_tenant')
+def provision_tenant_task(tenant_id):
+    """Provision a newly created tenant in the background"""
+    tenant = provision_tenant(tenant_id)
+    return tenant.provisioning_status
+
+
+@shared_task(name='tenants.refresh_tenant_stats_rollup')
+def refresh_tenant_stats_rollup(tenant_id):
+    """Recompute one tenant's dashboard rollup"""
+    tenant = Tenant.objects.get(pk=tenant_id)
+    with schema_context(tenant.schema_name):
+        TenantStatsRollup.refresh(tenant)
+
+
+@shared_task(name='tenants.refresh_stale_tenant_stats_rollups')
+def refresh_stale_tenant_stats_rollups():
+    """Scheduled refresh of every ready tenant whose rollup is older than TENANT_STATS_ROLLUP_MAX_AGE"""
+    cutoff = timezone.now() - timedelta(seconds=settings.TENANT_STATS_ROLLUP_MAX_AGE)
+    for tenant in Tenant.objects.filter(is_active=True, provisioning_status=Tenant.PROVISIONING_READY):
+        with schema_context(tenant.schema_name):
+            if TenantStatsRollup.objects.filter(tenant_id=tenant.id, refreshed_at__gte=cutoff).exists():
+                continue
+            TenantStatsRollup.refresh(tenant)
+
+
+@shared_task(name='tenants.push_tenant_grading_settings', bind=True, max_retries=5, default_retry_delay=30)
+def push_tenant_grading_settings(self, schema_name):
+    """Send a tenant's grading cascade settings to the AI grading service"""
+    with schema_context(schema_name):
+        tenant_settings = TenantSettings.objects.first()
+    if tenant_settings is None:
+        return None
+    
+    try:
+        response = requests.put(
+            f"{settings.AI_SERVICE_URL.rstrip('/')}/tenants/{schema_name}/grading-settings",
+            json={
+                'ai_grading_model': tenant_settings.ai_grading_model,
+                'manual_review_threshold': tenant_settings.manual_review_threshold,
+                'confidence_band': tenant_settings.ai_confidence_band,
+            },
+            timeout=settings.AI_SERVICE_TIMEOUT,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise self.retry(exc=e)
+    return response.json()
@@ -0,0 +1,20 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from .models import Tenant, TenantSettings
+
+
+class GradingSettingsSyncTests(TestCase):
+    """TenantSettings changes reach the AI service under the owning tenant's schema"""
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+
+    @mock.patch('public_apps.tenants.signals.push_tenant_grading_settings')
+    def test_pushes_under_owning_schema_not_active_one(self, push):
+        # Saved with search_path on public, as the admin or a backfill would
+        with self.captureOnCommitCallbacks(execute=True):
+            TenantSettings.objects.create(tenant_id=self.tenant.id, manual_review_threshold=0.6)
+
+        push.delay.assert_called_once_with(self.tenant.schema_name)
@@ -1,13 +1,53 @@
+import logging
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Avg
-from .models import Tenant, TenantUser, TenantSettings
+from django.conf import settings
+from .cache import TTLCache, get_redis_client
+from .models import Tenant, TenantUser, TenantSettings, TenantStatsRollup
+from .schema_utils import schema_context
+from .stats import collect_tenant_stats, stats_from_counters
+from .tasks import refresh_tenant_stats_rollup
 from .serializers import (
     TenantSerializer, TenantUserSerializer, 
-    TenantSettingsSerializer, TenantStatsSerializer
+    TenantSettingsSerializer, TenantStatsSerializer,
+    TenantProvisioningStatusSerializer
 )
 
+logger = logging.getLogger(__name__)
+
+# Tenants whose rollup refresh was queued recently, for when Redis is unavailable
+_rollup_refresh_requested = TTLCache(max_entries=1024, ttl=settings.TENANT_STATS_REFRESH_LOCK_TTL)
+
+
+def request_rollup_refresh(tenant):
+    """
+    Queue a refresh of a tenant's stale rollup at most once per
+    TENANT_STATS_REFRESH_LOCK_TTL, across processes when Redis is reachable.
+    Returns whether a refresh was queued; never raises, so a broker outage
+    only means the stale rollup is served a while longer.
+    """
+    key = f'skiller:stats-refresh:{tenant.id}'
+    if _rollup_refresh_requested.get(key):
+        return False
+    _rollup_refresh_requested.set(key, True)
+    
+    client = get_redis_client()
+    if client is not None:
+        try:
+            if not client.set(key, 1, nx=True, ex=settings.TENANT_STATS_REFRESH_LOCK_TTL):
+                return False
+        except Exception as e:
+            logger.debug(f"Stats refresh lock unavailable, using the local one: {e}")
+    
+    try:
+        refresh_tenant_stats_rollup.delay(str(tenant.id))
+    except Exception as e:
+        logger.warning(f"Could not queue stats rollup refresh for tenant {tenant.slug}: {e}")
+        return False
+    return True
+
 
 class TenantViewSet(viewsets.ModelViewSet):
     serializer_class = TenantSerializer
@@ -19,46 +59,34 @@ class TenantViewSet(viewsets.ModelViewSet):
             return Tenant.objects.all()
         return Tenant.objects.filter(id=user.tenant.id)
     
+    @action(detail=True, methods=['get'], url_path='status')
+    def provisioning_status(self, request, pk=None):
+        """Get tenant provisioning status"""
+        tenant = self.get_object()
+        serializer = TenantProvisioningStatusSerializer(tenant)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
         """Get tenant statistics"""
         tenant = self.get_object()
         
-        # Import here to avoid circular imports
-        from interviews.models import Interview
-        from candidates.models import Candidate
-        from questions.models import Question
-        from submissions.models import Submission
-        
-        stats_data = {
-            'total_interviews': Interview.objects.filter(tenant=tenant).count(),
-            'active_interviews': Interview.objects.filter(
-                tenant=tenant, 
-                status='active'
-            ).count(),
-            'total_candidates': Candidate.objects.filter(tenant=tenant).count(),
-            'total_questions': Question.objects.filter(tenant=tenant).count(),
-            'completion_rate': 0.0,
-            'average_score': 0.0,
-        }
-        
-        # Calculate completion rate
-        total_submissions = Submission.objects.filter(tenant=tenant).count()
-        completed_submissions = Submission.objects.filter(
-            tenant=tenant,
-            status='completed'
-        ).count()
-        
-        if total_submissions > 0:
-            stats_data['completion_rate'] = completed_submissions / total_submissions
-        
-        # Calculate average score
-        avg_score = Submission.objects.filter(
-            tenant=tenant,
-            status='completed'
-        ).aggregate(avg_score=Avg('total_score'))
-        
-        stats_data['average_score'] = avg_score['avg_score'] or 0.0
+        source = request.query_params.get('source', settings.TENANT_STATS_SOURCE)
+        if source == 'rollup':
+            with schema_context(tenant.schema_name):
+                rollup = TenantStatsRollup.objects.filter(tenant_id=tenant.id).first()
+                if rollup is None:
+                    rollup = TenantStatsRollup.refresh(tenant)
+            
+            # Serve the stored counters; a stale rollup is refreshed in the background
+            if rollup.age > settings.TENANT_STATS_ROLLUP_MAX_AGE:
+                request_rollup_refresh(tenant)
+            
+            stats_data = rollup.as_stats()
+            stats_data['rollup_age'] = rollup.age
+        else:
+            stats_data = stats_from_counters(collect_tenant_stats(tenant))
+            stats_data['rollup_age'] = None
         
         serializer = TenantStatsSerializer(stats_data)
         return Response(serializer.data)
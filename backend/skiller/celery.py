@@ -0,0 +1,13 @@
+"""
+Celery application for skiller project.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'skiller.settings')
+
+app = Celery('skiller')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -42,9 +42,12 @@ INSTALLED_APPS = [
     'tenant_apps.candidates',
 ]
 
+# Use public_apps.tenants.middleware.AsyncTenantMiddleware when serving through skiller.asgi
+TENANT_MIDDLEWARE = config('TENANT_MIDDLEWARE', default='public_apps.tenants.middleware.TenantMiddleware')
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
-    'public_apps.tenants.middleware.TenantMiddleware',
+    TENANT_MIDDLEWARE,
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,9 +86,24 @@ DATABASES = {
         'PASSWORD': config('POSTGRES_PASSWORD', default='skiller_pass'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Persistent connections let the tracked search_path survive across requests
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# How tenant schemas are applied to connections:
+#   'session'     - SET search_path once per connection (direct Postgres / session pooling)
+#   'transaction' - SET LOCAL per transaction, safe behind PgBouncer in transaction mode
+TENANT_SCHEMA_MODE = config('TENANT_SCHEMA_MODE', default='session')
+
+if TENANT_SCHEMA_MODE == 'transaction':
+    # Server-side cursors do not survive transaction pooling
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Pre-migrated schema that new tenant schemas are cloned from
+TENANT_TEMPLATE_SCHEMA = config('TENANT_TEMPLATE_SCHEMA', default='tenant_template')
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -152,6 +170,16 @@ JWT_SECRET = config('JWT_SECRET', default='jwt-secret-key')
 JWT_ALGORITHM = config('JWT_ALGORITHM', default='HS256')
 JWT_EXPIRATION_HOURS = config('JWT_EXPIRATION_HOURS', default=24, cast=int)
 
+# Authenticated principal cache (seconds / entries). The in-process tier is kept
+# short because other workers only see invalidations once their copy expires.
+PRINCIPAL_CACHE_TTL = config('PRINCIPAL_CACHE_TTL', default=10, cast=int)
+PRINCIPAL_CACHE_REDIS_TTL = config('PRINCIPAL_CACHE_REDIS_TTL', default=300, cast=int)
+PRINCIPAL_CACHE_MAX_ENTRIES = config('PRINCIPAL_CACHE_MAX_ENTRIES', default=4096, cast=int)
+
+# AI grading service
+AI_SERVICE_URL = config('AI_SERVICE_URL', default='http://localhost:8001')
+AI_SERVICE_TIMEOUT = config('AI_SERVICE_TIMEOUT', default=30, cast=int)
+
 # Kafka settings
 KAFKA_BOOTSTRAP_SERVERS = [server.strip() for server in str(config('KAFKA_BOOTSTRAP_SERVERS', default='localhost:9092')).split(',')]
 KAFKA_TOPIC_SUBMISSIONS = config('KAFKA_TOPIC_SUBMISSIONS', default='interview-submissions')
@@ -159,6 +187,15 @@ KAFKA_TOPIC_RESULTS = config('KAFKA_TOPIC_RESULTS', default='grading-results')
 
 # Redis settings
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+REDIS_SOCKET_TIMEOUT = config('REDIS_SOCKET_TIMEOUT', default=0.5, cast=float)
+
+# Tenant resolution cache (seconds / entries)
+TENANT_CACHE_TTL = config('TENANT_CACHE_TTL', default=30, cast=int)
+TENANT_CACHE_NEGATIVE_TTL = config('TENANT_CACHE_NEGATIVE_TTL', default=10, cast=int)
+TENANT_CACHE_MAX_ENTRIES = config('TENANT_CACHE_MAX_ENTRIES', default=1024, cast=int)
+
+# How often (seconds) each process checks Redis for schema changes made elsewhere
+SCHEMA_REGISTRY_CHECK_INTERVAL = config('SCHEMA_REGISTRY_CHECK_INTERVAL', default=5, cast=int)
 
 # Celery settings
 CELERY_BROKER_URL = REDIS_URL
@@ -167,6 +204,22 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Provision new tenants on a Celery worker instead of inside the creating request
+TENANT_PROVISIONING_ASYNC = config('TENANT_PROVISIONING_ASYNC', default=True, cast=bool)
+
+# Dashboard stats: 'live' runs one aggregate query per call, 'rollup' reads precomputed counters
+TENANT_STATS_SOURCE = config('TENANT_STATS_SOURCE', default='live')
+TENANT_STATS_ROLLUP_MAX_AGE = config('TENANT_STATS_ROLLUP_MAX_AGE', default=300, cast=int)
+# A stale rollup is queued for refresh at most once per this many seconds per tenant
+TENANT_STATS_REFRESH_LOCK_TTL = config('TENANT_STATS_REFRESH_LOCK_TTL', default=60, cast=int)
+
+CELERY_BEAT_SCHEDULE = {
+    'refresh-stale-tenant-stats-rollups': {
+        'task': 'tenants.refresh_stale_tenant_stats_rollups',
+        'schedule': TENANT_STATS_ROLLUP_MAX_AGE,
+    },
+}
+
 # Email settings
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tenant_apps.authentication'
+    
+    def ready(self):
+        import tenant_apps.authentication.signals
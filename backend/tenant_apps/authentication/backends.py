@@ -3,6 +3,8 @@ from datetime import datetime, timedelta
 from django.conf import settings
 from rest_framework import authentication, exceptions
 from public_apps.tenants.models import TenantUser
+from public_apps.tenants.schema_utils import SchemaManager
+from .cache import principal_cache
 
 
 class JWTAuthentication(authentication.BaseAuthentication):
@@ -27,7 +29,12 @@ class JWTAuthentication(authentication.BaseAuthentication):
             if not user_id:
                 raise exceptions.AuthenticationFailed('Invalid token payload')
             
-            user = TenantUser.objects.get(id=user_id)
+            schema_name = SchemaManager.get_active_schema()
+            token_schema = payload.get('schema')
+            if token_schema and token_schema != schema_name:
+                raise exceptions.AuthenticationFailed('Token is not valid for this tenant')
+            
+            user = principal_cache.get_user(schema_name, user_id)
             
             if not user.is_active:
                 raise exceptions.AuthenticationFailed('User account is disabled')
@@ -48,11 +55,13 @@ class JWTAuthentication(authentication.BaseAuthentication):
 def generate_tokens(user):
     """Generate access and refresh tokens for a user"""
     
-    # Access token payload
+    # Access token payload; permissions are not embedded, authenticate() reads
+    # them from the principal cache so changes apply before the token expires
     access_payload = {
         'user_id': user.id,
         'username': user.username,
         'tenant_id': str(user.tenant.id),
+        'schema': SchemaManager.get_active_schema(),
         'role': user.role,
         'exp': datetime.utcnow() + timedelta(hours=settings.JWT_EXPIRATION_HOURS),
         'iat': datetime.utcnow(),
@@ -0,0 +1,108 @@
+"""
+Cache of authenticated principals keyed by (tenant schema, user id)
+"""
+
+import json
+import logging
+
+from django.conf import settings
+
+from public_apps.tenants.cache import TTLCache, get_redis_client
+from public_apps.tenants.models import TenantUser
+
+logger = logging.getLogger(__name__)
+
+# TenantUser fields needed to authorize a request
+PRINCIPAL_FIELDS = [
+    'id', 'username', 'email', 'first_name', 'last_name',
+    'role', 'is_active', 'is_staff', 'is_superuser', 'is_tenant_admin',
+    'can_create_interviews', 'can_manage_questions',
+    'can_view_analytics', 'can_manage_users',
+]
+
+
+class ReadOnlyPrincipalError(Exception):
+    """Raised on a write through a principal built from cached fields"""
+
+
+class PrincipalCache:
+    """Two-tier (in-process, then Redis) cache of TenantUser principals"""
+    
+    def __init__(self):
+        self.local = TTLCache(
+            max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+            ttl=settings.PRINCIPAL_CACHE_TTL,
+        )
+    
+    @staticmethod
+    def make_key(schema_name, user_id):
+        return f'skiller:principal:{schema_name}:{user_id}'
+    
+    def get_user(self, schema_name, user_id):
+        """Return the principal as a TenantUser, loading it from the database only on a miss"""
+        key = self.make_key(schema_name, user_id)
+        fields = self.local.get(key)
+        
+        if fields is None:
+            fields = self._redis_get(key)
+            if fields is None:
+                fields = TenantUser.objects.values(*PRINCIPAL_FIELDS).get(id=user_id)
+                self._redis_set(key, fields)
+            self.local.set(key, fields)
+        
+        return self.build_user(fields)
+    
+    def invalidate(self, schema_name, user_id):
+        """Forget a principal after the user was saved or deleted"""
+        key = self.make_key(schema_name, user_id)
+        self.local.delete(key)
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            client.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not invalidate cached principal {key}: {e}")
+    
+    @staticmethod
+    def build_user(fields):
+        """
+        Build a TenantUser from cached fields without querying the database.
+        
+        The instance lacks the password and every field not in PRINCIPAL_FIELDS,
+        so saving it would blank them; save() and delete() raise instead.
+        """
+        user = TenantUser(**fields)
+        user._state.adding = False
+        user._state.db = 'default'
+        
+        def read_only(*args, **kwargs):
+            raise ReadOnlyPrincipalError(
+                f"User {user.pk} is a cached principal; load it with TenantUser.objects.get() to modify it"
+            )
+        
+        user.save = user.delete = read_only
+        return user
+    
+    def _redis_get(self, key):
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(key)
+        except Exception as e:
+            logger.debug(f"Principal cache read failed: {e}")
+            return None
+        return json.loads(raw) if raw else None
+    
+    def _redis_set(self, key, fields):
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            client.set(key, json.dumps(fields), ex=settings.PRINCIPAL_CACHE_REDIS_TTL)
+        except Exception as e:
+            logger.debug(f"Principal cache write failed: {e}")
+
+
+principal_cache = PrincipalCache()
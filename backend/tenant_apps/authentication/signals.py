@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from public_apps.tenants.models import TenantUser
+from public_apps.tenants.schema_utils import SchemaManager
+from .cache import principal_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=TenantUser)
+@receiver(post_delete, sender=TenantUser)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """Drop the cached principal on any user change (role, permissions, deactivation, password)"""
+    try:
+        principal_cache.invalidate(SchemaManager.get_active_schema(), instance.pk)
+    except Exception as e:
+        logger.error(f"Error invalidating cached principal for user {instance.pk}: {e}")
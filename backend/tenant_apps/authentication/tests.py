@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import jwt
+from django.conf import settings
+from django.test import RequestFactory, TestCase
+
+from public_apps.tenants.models import TenantUser
+from public_apps.tenants.schema_utils import SchemaManager
+from .backends import JWTAuthentication, generate_tokens
+from .cache import principal_cache
+
+PERMISSION_FIELDS = [
+    'is_tenant_admin', 'can_create_interviews', 'can_manage_questions',
+    'can_view_analytics', 'can_manage_users',
+]
+
+
+def decode(token):
+    return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+
+
+class AccessTokenTests(TestCase):
+    """Permissions come from the user record, never from the token"""
+
+    def setUp(self):
+        self.user = TenantUser.objects.create(username='recruiter', can_manage_users=False)
+        principal_cache.invalidate(SchemaManager.get_active_schema(), self.user.pk)
+
+    def tearDown(self):
+        principal_cache.invalidate(SchemaManager.get_active_schema(), self.user.pk)
+
+    def authenticate(self, payload):
+        token = jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return JWTAuthentication().authenticate(request)[0]
+
+    def test_access_token_carries_no_permission_claims(self):
+        user = SimpleNamespace(id=1, username='recruiter', tenant=SimpleNamespace(id='tenant'), role='recruiter')
+
+        payload = decode(generate_tokens(user)['access_token'])
+
+        for field in PERMISSION_FIELDS:
+            self.assertNotIn(field, payload)
+
+    def test_claims_in_token_do_not_grant_permissions(self):
+        user = self.authenticate({
+            'user_id': self.user.pk,
+            'schema': SchemaManager.get_active_schema(),
+            'can_manage_users': True,
+            'exp': datetime.utcnow() + timedelta(minutes=5),
+        })
+
+        self.assertFalse(user.can_manage_users)
+
+    def test_permission_change_applies_to_issued_tokens(self):
+        payload = {
+            'user_id': self.user.pk,
+            'schema': SchemaManager.get_active_schema(),
+            'exp': datetime.utcnow() + timedelta(minutes=5),
+        }
+        self.assertFalse(self.authenticate(payload).can_manage_users)
+
+        self.user.can_manage_users = True
+        self.user.save()
+
+        self.assertTrue(self.authenticate(payload).can_manage_users)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from public_apps.tenants.schema_utils import SchemaManager, schema_context
+from tenant_apps.questions.models import Question
+from tenant_apps.questions.references import REFERENCE_QUESTION_TYPES
+from tenant_apps.questions.tasks import index_question_references
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue every reference-graded question for (re-)indexing by the AI service, "
+        "e.g. after its reference index volume was lost. Unchanged questions are skipped there."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema',
+            action='append',
+            dest='schemas',
+            help='Only index this tenant schema (repeatable); defaults to all tenant schemas',
+        )
+
+    def handle(self, *args, **options):
+        schemas = options['schemas'] or SchemaManager.list_tenant_schemas()
+        queued = 0
+
+        for schema_name in schemas:
+            with schema_context(schema_name):
+                question_ids = list(
+                    Question.objects.filter(question_type__in=REFERENCE_QUESTION_TYPES).values_list('pk', flat=True)
+                )
+            for question_id in question_ids:
+                index_question_references.delay(schema_name, str(question_id))
+            self.stdout.write(f'  {schema_name}: {len(question_ids)} question(s)')
+            queued += len(question_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} question(s) for reference indexing'))
@@ -0,0 +1,42 @@
+"""
+Reference answers and rubric items the AI service embeds for a question
+"""
+
+# Question types graded by comparing the answer against reference material
+REFERENCE_QUESTION_TYPES = ('text', 'system_design', 'behavioral')
+
+# question_data keys that may hold model answers
+REFERENCE_ANSWER_FIELDS = ('reference_answers', 'sample_answer', 'model_answer')
+
+
+def _texts(value):
+    """Strings in a criteria value: a string, a list of strings, or a dict with a description"""
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, dict):
+        return _texts(value.get('description') or value.get('text') or '')
+    if isinstance(value, (list, tuple)):
+        return [text for item in value for text in _texts(item)]
+    return []
+
+
+def reference_items(question):
+    """[{"label", "text"}] for a question's reference answers and grading criteria, in a stable order"""
+    if question.question_type not in REFERENCE_QUESTION_TYPES:
+        return []
+    
+    items = []
+    data = question.question_data or {}
+    for field in REFERENCE_ANSWER_FIELDS:
+        for index, text in enumerate(_texts(data.get(field))):
+            items.append({'label': f'{field}:{index}', 'text': text})
+    
+    criteria = question.grading_criteria or {}
+    if isinstance(criteria, dict):
+        for name in sorted(criteria):
+            for index, text in enumerate(_texts(criteria[name])):
+                items.append({'label': f'criteria:{name}:{index}', 'text': text})
+    else:
+        for index, text in enumerate(_texts(criteria)):
+            items.append({'label': f'criteria:{index}', 'text': text})
+    return items
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from public_apps.tenants.schema_utils import SchemaManager
+from .models import Question
+from .references import REFERENCE_QUESTION_TYPES, reference_items
+from .tasks import index_question_references, delete_question_references
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Question fields reference_items() reads
+REFERENCE_SOURCE_FIELDS = ('question_type', 'question_data', 'grading_criteria')
+
+
+@receiver(pre_save, sender=Question)
+def note_reference_changes(sender, instance, update_fields=None, **kwargs):
+    """
+    Work out before the save whether it changes what the AI service embeds:
+    saves limited to other fields (e.g. times_used) never do; otherwise the
+    stored row's references are compared with the new ones
+    """
+    if update_fields is not None and not set(update_fields) & set(REFERENCE_SOURCE_FIELDS):
+        instance._references_changed = False
+        return
+    
+    references = reference_items(instance)
+    previous = None
+    if not instance._state.adding:
+        previous = Question.objects.filter(pk=instance.pk).only(*REFERENCE_SOURCE_FIELDS).first()
+    # A question that leaves a reference-graded type still changes: its rows must go
+    instance._references_changed = references != (reference_items(previous) if previous else [])
+
+
+@receiver(post_save, sender=Question)
+def index_references_on_save(sender, instance, created, **kwargs):
+    """Re-embed reference material after a save that changed it"""
+    changed = getattr(instance, '_references_changed', True)
+    instance._references_changed = False
+    if not changed:
+        return
+    
+    schema_name = SchemaManager.get_active_schema()
+    question_id = str(instance.pk)
+    
+    def enqueue():
+        try:
+            index_question_references.delay(schema_name, question_id)
+        except Exception as e:
+            logger.error(f"Could not queue reference indexing for question {question_id}: {e}")
+    
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_delete, sender=Question)
+def delete_references_on_delete(sender, instance, **kwargs):
+    """Drop the question's rows from the reference index"""
+    if instance.question_type not in REFERENCE_QUESTION_TYPES:
+        return
+    
+    schema_name = SchemaManager.get_active_schema()
+    question_id = str(instance.pk)
+    
+    def enqueue():
+        try:
+            delete_question_references.delay(schema_name, question_id)
+        except Exception as e:
+            logger.error(f"Could not queue reference removal for question {question_id}: {e}")
+    
+    transaction.on_commit(enqueue)
@@ -0,0 +1,41 @@
+import requests
+from celery import shared_task
+from django.conf import settings
+from public_apps.tenants.schema_utils import schema_context
+from .models import Question
+from .references import reference_items
+
+
+def _references_url(schema_name, question_id):
+    return f"{settings.AI_SERVICE_URL.rstrip('/')}/references/{schema_name}/{question_id}"
+
+
+@shared_task(name='questions.index_question_references', bind=True, max_retries=5, default_retry_delay=30)
+def index_question_references(self, schema_name, question_id):
+    """Have the AI service (re-)embed a question's reference answers and rubric items"""
+    with schema_context(schema_name):
+        question = Question.objects.filter(pk=question_id).first()
+        # A question that is gone or no longer reference-graded is sent with no references
+        references = reference_items(question) if question else []
+    
+    try:
+        response = requests.put(
+            _references_url(schema_name, question_id),
+            json={'references': references},
+            timeout=settings.AI_SERVICE_TIMEOUT,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise self.retry(exc=e)
+    return response.json()
+
+
+@shared_task(name='questions.delete_question_references', bind=True, max_retries=5, default_retry_delay=30)
+def delete_question_references(self, schema_name, question_id):
+    """Drop a deleted question from the AI service's reference index"""
+    try:
+        response = requests.delete(_references_url(schema_name, question_id), timeout=settings.AI_SERVICE_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise self.retry(exc=e)
+    return response.json()
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+
+from public_apps.tenants.schema_utils import SchemaManager
+
+
+class MigrateSchemaTests(TransactionTestCase):
+    """Migrating a fresh tenant schema creates the tenant app tables in that schema"""
+
+    schema_name = 'tenant_test_fresh'
+
+    def setUp(self):
+        SchemaManager.create_schema(self.schema_name)
+
+    def tearDown(self):
+        SchemaManager.drop_schema(self.schema_name)
+
+    def schema_tables(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = %s",
+                [self.schema_name]
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_tenant_app_labels_come_from_installed_apps(self):
+        labels = SchemaManager.get_tenant_app_labels()
+
+        self.assertIn('questions', labels)
+        self.assertNotIn('tenants', labels)
+
+    def test_migrate_fresh_schema_creates_tables(self):
+        self.assertTrue(SchemaManager.migrate_schema(self.schema_name, raise_errors=True))
+
+        tables = self.schema_tables()
+        self.assertIn('django_migrations', tables)
+        for model in apps.get_app_config('questions').get_models():
+            self.assertIn(model._meta.db_table, tables)
+        self.assertGreater(SchemaManager.count_applied_migrations(self.schema_name), 0)
+
+    def test_migrate_resets_search_path(self):
+        SchemaManager.migrate_schema(self.schema_name)
+
+        self.assertEqual(SchemaManager.get_current_schema(), 'public')
+
+
+class TemplateSchemaTests(TransactionTestCase):
+    """The template schema is only replaced by a fully migrated build"""
+
+    def tearDown(self):
+        SchemaManager.drop_schema(settings.TENANT_TEMPLATE_SCHEMA)
+
+    def test_template_has_every_tenant_migration(self):
+        self.assertTrue(SchemaManager.ensure_template_schema(force=True))
+
+        self.assertEqual(SchemaManager.get_missing_migrations(settings.TENANT_TEMPLATE_SCHEMA), [])
+
+    def test_failed_build_keeps_previous_template(self):
+        self.assertTrue(SchemaManager.ensure_template_schema(force=True))
+
+        with mock.patch.object(SchemaManager, 'get_missing_migrations', return_value=[('questions', '0001_initial')]):
+            self.assertFalse(SchemaManager.ensure_template_schema(force=True))
+        with mock.patch.object(SchemaManager, 'migrate_schema', side_effect=RuntimeError('questions: boom')):
+            self.assertFalse(SchemaManager.ensure_template_schema(force=True))
+
+        self.assertTrue(SchemaManager.schema_exists(settings.TENANT_TEMPLATE_SCHEMA))
+        self.assertEqual(SchemaManager.get_missing_migrations(settings.TENANT_TEMPLATE_SCHEMA), [])
+
+
+@override_settings(TENANT_SCHEMA_MODE='session')
+class SearchPathTrackingTests(TransactionTestCase):
+    """current_schema() follows every switch, including after SQL that sets search_path itself"""
+
+    schemas = ['tenant_test_a', 'tenant_test_b']
+    clone = 'tenant_test_clone'
+
+    def setUp(self):
+        for schema_name in self.schemas:
+            SchemaManager.create_schema(schema_name)
+
+    def tearDown(self):
+        SchemaManager.set_search_path('public')
+        for schema_name in self.schemas + [self.clone, settings.TENANT_TEMPLATE_SCHEMA]:
+            SchemaManager.drop_schema(schema_name)
+
+    def test_switching_between_schemas(self):
+        for schema_name in self.schemas + ['tenant_test_a', 'public', 'tenant_test_b']:
+            SchemaManager.set_search_path(schema_name)
+            self.assertEqual(SchemaManager.get_current_schema(), schema_name)
+
+    def test_switching_after_raw_search_path_change(self):
+        SchemaManager.set_search_path('tenant_test_a')
+        with connection.cursor() as cursor:
+            cursor.execute('SET search_path TO "tenant_test_b", public')
+        SchemaManager.forget_search_path()
+
+        SchemaManager.set_search_path('tenant_test_a')
+
+        self.assertEqual(SchemaManager.get_current_schema(), 'tenant_test_a')
+
+    def test_switching_after_template_helpers(self):
+        SchemaManager.set_search_path('tenant_test_a')
+        self.assertTrue(SchemaManager.ensure_template_schema(force=True))
+        with transaction.atomic():
+            SchemaManager.get_template_layout()
+            self.assertTrue(SchemaManager.clone_template_schema(self.clone))
+            # The helpers' SET LOCAL is still in effect in the outer transaction
+            SchemaManager.set_search_path('tenant_test_a')
+            self.assertEqual(SchemaManager.get_current_schema(), 'tenant_test_a')
+
+        for schema_name in ['tenant_test_a', 'tenant_test_b', 'tenant_test_a']:
+            SchemaManager.set_search_path(schema_name)
+            self.assertEqual(SchemaManager.get_current_schema(), schema_name)